@@ -8,8 +8,10 @@
 """The National Electricity Market Optimiser (NEMO)."""
 
 import nemo.nem  # noqa: F401
+from nemo.batch import run_batch
 from nemo.context import Context
 from nemo.sim import run
+from nemo.sweep import run_sweep
 from nemo.utils import plot
 
-__all__ = ['Context', 'run', 'plot']
+__all__ = ['Context', 'run', 'run_batch', 'run_sweep', 'plot']
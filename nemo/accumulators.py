@@ -0,0 +1,227 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Online accumulators for summary-only simulation runs.
+
+In a summary run (see nemo.sim.run), the simulation does not build
+hour by generator tables of generation and spills. Instead, the
+dispatch of each generator (over one hour or a stretch of hours) is
+fed to a set of accumulators that keep only what is needed, such as
+the energy from each generator or the total unserved energy.
+
+Accumulators are registered by name. Penalty functions declare the
+accumulators they read with the requires() decorator.
+"""
+
+import numpy as np
+
+from nemo import generators
+
+
+class Accumulator():
+    """Base class for online accumulators."""
+
+    def start(self, context, timesteps):
+        """Prepare for a run of timesteps hours."""
+
+    def add(self, hours, gidx, gen, power, spilled):
+        """Add the power and spills of a generator.
+
+        Argument hours is an hour or a slice of hours and gidx is the
+        index of gen in context.generators. Power and spilled are
+        scalars or arrays over those hours.
+        """
+
+    def store(self, hours, gidx, energy):
+        """Account for spilled energy that was stored (in some hours)."""
+
+    def add_unserved(self, hours, unserved):
+        """Add the unserved demand in an hour (or a slice of hours)."""
+
+    def resize(self, gen, change):
+        """Account for a change in capacity (in MW) during the run."""
+
+    def close(self, end):
+        """Complete the hours before end (nothing more is added to them)."""
+
+
+class Energy(Accumulator):
+    """Energy supplied and (unstored) spills of each generator."""
+
+    def __init__(self):
+        """Construct an energy accumulator."""
+        self.energy = np.zeros(0)
+        self.spilled = np.zeros(0)
+
+    def start(self, context, timesteps):
+        """Prepare for a run of timesteps hours."""
+        self.energy = np.zeros(len(context.generators))
+        self.spilled = np.zeros(len(context.generators))
+
+    def add(self, hours, gidx, gen, power, spilled):
+        """Add the power and spills of a generator."""
+        self.energy[gidx] += np.sum(power)
+        self.spilled[gidx] += np.sum(spilled)
+
+    def store(self, hours, gidx, energy):
+        """Account for spilled energy that was stored (in some hours)."""
+        self.spilled[gidx] -= np.sum(energy)
+
+
+class Unserved(Accumulator):
+    """Total, hours and peak of unserved demand."""
+
+    def __init__(self):
+        """Construct an unserved energy accumulator."""
+        self.total = 0
+        self.hours = 0
+        self.peak = 0
+
+    def start(self, context, timesteps):
+        """Prepare for a run of timesteps hours."""
+        self.total = 0
+        self.hours = 0
+        self.peak = 0
+
+    def add_unserved(self, hours, unserved):
+        """Add the unserved demand in an hour (or a slice of hours)."""
+        unserved = np.atleast_1d(unserved)
+        # Ignore unserved events very close to 0 (rounding errors)
+        unserved = unserved[~np.isclose(unserved, 0)]
+        if len(unserved) > 0:
+            self.total += unserved.sum()
+            self.hours += len(unserved)
+            self.peak = max(self.peak, unserved.max())
+
+
+def reserve_p(gen):
+    """Return True if a generator can provide reserves.
+
+    Note: except pumped hydro and CST -- tricky to calculate capacity.
+    """
+    return isinstance(gen, generators.Fuelled) and not \
+        isinstance(gen, generators.PumpedHydro) and not \
+        isinstance(gen, generators.CST)
+
+
+def reserve_shortfall(minimum, reserve, spilled):
+    """Return the penalty and hours short of a minimum reserve.
+
+    Arguments reserve and spilled are arrays of the hourly headroom of
+    the reserve generators and the hourly spills.
+    """
+    short = reserve + spilled < minimum
+    penalty = np.power(minimum - reserve[short] + spilled[short], 3).sum()
+    return penalty, np.count_nonzero(short)
+
+
+class Reserves(Accumulator):
+    """Shortfall of reserves below a minimum (context.min_reserves).
+
+    The headroom of the reserve generators and the spills in an hour
+    are only known once every generator has been dispatched, so they
+    are kept for each open hour. When hours are closed, the penalty
+    and the number of hours short are updated and the hours dropped.
+    """
+
+    def __init__(self):
+        """Construct a reserves accumulator."""
+        self.minimum = 0
+        self.capacity = 0
+        self.penalty = 0
+        self.hours = 0
+        self.first = 0
+        self.power = np.zeros(0)
+        self.spilled = np.zeros(0)
+
+    def start(self, context, timesteps):
+        """Prepare for a run of timesteps hours."""
+        self.minimum = context.min_reserves
+        self.capacity = float(sum(g.capacity for g in context.generators
+                                  if reserve_p(g)))
+        self.penalty = 0
+        self.hours = 0
+        self.first = 0
+        self.power = np.zeros(0)
+        self.spilled = np.zeros(0)
+
+    def _open(self, hours):
+        """Return the buffer index of some open hours."""
+        if isinstance(hours, slice):
+            start, stop = hours.start, hours.stop
+        else:
+            start, stop = hours, hours + 1
+        if start < self.first:
+            raise ValueError(f'hour {start} is already closed')
+        stop -= self.first
+        if stop > len(self.power):
+            grow = np.zeros(stop - len(self.power))
+            self.power = np.concatenate([self.power, grow])
+            self.spilled = np.concatenate([self.spilled, grow])
+        if isinstance(hours, slice):
+            return slice(start - self.first, stop)
+        return start - self.first
+
+    def add(self, hours, gidx, gen, power, spilled):
+        """Add the power and spills of a generator."""
+        index = self._open(hours)
+        if reserve_p(gen):
+            self.power[index] += power
+        self.spilled[index] += spilled
+
+    def resize(self, gen, change):
+        """Account for a change in capacity (in MW) during the run."""
+        if reserve_p(gen):
+            self.capacity += change
+
+    def close(self, end):
+        """Add the shortfall in the hours before end to the penalty."""
+        if end <= self.first:
+            return
+        rows = self._open(slice(self.first, end)).stop
+        reserve = self.capacity - self.power[:rows]
+        penalty, hours = reserve_shortfall(self.minimum, reserve,
+                                           self.spilled[:rows])
+        self.penalty += penalty
+        self.hours += hours
+        self.power = self.power[rows:].copy()
+        self.spilled = self.spilled[rows:].copy()
+        self.first = end
+
+
+registry = {'energy': Energy,
+            'unserved': Unserved,
+            'reserves': Reserves}
+"""Accumulator classes by name."""
+
+
+def register(name, cls):
+    """Register an accumulator class under a name."""
+    registry[name] = cls
+
+
+def requires(*names):
+    """Declare the accumulators that a penalty function reads."""
+    def decorate(func):
+        func.accumulators = names
+        return func
+    return decorate
+
+
+def required(funcs):
+    """Return the names of the accumulators needed by some functions."""
+    names = []
+    for func in funcs:
+        for name in getattr(func, 'accumulators', ()):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def create(names):
+    """Return a dictionary of new accumulators by name."""
+    return {name: registry[name]() for name in names}
@@ -0,0 +1,303 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Population-batched simulation of many capacity vectors at once.
+
+The batched engine follows the generator-major engine in sim.py, but
+every array carries an extra population axis so that a whole CMA-ES
+population can be simulated in one pass.
+"""
+
+import numpy as np
+
+from nemo import generators, sim
+
+
+class BatchResults():
+    """Per-candidate results of a batched simulation.
+
+    Energy is indexed by (candidate, generator) where generators are
+    numbered as in context.generators.
+    """
+
+    def __init__(self, energy, spilled, unserved):
+        """Construct a set of batch results."""
+        self.energy = energy
+        self.spilled = spilled
+        self.unserved = unserved
+
+    def __len__(self):
+        """Return the number of candidates."""
+        return len(self.unserved)
+
+
+class _Unit():
+    """A generator with its parameters for each candidate."""
+
+    attributes = ('capacity',)
+    """Generator attributes that vary between candidates."""
+
+    def __init__(self, gen, params):
+        """Construct a batch unit from a generator and its parameters."""
+        self.gen = gen
+        self.capacity = params[0]
+
+    def step(self, hours, demand):
+        """Step the unit for an hour (or a slice of hours)."""
+        power = np.minimum(self.capacity, demand)
+        return power, np.zeros_like(power)
+
+
+class _TraceUnit(_Unit):
+    """A trace generator that may spill."""
+
+    spills_p = True
+
+    def step(self, hours, demand):
+        """Step the unit for an hour (or a slice of hours)."""
+        generation = np.multiply.outer(self.gen.generation[hours],
+                                       self.capacity)
+        power = np.minimum(generation, demand)
+        if self.spills_p:
+            return power, generation - power
+        return power, np.zeros_like(power)
+
+
+class _GeothermalUnit(_TraceUnit):
+    """A trace generator that does not spill."""
+
+    spills_p = False
+
+
+class _CSTUnit(_Unit):
+    """A CST plant with thermal storage."""
+
+    attributes = ('capacity', 'solarmult', 'maxstorage')
+
+    def __init__(self, gen, params):
+        """Construct a CST batch unit."""
+        _Unit.__init__(self, gen, params)
+        _, self.solarmult, self.maxstorage = params
+        self.stored = 0.5 * self.maxstorage
+
+    def step(self, hours, demand):
+        """Step the unit for one hour."""
+        generation = self.gen.generation[hours] * self.capacity * \
+            self.solarmult
+        remainder = np.minimum(self.capacity, demand)
+        surplus = generation > remainder
+        to_storage = generation - remainder
+        from_storage = np.minimum(remainder - generation, self.stored)
+        power = np.where(surplus, generation - to_storage,
+                         generation + from_storage)
+        self.stored = np.where(surplus,
+                               np.minimum(self.stored + to_storage,
+                                          self.maxstorage),
+                               self.stored - from_storage)
+        power = np.minimum(power, demand)
+        return power, np.zeros_like(power)
+
+
+class _PumpedHydroUnit(_Unit):
+    """A pumped hydro storage station."""
+
+    attributes = ('capacity', 'maxstorage', 'rte')
+
+    def __init__(self, gen, params):
+        """Construct a pumped hydro batch unit."""
+        _Unit.__init__(self, gen, params)
+        _, self.maxstorage, self.rte = params
+        self.stored = self.maxstorage * .5
+        self.last_run = np.full(len(self.capacity), -1)
+
+    def step(self, hours, demand):
+        """Step the unit for one hour."""
+        power = np.minimum(np.minimum(self.stored, self.capacity), demand)
+        # Can't pump and generate in the same hour.
+        power = np.where(self.last_run == hours, 0, power)
+        self.stored = self.stored - power
+        self.last_run = np.where(power > 0, hours, self.last_run)
+        return power, np.zeros_like(power)
+
+    def store(self, hour, power):
+        """Pump water uphill for one hour."""
+        power = np.minimum(self.capacity, power)
+        energy = power * self.rte
+        overflow = self.stored + energy > self.maxstorage
+        power = np.where(overflow, (self.maxstorage - self.stored) / self.rte,
+                         power)
+        stored = np.where(overflow, self.maxstorage, self.stored + energy)
+        # Can't pump and generate in the same hour.
+        blocked = self.last_run == hour
+        power = np.where(blocked, 0, power)
+        self.stored = np.where(blocked, self.stored, stored)
+        self.last_run = np.where(power > 0, hour, self.last_run)
+        return power
+
+
+def _unit_class(gen):
+    """Return the batch unit class for a generator (or None)."""
+    cls = type(gen)
+    if gen.stateless_p:
+        if cls.step_series is generators.TraceGenerator.step_series:
+            return _TraceUnit
+        if cls.step_series is generators.Geothermal.step_series:
+            return _GeothermalUnit
+        if cls.step_series in [generators.Fuelled.step_series,
+                               generators.DemandResponse.step_series,
+                               generators.GreenPower.step_series]:
+            return _Unit
+    elif cls.step is generators.CST.step:
+        return _CSTUnit
+    elif cls.step is generators.PumpedHydro.step and \
+            cls.store is generators.PumpedHydro.store:
+        return _PumpedHydroUnit
+    return None
+
+
+def _store_spills(storage, hour, spl):
+    """Store spills from a generator into any storage.
+
+    Return the spills that could not be stored.
+    """
+    for unit in storage:
+        spl = spl - unit.store(hour, spl)
+        # Ignore tiny negative values (rounding errors).
+        spl[(spl < 0) & (spl >= -1e-6)] = 0
+    return spl
+
+
+def _first_spills(spills, num):
+    """Return the first num positive spills in each hour and candidate.
+
+    Pumped hydro can pump at most once per hour, so once every unit
+    has taken one positive spill (or is full) no further spill from
+    ahead of it in the merit order can be stored in that hour.
+    """
+    positive = spills > 0
+    rank = np.cumsum(positive, axis=0, dtype=np.int32)
+    first = np.zeros((num,) + spills.shape[1:])
+    for k in range(num):
+        first[k] = np.where(positive & (rank == k + 1), spills, 0).sum(axis=0)
+    return first
+
+
+def _run_serial(context, population):
+    """Simulate each candidate in turn using the column engine."""
+    energy = np.zeros((len(population), len(context.generators)))
+    spilled = np.zeros(len(population))
+    unserved = np.zeros(len(population))
+    for cand, caps in enumerate(population):
+        context.set_capacities(caps)
+        sim.run(context, engine='column')
+        gindex = context.plan().gindex
+        energy[cand, gindex] = \
+            context.generation.values[:, :len(gindex)].sum(axis=0)
+        spilled[cand] = context.surplus_energy()
+        unserved[cand] = context.unserved_energy()
+    return BatchResults(energy, spilled, unserved)
+
+
+def run_batch(context, population):
+    """Simulate every row of a (population x parameters) capacity matrix.
+
+    Returns a BatchResults object with the unserved energy, unstored
+    spills and per-generator energy for each candidate. Fleets with
+    generators that have no batched model (eg, batteries) are
+    simulated one candidate at a time, as are fleets under energy
+    limits (see nemo.limits). Generator capacities are left set to
+    those of the last candidate.
+    """
+    if not isinstance(context.regions, list):
+        raise TypeError
+    population = np.atleast_2d(population)
+    plan = context.plan()
+    gens = plan.generators
+    classes = [_unit_class(g) for g in gens]
+    if None in classes or context.energy_limits is not None:
+        return _run_serial(context, population)
+
+    # Snapshot the parameters of every generator for each candidate.
+    params = [[] for _ in gens]
+    for caps in population:
+        context.set_capacities(caps)
+        for values, gen, cls in zip(params, gens, classes):
+            values.append([getattr(gen, attr) for attr in cls.attributes])
+    units = [cls(gen, np.array(values, dtype=float).T)
+             for cls, gen, values in zip(classes, gens, params)]
+
+    sim._setup(context, context.demand.index)
+    timesteps = len(plan.total_demand)
+    residual = np.repeat(plan.total_demand[:, np.newaxis],
+                         len(population), axis=1)
+    async_demand = residual * context.nsp_limit
+    supplied = np.zeros_like(residual)
+    energy = np.zeros((len(population), len(context.generators)))
+    spilled = np.zeros(len(population))
+    gindex = plan.gindex
+    storage = [u for u in units if u.gen.storage_p]
+    prefix, tail = sim._partition(gens)
+    prefix_spills = []
+
+    def dispatch(gidx, hours, power, spl):
+        """Account for power and spills from one unit."""
+        if not gens[gidx].synchronous_p:
+            async_demand[hours] = np.maximum(0, async_demand[hours] - power)
+        residual[hours] = np.maximum(0, residual[hours] - power)
+        supplied[hours] += power
+        energy[:, gindex[gidx]] += power if np.ndim(power) == 1 \
+            else power.sum(axis=0)
+
+    def demand_for(gidx, hours):
+        """Return the demand a unit can meet."""
+        if gens[gidx].synchronous_p:
+            return residual[hours]
+        return np.minimum(async_demand[hours], residual[hours])
+
+    def dispatch_column(gidx):
+        """Dispatch one unit over every hour."""
+        unit = units[gidx]
+        if gens[gidx].stateless_p:
+            hours = slice(0, timesteps)
+            power, spl = unit.step(hours, demand_for(gidx, hours))
+            dispatch(gidx, hours, power, spl)
+            return spl
+        spl = np.zeros_like(residual)
+        for hour in range(timesteps):
+            power, spl[hour] = unit.step(hour, demand_for(gidx, hour))
+            dispatch(gidx, hour, power, spl[hour])
+        return spl
+
+    for gidx in range(prefix):
+        spl = dispatch_column(gidx)
+        if prefix < tail and np.any(spl > 0):
+            prefix_spills.append(spl)
+        else:
+            spilled += spl.sum(axis=0)
+    prefix_spills = np.array(prefix_spills).reshape(-1, *residual.shape)
+    spilled += prefix_spills.sum(axis=(0, 1))
+    prefix_spills = _first_spills(prefix_spills, len(storage))
+
+    for hour in range(timesteps if prefix < tail else 0):
+        # Spills from the generators ahead of the hourly stretch are
+        # stored first, in merit order.
+        for spl in prefix_spills[:, hour]:
+            if np.any(spl > 0):
+                spilled -= spl - _store_spills(storage, hour, spl)
+        for gidx in range(prefix, tail):
+            power, spl = units[gidx].step(hour, demand_for(gidx, hour))
+            dispatch(gidx, hour, power, spl)
+            if np.any(spl > 0):
+                spilled += _store_spills(storage, hour, spl)
+
+    for gidx in range(max(prefix, tail), len(gens)):
+        spilled += dispatch_column(gidx).sum(axis=0)
+
+    unserved = plan.total_demand[:, np.newaxis] - supplied
+    # Ignore unserved events very close to 0 (rounding errors)
+    unserved[np.isclose(unserved, 0)] = 0
+    return BatchResults(energy, spilled, unserved.sum(axis=0))
@@ -0,0 +1,136 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Early abort of evaluations that cannot beat a budget.
+
+No generator can supply more than its capacity in any hour, so
+the residual demand that the generators yet to be dispatched cannot
+meet is a lower bound on the unserved energy. With a fitness that is
+at least a fixed part (eg, capital costs) plus a non-decreasing
+penalty on unserved energy, a run can be abandoned as soon as that
+lower bound puts the candidate beyond its budget.
+
+A SupplyBound gives a lower bound on the unserved energy from the
+capacities alone, so that a candidate can be checked against its
+budget before it is simulated.
+"""
+
+import numpy as np
+
+from nemo import generators
+from nemo.types import BudgetExceeded
+
+
+class Budget():
+    """A fitness limit for a simulation run.
+
+    The fitness of a candidate must be at least fixed plus
+    penalty(unserved) where penalty is a non-decreasing function of
+    the unserved energy (in MWh). The run is abandoned with
+    nemo.types.BudgetExceeded when this bound exceeds limit.
+    """
+
+    block = 168
+    """Number of hours between checks in hour-by-hour dispatch."""
+
+    def __init__(self, limit, fixed=0, penalty=None):
+        """Construct a budget."""
+        self.limit = limit
+        self.fixed = fixed
+        self.penalty = penalty if penalty is not None else lambda _: 0
+        self.pending = 0
+        self.bound = fixed
+
+    def start(self, context, date_range):
+        """Prepare to bound a new run.
+
+        The capacity shortfall of the whole fleet is checked first.
+        """
+        plan = context.plan()
+        self.pending = sum(g.capacity for g in plan.generators)
+        self.check_series(plan.total_demand[:len(date_range)])
+
+    def dispatched(self, capacity):
+        """Account for generation capacity that has been dispatched."""
+        self.pending -= capacity
+
+    def check(self, unserved):
+        """Raise BudgetExceeded if the unserved energy is hopeless.
+
+        The unserved energy is a lower bound for the whole run.
+        """
+        self.bound = self.fixed + self.penalty(unserved)
+        if self.bound > self.limit:
+            raise BudgetExceeded(f'fitness of at least {self.bound:.2f} '
+                                 f'exceeds budget of {self.limit:.2f}',
+                                 self.bound)
+
+    def check_series(self, residual):
+        """Check the residual demand after dispatching some generators."""
+        self.check(np.maximum(0, residual - self.pending).sum())
+
+    def check_partial(self, residual, hours, capacity):
+        """Check part of the way through hour-by-hour dispatch.
+
+        Generators of the given capacity have been dispatched in the
+        first hours of the residual demand and not yet in the rest.
+        """
+        done = np.maximum(0, residual[:hours] - self.pending + capacity)
+        todo = np.maximum(0, residual[hours:] - self.pending)
+        self.check(done.sum() + todo.sum())
+
+
+class SupplyBound():
+    """A lower bound on unserved energy before a run.
+
+    No generator supplies more than its capacity in any hour and no
+    trace generator more than its trace. Non-synchronous generators
+    together supply at most context.nsp_limit of the demand. The
+    output per MW of each generator in the hours of highest demand
+    and its energy per MW over the run are computed once, so the
+    bound for a set of capacities is cheap. Storage is counted at
+    its full capacity in every hour.
+    """
+
+    def __init__(self, context, hours=168):
+        """Compute the trace statistics of the generators of a context."""
+        plan = context.plan()
+        demand = plan.total_demand
+        peak = np.argsort(-demand, kind='stable')[:hours]
+        self.generators = plan.generators
+        self.nsp_limit = context.nsp_limit
+        self.demand = demand[peak]
+        self.total = demand.sum()
+        self.nonsync = np.array([not gen.synchronous_p
+                                 for gen in self.generators], dtype=bool)
+        self.peak = np.ones((len(peak), len(self.generators)))
+        self.energy = np.full(len(self.generators), len(demand), dtype=float)
+        for i, gen in enumerate(self.generators):
+            if isinstance(gen, generators.TraceGenerator) and gen.stateless_p:
+                trace = gen.generation[:len(demand)]
+                self.peak[:, i] = trace[peak]
+                self.energy[i] = trace.sum()
+
+    def _supply(self, output, demand):
+        """Return the most that outputs can supply towards demand."""
+        return output[..., ~self.nonsync].sum(axis=-1) + \
+            np.minimum(output[..., self.nonsync].sum(axis=-1),
+                       demand * self.nsp_limit)
+
+    def unserved(self):
+        """Return a lower bound on the unserved energy (in MWh).
+
+        The bound is the larger of the shortfall in the hours of
+        highest demand and the shortfall in energy over the run.
+        """
+        capacity = np.array([gen.capacity for gen in self.generators])
+        peak = np.maximum(
+            0, self.demand - self._supply(self.peak * capacity,
+                                          self.demand)).sum()
+        energy = self.total - self._supply(self.energy * capacity,
+                                           self.total)
+        return max(peak, energy, 0.)
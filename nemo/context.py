@@ -15,16 +15,22 @@ run. It also allows multiple contexts to be compared after individual
 simulation runs.
 """
 
+import itertools
+
 import numpy as np
 import pandas as pd
 import pint
 
 from nemo import configfile, costs, generators, polygons, regions
 from nemo.nem import hourly_demand, hourly_regional_demand, startdate
+from nemo.plan import SimulationPlan
 
 ureg = pint.UnitRegistry()
 ureg.default_format = '.2f~P'
 
+# Versions of the demand data, unique across contexts.
+_demand_versions = itertools.count()
+
 
 class Context():
     """All simulation state is kept in a Context object."""
@@ -43,25 +49,89 @@ class Context():
         self.relstd = 0.002  # 0.002% unserved energy
         self.generators = [generators.CCGT(polygons.WILDCARD, 20000),
                            generators.OCGT(polygons.WILDCARD, 20000)]
+        self._demand = None
+        self.demand_version = None
         self.demand = hourly_demand.copy()
         self.timesteps = len(self.demand)
         self.spill = pd.DataFrame()
         self.generation = pd.DataFrame()
         self.unserved = pd.DataFrame()
+        # Accumulators from a summary-only run (see nemo.accumulators)
+        self.summary = None
+        # Dispatch trace (see nemo.tracer)
+        self.trace = None
+        # Reuse of dispatch between runs (see nemo.sweep)
+        self.prefix_cache = None
+        # Energy limits enforced during dispatch (see nemo.limits)
+        self.energy_limits = None
+        # Number of times the generators have been reset (see nemo.sim)
+        self.resets = 0
+        # Weights of the timesteps of a reduced horizon (see nemo.periods)
+        self.weights = None
+        # Groups of tied optimisation parameters (see nemo.tying)
+        self.parameter_groups = []
         # System non-synchronous penetration limit
         self.nsp_limit = float(configfile.get('limits', 'nonsync-penetration'))
+        # Minimum operating reserves (see nemo.accumulators.Reserves)
+        self.min_reserves = float(configfile.get('limits',
+                                                 'minimum-reserves-mw'))
         self.costs = costs.NullCosts()
+        self._plan = None
+
+    @property
+    def demand(self):
+        """Return the hourly demand of each polygon."""
+        return self._demand
+
+    @demand.setter
+    def demand(self, demand):
+        """Replace the demand and mark it as changed."""
+        self._demand = demand
+        self.demand_changed()
+
+    def demand_changed(self):
+        """Mark the demand as changed so that the plan is recompiled.
+
+        Assigning to context.demand does this. Code that modifies the
+        demand in place must call it directly.
+        """
+        self.demand_version = next(_demand_versions)
+
+    def plan(self):
+        """Return the simulation plan, recompiling it if it is stale."""
+        if self._plan is None or self._plan.stale_p(self):
+            self._plan = SimulationPlan(self)
+        return self._plan
 
     def total_demand(self):
         """Return the total demand from the data frame."""
         return self.demand.values.sum()
 
+    def accumulator(self, name):
+        """Return an accumulator from a summary-only run (or None)."""
+        if isinstance(self.summary, dict):
+            return self.summary.get(name)
+        return None
+
+    def generator_energy(self):
+        """Return the energy supplied by each generator."""
+        energy = self.accumulator('energy')
+        if energy is not None:
+            return energy.energy
+        return np.array([gen.series_power.sum() for gen in self.generators])
+
     def unserved_energy(self):
         """Return the total unserved energy."""
+        unserved = self.accumulator('unserved')
+        if unserved is not None:
+            return unserved.total
         return self.unserved.values.sum()
 
     def surplus_energy(self):
         """Return total surplus energy."""
+        energy = self.accumulator('energy')
+        if energy is not None:
+            return energy.spilled.sum()
         return self.spill.values.sum()
 
     def unserved_percent(self):
@@ -74,15 +144,7 @@ class Context():
 
     def set_capacities(self, caps):
         """Set generator capacities from a list."""
-        num = 0
-        for gen in self.generators:
-            for (setter, min_cap, max_cap) in gen.setters:
-                # keep parameters within bounds
-                newval = max(min(caps[num], max_cap), min_cap)
-                setter(newval)
-                num += 1
-        # Check every parameter has been set.
-        assert num == len(caps), f'{num} != {len(caps)}'
+        self.plan().set_capacities(caps)
 
     def __str__(self):
         """Make a human-readable representation of the context."""
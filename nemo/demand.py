@@ -216,11 +216,23 @@ def switch(label):
     """
     for (predicate, callback) in switch_table:
         if predicate(label):
-            return callback(label)
+            return _changes_demand(callback(label))
 
     raise ValueError(f'invalid scenario: {label}')
 
 
+def _changes_demand(modifier):
+    """Wrap a modifier to mark the demand of a context as changed.
+
+    Several modifiers update the demand in place, which the context
+    cannot see (see Context.demand_changed).
+    """
+    def modify(context):
+        modifier(context)
+        context.demand_changed()
+    return modify
+
+
 def _roll_demand(context, posns):
     """
     Roll demand by posns timesteps.
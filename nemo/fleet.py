@@ -0,0 +1,150 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Fleet compaction: merge interchangeable generators for dispatch.
+
+Consecutive stateless generators that meet demand in the same way
+(eg, the per-polygon biofuel units in a scenario) are dispatched as
+one aggregate generator. After the run, the aggregate output is
+handed back to each member in merit order, exactly as if they had
+been dispatched one after the other. Generators with no capacity
+are dropped from dispatch altogether.
+"""
+
+import numpy as np
+
+from nemo import generators
+
+
+def _trace_potential(gen, timesteps):
+    """Return the available output of a trace generator."""
+    return gen.generation[:timesteps] * gen.capacity
+
+
+def _fixed_potential(gen, timesteps):
+    """Return the available output of a dispatchable generator."""
+    return np.full(timesteps, float(gen.capacity))
+
+
+def merge_key(gen):
+    """Return a key shared by interchangeable generators (or None).
+
+    Only generators whose vectorised step method meets demand up to
+    a known available output can be merged.
+    """
+    if not gen.stateless_p:
+        return None
+    step_series = type(gen).step_series
+    if step_series is generators.TraceGenerator.step_series:
+        return (_trace_potential, True, gen.synchronous_p)
+    if step_series is generators.Geothermal.step_series:
+        return (_trace_potential, False, gen.synchronous_p)
+    if step_series in [generators.Fuelled.step_series,
+                       generators.DemandResponse.step_series,
+                       generators.GreenPower.step_series]:
+        return (_fixed_potential, False, gen.synchronous_p)
+    return None
+
+
+class MergedGenerator():
+    """An aggregate of interchangeable generators.
+
+    The merged generator can be stepped hour by hour or over the
+    whole horizon like any stateless generator. Call split() at the
+    end of the run to record the output of each member.
+    """
+
+    storage_p = False
+    stateless_p = True
+
+    def __init__(self, members, key, timesteps):
+        """Construct a merged generator from (index, generator) pairs."""
+        potential, spills_p, synchronous_p = key
+        self.members = members
+        self.spills_p = spills_p
+        self.synchronous_p = synchronous_p
+        self.potentials = np.array([potential(gen, timesteps)
+                                    for _, gen in members])
+        self.potential = self.potentials.sum(axis=0)
+        self.capacity = sum(gen.capacity for _, gen in members)
+        self.series_demand = np.zeros(timesteps)
+
+    def __str__(self):
+        """Return a short string representation of the merged generator."""
+        return f'Merged ({len(self.members)} generators)'
+
+    def step(self, hour, demand):
+        """Step the merged generator by one hour."""
+        power = min(self.potential[hour], demand)
+        self.series_demand[hour] = demand
+        spilled = self.potential[hour] - power if self.spills_p else 0
+        return power, spilled
+
+    def step_series(self, demand):
+        """Step the merged generator over a whole demand series."""
+        power = np.minimum(self.potential[:len(demand)], demand)
+        self.series_demand[:len(demand)] = demand
+        if self.spills_p:
+            return power, self.potential[:len(power)] - power
+        return power, np.zeros_like(power)
+
+    def split(self, record):
+        """Dispatch the demand seen by the merged generator to each member.
+
+        Each member meets what the members ahead of it in the merit
+        order could not, as in an uncompacted run. The output of each
+        member is passed to record.add().
+        """
+        demand = self.series_demand.copy()
+        for gidx, gen in self.members:
+            power, spilled = gen.step_series(demand)
+            record.add(slice(0, len(demand)), gidx, gen, power, spilled)
+            np.maximum(0, demand - power, out=demand)
+
+
+def compact(units, timesteps, merge_spills=True):
+    """Compact a list of (index, generator) units in merit order.
+
+    Stateless generators with no capacity are dropped and runs of
+    interchangeable generators are replaced by a MergedGenerator.
+    Spilling generators are only merged if merge_spills is True.
+    """
+    result = []
+    run = []
+    run_key = None
+
+    def flush():
+        """Append the pending run of interchangeable generators."""
+        if len(run) == 1:
+            result.append(run[0])
+        elif run:
+            merged = MergedGenerator(list(run), run_key, timesteps)
+            result.append((run[0][0], merged))
+        run.clear()
+
+    for gidx, gen in units:
+        key = merge_key(gen)
+        if key is not None and gen.capacity == 0:
+            continue
+        if key is not None and key[1] and not merge_spills:
+            key = None
+        if key is None or key != run_key:
+            flush()
+        if key is None:
+            result.append((gidx, gen))
+        else:
+            run.append((gidx, gen))
+        run_key = key
+    flush()
+    return result
+
+
+def split(units, record):
+    """Record the output of the members of any merged units."""
+    for _, unit in units:
+        if isinstance(unit, MergedGenerator):
+            unit.split(record)
@@ -22,7 +22,7 @@ import pint
 import requests
 from matplotlib.patches import Patch
 
-from nemo import polygons
+from nemo import polygons, shared
 
 # Needed for currency formatting.
 locale.setlocale(locale.LC_ALL, '')
@@ -31,6 +31,16 @@ locale.setlocale(locale.LC_ALL, '')
 ureg = pint.UnitRegistry()
 ureg.default_format = '.2f~P'
 
+# Default length of the time series buffers (one year of hours).
+# The simulation resizes them to the length of each run.
+_DEFAULT_TIMESTEPS = 8760
+
+# Check invariants in every step? (see nemo.sim.run)
+inline_checks = True
+
+# Keep only the latest hour of the time series? (see nemo.sim.run)
+windowed_series = False
+
 
 def _thousands(value):
     """
@@ -52,6 +62,64 @@ def _currency(value):
     return locale.currency(round(value), grouping=True).replace(cents, '')
 
 
+class SeriesWindow():
+    """A time series buffer that keeps only the latest hour.
+
+    A streamed summary run (see nemo.sim.run) steps the generators
+    one hour at a time and reads nothing back from their series
+    afterwards, so the buffers need not grow with the horizon. Once a
+    later hour is written, earlier hours can no longer be accessed.
+    """
+
+    def __init__(self, timesteps):
+        """Construct a window over a run of timesteps hours."""
+        self.timesteps = timesteps
+        self.hour = 0
+        self.value = 0.
+
+    def __len__(self):
+        """Return the number of hours in the run."""
+        return self.timesteps
+
+    def _move(self, hour):
+        """Move the window to an hour (if it is later)."""
+        if not isinstance(hour, (int, np.integer)):
+            raise TypeError('series window is indexed by single hours')
+        if not self.hour <= hour < self.timesteps:
+            raise IndexError(f'hour {hour} is outside the series window')
+        if hour > self.hour:
+            self.hour = hour
+            self.value = 0.
+
+    def __getitem__(self, hour):
+        """Return the value in an hour."""
+        self._move(hour)
+        return self.value
+
+    def __setitem__(self, hour, value):
+        """Set the value in an hour."""
+        self._move(hour)
+        self.value = value
+
+    def fill(self, value):
+        """Rewind the window to the first hour and set its value."""
+        self.hour = 0
+        self.value = value
+
+
+def _resized(series, timesteps):
+    """Return a time series buffer for a run of timesteps hours.
+
+    The buffer is reused if it already suits the run.
+    """
+    if len(series) == timesteps and \
+            isinstance(series, SeriesWindow) == windowed_series:
+        return series
+    if windowed_series:
+        return SeriesWindow(timesteps)
+    return np.zeros(timesteps)
+
+
 class Generator():
     """Base generator class."""
 
@@ -62,6 +130,9 @@ class Generator():
     storage_p = False
     """A generator is not capable of storage by default."""
 
+    stateless_p = False
+    """Can the generator be stepped over every hour at once?"""
+
     def __init__(self, polygon, capacity, label=None):
         """
         Construct a base Generator.
@@ -79,18 +150,43 @@ class Generator():
         assert 0 < polygon <= polygons.NUMPOLYGONS, polygon
 
         # Time series of dispatched power and spills
-        self.series_power = {}
-        self.series_spilled = {}
+        self.series_power = np.zeros(_DEFAULT_TIMESTEPS)
+        self.series_spilled = np.zeros(_DEFAULT_TIMESTEPS)
 
     def series(self):
-        """Return generation and spills series."""
-        return {'power': pd.Series(self.series_power, dtype=float),
-                'spilled': pd.Series(self.series_spilled, dtype=float)}
+        """Return the generation and spills as pandas Series (not copied)."""
+        return {'power': pd.Series(self.series_power, copy=False),
+                'spilled': pd.Series(self.series_spilled, copy=False)}
+
+    def set_timesteps(self, timesteps):
+        """Size the time series buffers for a run of timesteps hours."""
+        self.series_power = _resized(self.series_power, timesteps)
+        self.series_spilled = _resized(self.series_spilled, timesteps)
 
     def step(self, hour, demand):
         """Step the generator by one hour."""
         raise NotImplementedError
 
+    def step_series(self, demand):
+        """Step the generator over a whole demand series.
+
+        Generators whose output in one hour does not depend on
+        earlier hours (see stateless_p) override this with a
+        vectorised version. By default, step() is called for each
+        hour in turn, which is correct for any generator. Returns
+        arrays of power and spills.
+        """
+        power = np.zeros(len(demand))
+        spilled = np.zeros(len(demand))
+        for hour, hour_demand in enumerate(demand):
+            power[hour], spilled[hour] = self.step(hour, hour_demand)
+        return power, spilled
+
+    def _record_series(self, power, spilled):
+        """Record power and spills for hours 0 to len(power) - 1."""
+        self.series_power[:len(power)] = power
+        self.series_spilled[:len(spilled)] = spilled
+
     def region(self):
         """Return the region the generator is in."""
         return polygons.region(self.polygon)
@@ -99,10 +195,15 @@ class Generator():
         """Return the annual capital cost."""
         return costs.capcost_per_kw[type(self)] * self.capacity * 1000
 
-    def opcost(self, costs):
-        """Return the annual operating and maintenance cost."""
+    def opcost(self, costs, energy=None):
+        """Return the annual operating and maintenance cost.
+
+        The energy supplied is taken from the time series unless given.
+        """
+        if energy is None:
+            energy = self.series_power.sum()
         return self.fixed_om_costs(costs) + \
-            sum(self.series_power.values()) * self.opcost_per_mwh(costs)
+            energy * self.opcost_per_mwh(costs)
 
     def fixed_om_costs(self, costs):
         """Return the fixed O&M costs."""
@@ -114,12 +215,12 @@ class Generator():
 
     def reset(self):
         """Reset the generator."""
-        self.series_power.clear()
-        self.series_spilled.clear()
+        self.series_power.fill(0)
+        self.series_spilled.fill(0)
 
     def capfactor(self):
         """Capacity factor of this generator (in %)."""
-        supplied = sum(self.series_power.values())
+        supplied = self.series_power.sum()
         hours = len(self.series_power)
         try:
             capfactor = supplied / (self.capacity * hours) * 100
@@ -131,7 +232,7 @@ class Generator():
         """Calculate the LCOE in $/MWh."""
         total_cost = self.capcost(costs) / costs.annuityf * years \
             + self.opcost(costs)
-        supplied = sum(self.series_power.values())
+        supplied = self.series_power.sum()
         if supplied > 0:
             cost_per_mwh = total_cost / supplied
             return cost_per_mwh
@@ -140,13 +241,13 @@ class Generator():
     def summary(self, context):
         """Return a summary of the generator activity."""
         costs = context.costs
-        supplied = sum(self.series_power.values()) * ureg.MWh
+        supplied = self.series_power.sum() * ureg.MWh
         string = f'supplied {supplied.to_compact()}'
         if self.capacity > 0:
             if self.capfactor() > 0:
                 string += f', CF {self.capfactor():.1f}%'
-        if sum(self.series_spilled.values()) > 0:
-            spilled = sum(self.series_spilled.values()) * ureg.MWh
+        if self.series_spilled.sum() > 0:
+            spilled = self.series_spilled.sum() * ureg.MWh
             string += f', surplus {spilled.to_compact()}'
         if self.capcost(costs) > 0:
             string += f', capcost {_currency(self.capcost(costs))}'
@@ -180,12 +281,10 @@ class Storage():
     def __init__(self):
         """Storage constructor."""
         # Time series of charges
-        self.series_charge = {}
+        self.series_charge = np.zeros(_DEFAULT_TIMESTEPS)
 
     def record(self, hour, power):
         """Record storage."""
-        if hour not in self.series_charge:
-            self.series_charge[hour] = 0
         self.series_charge[hour] += power
 
     def charge_capacity(self, gen, hour):
@@ -196,16 +295,19 @@ class Storage():
         how much remaining capacity is available for charging in the
         given timestep.
         """
-        try:
-            result = gen.capacity - self.series_charge[hour]
-            assert result >= 0
-            return result
-        except KeyError:
-            return gen.capacity
+        result = gen.capacity - self.series_charge[hour]
+        assert not inline_checks or result >= 0 or \
+            isclose(result, 0, abs_tol=1e-6)
+        # Ignore tiny negative values (rounding errors).
+        return max(0, result)
 
     def series(self):
-        """Return generation and spills series."""
-        return {'charge': pd.Series(self.series_charge, dtype=float)}
+        """Return the charge as a pandas Series (not copied)."""
+        return {'charge': pd.Series(self.series_charge, copy=False)}
+
+    def set_timesteps(self, timesteps):
+        """Size the charge series buffer for a run of timesteps hours."""
+        self.series_charge = _resized(self.series_charge, timesteps)
 
     def store(self, hour, power):
         """Abstract method to ensure that derived classes define this."""
@@ -213,7 +315,16 @@ class Storage():
 
     def reset(self):
         """Reset a generator with storage."""
-        self.series_charge.clear()
+        self.series_charge.fill(0)
+
+    def stored_series(self):
+        """Return the energy stored at the end of each hour (or None).
+
+        This is used to check the storage bounds after a run. It
+        returns None if the storage level can not be recovered from
+        the time series.
+        """
+        return None
 
 
 class TraceGenerator(Generator):
@@ -221,6 +332,8 @@ class TraceGenerator(Generator):
 
     csvfilename = None
     csvdata = None
+    stateless_p = True
+    """Can the generator be stepped over every hour at once?"""
 
     def __init__(self, polygon, capacity, label=None, build_limit=None):
         """Construct a generator with a specified trace file."""
@@ -241,6 +354,15 @@ class TraceGenerator(Generator):
         self.series_spilled[hour] = spilled
         return power, spilled
 
+    def step_series(self, demand):
+        """Vectorised step method for any generator using traces."""
+        # pylint: disable=no-member
+        generation = self.generation[:len(demand)] * self.capacity
+        power = np.minimum(generation, demand)
+        spilled = generation - power
+        self._record_series(power, spilled)
+        return power, spilled
+
 
 class CSVTraceGenerator(TraceGenerator):
     """A generator that gets its hourly dispatch from a CSV trace file."""
@@ -255,7 +377,12 @@ class CSVTraceGenerator(TraceGenerator):
         cls = self.__class__
         if cls.csvfilename != filename:
             # Optimisation:
-            # Only if the filename changes do we invoke genfromtxt.
+            # Only if the filename changes do we invoke genfromtxt,
+            # and not at all if the trace data is shared by a parent
+            # process (see nemo.shared).
+            cls.csvdata = shared.lookup(filename)
+            cls.csvfilename = filename
+        if cls.csvdata is None:
             if not filename.startswith('http'):
                 # Local file path
                 traceinput = filename
@@ -271,7 +398,6 @@ class CSVTraceGenerator(TraceGenerator):
             cls.csvdata = np.genfromtxt(traceinput, encoding='UTF-8',
                                         delimiter=',')
             cls.csvdata = np.maximum(0, cls.csvdata)
-            cls.csvfilename = filename
         self.generation = cls.csvdata[::, column]
 
 
@@ -321,6 +447,8 @@ class CST(CSVTraceGenerator):
 
     patch = Patch(facecolor='gold')
     """Colour for plotting"""
+    stateless_p = False
+    """CST plants carry thermal storage from hour to hour."""
 
     def __init__(self, polygon, capacity, solarmult, shours, filename,
                  column, label=None, build_limit=None):
@@ -365,9 +493,8 @@ class CST(CSVTraceGenerator):
             from_storage = min(remainder - generation, self.stored)
             generation += from_storage
             self.stored -= from_storage
-            assert self.stored >= 0
-        assert self.stored <= self.maxstorage
-        assert self.stored >= 0
+            assert not inline_checks or self.stored >= 0
+        assert not inline_checks or 0 <= self.stored <= self.maxstorage
         self.series_power[hour] = generation
         self.series_spilled[hour] = 0
 
@@ -375,6 +502,10 @@ class CST(CSVTraceGenerator):
         generation = min(generation, demand)
         return generation, 0
 
+    def step_series(self, demand):
+        """Step hour by hour as the thermal store links the hours."""
+        return Generator.step_series(self, demand)
+
     def reset(self):
         """Reset the generator."""
         Generator.reset(self)
@@ -404,6 +535,9 @@ class CentralReceiver(CST):
 class Fuelled(Generator):
     """The class of generators that consume fuel."""
 
+    stateless_p = True
+    """Can the generator be stepped over every hour at once?"""
+
     def __init__(self, polygon, capacity, label):
         """Construct a fuelled generator."""
         Generator.__init__(self, polygon, capacity, label)
@@ -423,6 +557,14 @@ class Fuelled(Generator):
         self.series_spilled[hour] = 0
         return power, 0
 
+    def step_series(self, demand):
+        """Vectorised step method for fuelled generators."""
+        power = np.minimum(self.capacity, demand)
+        spilled = np.zeros_like(power)
+        self.runhours += np.count_nonzero(power > 0)
+        self._record_series(power, spilled)
+        return power, spilled
+
     def summary(self, context):
         """Return a summary of the generator activity."""
         return Generator.summary(self, context) + \
@@ -447,6 +589,8 @@ class PumpedHydro(Storage, Hydro):
 
     patch = Patch(facecolor='powderblue')
     """Colour for plotting"""
+    stateless_p = False
+    """Pumped hydro carries stored water from hour to hour."""
 
     def __init__(self, polygon, capacity, maxstorage, rte=0.8, label=None):
         """Construct a pumped hydro storage generator."""
@@ -465,6 +609,11 @@ class PumpedHydro(Storage, Hydro):
         # combine dictionaries
         return {**dict1, **dict2}
 
+    def set_timesteps(self, timesteps):
+        """Size the time series buffers for a run of timesteps hours."""
+        Hydro.set_timesteps(self, timesteps)
+        Storage.set_timesteps(self, timesteps)
+
     def store(self, hour, power):
         """Pump water uphill for one hour."""
         if self.last_run == hour:
@@ -480,8 +629,14 @@ class PumpedHydro(Storage, Hydro):
             self.stored += energy
         if power > 0:
             self.last_run = hour
+            self.record(hour, power)
         return power
 
+    def stored_series(self):
+        """Return the energy stored at the end of each hour."""
+        return self.maxstorage * .5 + \
+            np.cumsum(self.series_charge * self.rte - self.series_power)
+
     def step(self, hour, demand):
         """Step method for pumped hydro storage."""
         power = min(self.stored, self.capacity, demand)
@@ -498,6 +653,10 @@ class PumpedHydro(Storage, Hydro):
             self.last_run = hour
         return power, 0
 
+    def step_series(self, demand):
+        """Step hour by hour as the stored water links the hours."""
+        return Generator.step_series(self, demand)
+
     def summary(self, context):
         """Return a summary of the generator activity."""
         storage = (self.maxstorage * ureg.MWh).to_compact()
@@ -508,6 +667,7 @@ class PumpedHydro(Storage, Hydro):
     def reset(self):
         """Reset the generator."""
         Fuelled.reset(self)
+        Storage.reset(self)
         self.stored = self.maxstorage * .5
         self.last_run = None
 
@@ -572,7 +732,7 @@ class Fossil(Fuelled):
 
     def summary(self, context):
         """Return a summary of the generator activity."""
-        generation = sum(self.series_power.values()) * ureg.MWh
+        generation = self.series_power.sum() * ureg.MWh
         emissions = generation * self.intensity * (ureg.t / ureg.MWh)
         return Fuelled.summary(self, context) + \
             f', {emissions.to("Mt")} CO2'
@@ -646,7 +806,7 @@ class CCS(Fossil):
 
     def summary(self, context):
         """Return a summary of the generator activity."""
-        generation = sum(self.series_power.values()) * ureg.MWh
+        generation = self.series_power.sum() * ureg.MWh
         emissions = generation * self.intensity * (ureg.t / ureg.MWh)
         captured = emissions * self.capture
         return Fossil.summary(self, context) + \
@@ -727,6 +887,8 @@ class Battery(Storage, Generator):
     """Colour for plotting"""
     synchronous_p = False
     """Is this a synchronous generator?"""
+    stateless_p = False
+    """Batteries carry stored energy from hour to hour."""
 
     def __init__(self, polygon, capacity, shours, label=None,
                  discharge_hours=None, rte=0.95):
@@ -754,6 +916,11 @@ class Battery(Storage, Generator):
         # combine dictionaries
         return {**dict1, **dict2}
 
+    def set_timesteps(self, timesteps):
+        """Size the time series buffers for a run of timesteps hours."""
+        Generator.set_timesteps(self, timesteps)
+        Storage.set_timesteps(self, timesteps)
+
     def set_capacity(self, cap):
         """Change the capacity of the generator to cap GW."""
         Generator.set_capacity(self, cap)
@@ -776,7 +943,7 @@ class Battery(Storage, Generator):
 
     def store(self, hour, power):
         """Store power."""
-        assert power > 0, f'{power} is <= 0'
+        assert not inline_checks or power > 0, f'{power} is <= 0'
 
         if self.full_p() or \
            hour % 24 in self.discharge_hours:
@@ -790,10 +957,14 @@ class Battery(Storage, Generator):
         self.stored += energy
         if energy > 0:
             self.record(hour, energy)
-        assert self.stored <= self.maxstorage or \
+        assert not inline_checks or self.stored <= self.maxstorage or \
             isclose(self.stored, self.maxstorage)
         return energy
 
+    def stored_series(self):
+        """Return the energy stored at the end of each hour."""
+        return np.cumsum(self.series_charge - self.series_power)
+
     def step(self, hour, demand):
         """Specialised step method for batteries."""
         if self.empty_p() or \
@@ -802,19 +973,21 @@ class Battery(Storage, Generator):
             self.series_spilled[hour] = 0
             return 0, 0
 
-        assert demand > 0
+        assert not inline_checks or demand > 0
         power = min(self.stored, self.capacity, demand) * self.rte
         self.series_power[hour] = power
         self.series_spilled[hour] = 0
         self.stored -= power
         if power > 0:
             self.runhours += 1
-        assert self.stored >= 0 or isclose(self.stored, 0)
+        assert not inline_checks or self.stored >= 0 or \
+            isclose(self.stored, 0)
         return power, 0
 
     def reset(self):
         """Reset the generator."""
         Generator.reset(self)
+        Storage.reset(self)
         self.runhours = 0
         self.stored = 0
 
@@ -840,7 +1013,8 @@ class Battery(Storage, Generator):
         """Return a summary of the generator activity."""
         return Generator.summary(self, context) + \
             f', ran {_thousands(self.runhours)} hours' + \
-            f', charged {_thousands(len(self.series_charge))} hours' + \
+            f', charged {_thousands(np.count_nonzero(self.series_charge))}' + \
+            ' hours' + \
             f', {self.shours}h storage'
 
 
@@ -861,6 +1035,14 @@ class Geothermal(CSVTraceGenerator):
         self.series_spilled[hour] = 0
         return power, 0
 
+    def step_series(self, demand):
+        """Vectorised step method for geothermal generators."""
+        generation = self.generation[:len(demand)] * self.capacity
+        power = np.minimum(generation, demand)
+        spilled = np.zeros_like(power)
+        self._record_series(power, spilled)
+        return power, spilled
+
 
 class Geothermal_HSA(Geothermal):
     """Hot sedimentary aquifer (HSA) geothermal model."""
@@ -879,6 +1061,8 @@ class DemandResponse(Generator):
 
     patch = Patch(facecolor='white')
     """Colour for plotting"""
+    stateless_p = True
+    """Can the generator be stepped over every hour at once?"""
 
     def __init__(self, polygon, capacity, cost_per_mwh, label=None):
         """
@@ -911,6 +1095,16 @@ class DemandResponse(Generator):
             self.runhours += 1
         return power, 0
 
+    def step_series(self, demand):
+        """Vectorised step method for demand response."""
+        power = np.minimum(self.capacity, demand)
+        spilled = np.zeros_like(power)
+        if len(power) > 0:
+            self.maxresponse = max(self.maxresponse, power.max())
+        self.runhours += np.count_nonzero(power > 0)
+        self._record_series(power, spilled)
+        return power, spilled
+
     def reset(self):
         """Reset the generator."""
         Generator.reset(self)
@@ -933,6 +1127,8 @@ class GreenPower(Generator):
 
     patch = Patch(facecolor='darkgreen')
     """Colour for plotting"""
+    stateless_p = True
+    """Can the generator be stepped over every hour at once?"""
 
     def step(self, hour, demand):
         """Step method for GreenPower."""
@@ -941,6 +1137,13 @@ class GreenPower(Generator):
         self.series_spilled[hour] = 0
         return power, 0
 
+    def step_series(self, demand):
+        """Vectorised step method for GreenPower."""
+        power = np.minimum(self.capacity, demand)
+        spilled = np.zeros_like(power)
+        self._record_series(power, spilled)
+        return power, spilled
+
 
 class HydrogenStorage():
     """A simple hydrogen storage vessel."""
@@ -1032,6 +1235,11 @@ class Electrolyser(Storage, Generator):
         # combine dictionaries
         return {**dict1, **dict2}
 
+    def set_timesteps(self, timesteps):
+        """Size the time series buffers for a run of timesteps hours."""
+        Generator.set_timesteps(self, timesteps)
+        Storage.set_timesteps(self, timesteps)
+
     def step(self, hour, demand):
         """Return 0 as this is not a generator."""
         return 0, 0
@@ -1041,10 +1249,11 @@ class Electrolyser(Storage, Generator):
         Storage.reset(self)
         Generator.reset(self)
 
-    def store(self, _, power):
+    def store(self, hour, power):
         """Store power."""
         power = min(power, self.capacity)
         stored = self.tank.charge(power * self.efficiency)
+        self.record(hour, stored / self.efficiency)
         return stored / self.efficiency
 
 
@@ -1053,6 +1262,8 @@ class HydrogenGT(Fuelled):
 
     patch = Patch(facecolor='violet')
     """Colour for plotting"""
+    stateless_p = False
+    """The hydrogen tank is carried from hour to hour."""
 
     def __init__(self, tank, polygon, capacity, efficiency=0.36, label=None):
         """
@@ -1086,6 +1297,10 @@ class HydrogenGT(Fuelled):
             self.runhours += 1
         return power, 0
 
+    def step_series(self, demand):
+        """Step hour by hour as the hydrogen tank links the hours."""
+        return Generator.step_series(self, demand)
+
     def capcost(self, costs):
         """Return the annual capital cost (of an OCGT)."""
         return costs.capcost_per_kw[OCGT] * self.capacity * 1000
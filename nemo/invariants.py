@@ -0,0 +1,101 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Vectorised checks of the simulation invariants after a run.
+
+These are the invariants that the dispatch code otherwise asserts
+hour by hour (see nemo.sim.run). They are checked here over the
+time series recorded by each generator.
+"""
+
+import numpy as np
+
+from nemo.types import InvariantError
+
+# Tolerance for rounding errors (in MW or MWh).
+_ABS_TOL = 1e-6
+_REL_TOL = 1e-9
+
+
+def _negative(values, scale=0):
+    """Return a mask of values that are negative beyond rounding error."""
+    return values < -(_ABS_TOL + _REL_TOL * np.abs(scale))
+
+
+def _first(mask):
+    """Return the (hour, column) of the first True value (or None)."""
+    mask = mask.reshape(len(mask), -1)
+    hours = np.flatnonzero(mask.any(axis=1))
+    if len(hours) == 0:
+        return None
+    return hours[0], np.argmax(mask[hours[0]])
+
+
+def violations(context, timesteps):
+    """Return a list of (hour, generator, description) violations.
+
+    Only the first violation of each invariant is listed. The
+    generator is None for invariants over all generators.
+    """
+    plan = context.plan()
+    gens = plan.generators
+    demand = plan.total_demand[:timesteps]
+    power = np.zeros((timesteps, len(gens)))
+    spilled = np.zeros((timesteps, len(gens)))
+    for gidx, gen in enumerate(gens):
+        power[:, gidx] = gen.series_power[:timesteps]
+        spilled[:, gidx] = gen.series_spilled[:timesteps]
+    supplied = np.cumsum(power, axis=1)
+    nonsync = np.array([not g.synchronous_p for g in gens], dtype=bool)
+    async_supplied = np.cumsum(power * nonsync, axis=1)
+    demand = demand[:, np.newaxis]
+
+    checks = [('negative generation', _negative(power)),
+              ('negative spill', _negative(spilled)),
+              ('generation exceeds demand',
+               _negative(demand - supplied, demand)),
+              ('non-synchronous generation exceeds limit',
+               _negative(demand * context.nsp_limit - async_supplied,
+                         demand))]
+
+    bounds = np.zeros((timesteps, len(gens)), dtype=bool)
+    for gidx, gen in enumerate(gens):
+        stored = gen.stored_series() if gen.storage_p else None
+        if stored is not None:
+            stored = stored[:timesteps]
+            bounds[:, gidx] = _negative(stored, gen.maxstorage) | \
+                _negative(gen.maxstorage - stored, gen.maxstorage)
+    checks.append(('storage out of bounds', bounds))
+
+    result = []
+    for description, mask in checks:
+        first = _first(mask)
+        if first is not None:
+            result.append((first[0], gens[first[1]], description))
+
+    if not context.spill.empty:
+        # Energy taken from spills must equal the energy stored.
+        absorbed = spilled.sum(axis=1) - \
+            context.spill.values[:timesteps, :len(gens)].sum(axis=1)
+        charged = np.zeros(timesteps)
+        for gen in plan.storage:
+            charged += gen.series_charge[:timesteps]
+        first = _first(~np.isclose(absorbed, charged, atol=_ABS_TOL))
+        if first is not None:
+            result.append((first[0], None,
+                           'stored energy does not match spills absorbed'))
+    return sorted(result, key=lambda violation: violation[0])
+
+
+def check(context, date_range):
+    """Raise InvariantError for the first violation of an invariant."""
+    found = violations(context, len(date_range))
+    if found:
+        hour, gen, description = found[0]
+        where = f' ({gen})' if gen is not None else ''
+        raise InvariantError(f'{description} in hour {hour} '
+                             f'({date_range[hour]}){where}', hour, gen)
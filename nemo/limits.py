@@ -0,0 +1,199 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Annual energy and emissions limits enforced during dispatch.
+
+The hydro, bioenergy, fossil and emissions limits are normally
+applied after a run as penalties (see nemo.penalties). If
+context.energy_limits is set to an EnergyLimits object, they are
+instead running budgets: each limit is shared by the generators it
+covers and, once the energy (or emissions) dispatched reaches the
+limit, those generators stop dispatching. Demand they would have met
+is left to the rest of the merit order or goes unserved.
+
+A pacing rule sets how much of each limit may be spent by each hour
+of the run. Unspent allowance is carried forward.
+"""
+
+import numpy as np
+
+from nemo import generators
+
+# Conversion factor between MWh and TWh.
+_twh = pow(10., 6)
+
+# The allowances are shaved by this fraction so that rounding errors
+# in the running totals do not trip the penalties after the run.
+_margin = 1e-9
+
+
+def _hydro(gen):
+    """Return the weight of a generator towards the hydro limit."""
+    hydro = isinstance(gen, generators.Hydro) and \
+        not isinstance(gen, generators.PumpedHydro)
+    return float(hydro)
+
+
+def _bioenergy(gen):
+    """Return the weight of a generator towards the bioenergy limit."""
+    return float(isinstance(gen, generators.Biofuel))
+
+
+def _fossil(gen):
+    """Return the weight of a generator towards the fossil limit."""
+    return float(isinstance(gen, generators.Fossil))
+
+
+def _emissions(gen):
+    """Return the emissions intensity of a generator (t/MWh)."""
+    return float(getattr(gen, 'intensity', 0))
+
+
+def _greedy(weights, _):
+    """Allow the whole limit from the first hour."""
+    return np.ones(len(weights))
+
+
+def _even(weights, _):
+    """Spread the limit evenly over the hours of the run."""
+    return np.cumsum(weights) / weights.sum()
+
+
+def _demand(weights, demand):
+    """Spread the limit over the run in proportion to demand."""
+    cumulative = np.cumsum(weights * demand)
+    if cumulative[-1] <= 0:
+        return np.ones(len(weights))
+    return cumulative / cumulative[-1]
+
+
+pacings = {'greedy': _greedy,
+           'even': _even,
+           'demand': _demand}
+"""Pacing rules, selectable by name in EnergyLimits."""
+
+
+class EnergyLimits():
+    """Running budgets for the annual energy and emissions limits.
+
+    The limits are in the units of the evolve options of the same
+    name: hydro and bioenergy in TWh per year, fossil as a share of
+    demand and emissions in Mt CO2-e per year. They are computed for
+    a context exactly as in nemo.penalties, and limits that are not
+    binding (infinite, or a fossil share of 1) are not enforced.
+
+    start() prepares the budgets for a run. During the run, the
+    dispatch engines call available() before stepping a limited
+    generator and use() afterwards. Energy is weighted by
+    context.weights if it is set (see nemo.periods).
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, hydro=np.inf, bioenergy=np.inf, fossil=1.0,
+                 emissions=np.inf, pacing='greedy'):
+        """Construct a set of limits with a pacing rule (see pacings)."""
+        if pacing not in pacings:
+            raise ValueError(f'unknown pacing: {pacing}')
+        self.settings = (hydro, bioenergy, fossil, emissions, pacing)
+        self.hydro = hydro
+        self.bioenergy = bioenergy
+        self.fossil = fossil
+        self.emissions = emissions
+        self.pacing = pacing
+        self.names = []
+        self.limits = []
+        self.used = []
+        self.limited = []
+        self._members = []
+        self._allowance = []
+        self._weights = []
+
+    def _groups(self, context):
+        """Return the (name, weight function, limit) of each limit."""
+        groups = []
+        if self.hydro < np.inf:
+            groups.append(('hydro', _hydro,
+                           self.hydro * _twh * context.years))
+        if self.bioenergy < np.inf:
+            groups.append(('bioenergy', _bioenergy,
+                           self.bioenergy * _twh * context.years))
+        if self.fossil < 1:
+            fossil = context.total_demand() * self.fossil * context.years
+            groups.append(('fossil', _fossil, fossil))
+        if self.emissions < np.inf:
+            groups.append(('emissions', _emissions,
+                           self.emissions * pow(10, 6) * context.years))
+        return groups
+
+    def covers_p(self, context, gen):
+        """Return True if a generator is subject to any limit."""
+        return any(weight(gen) > 0 for _, weight, _ in self._groups(context))
+
+    def start(self, context, date_range):
+        """Prepare the budgets for a new run.
+
+        Generators are numbered by their position in the merit order
+        of generators in the regions of interest (as in nemo.sim).
+        Generators with no capacity are not limited.
+        """
+        plan = context.plan()
+        hours = len(date_range)
+        weights = np.ones(hours) if context.weights is None \
+            else np.asarray(context.weights[:hours], dtype=float)
+        share = pacings[self.pacing](weights, plan.total_demand[:hours])
+        self.names, self.limits, self.used = [], [], []
+        self._members = [[] for _ in plan.generators]
+        self._allowance = []
+        for name, weight, limit in self._groups(context):
+            factors = [weight(gen) if gen.capacity > 0 else 0
+                       for gen in plan.generators]
+            if not any(factors):
+                continue
+            for gidx, factor in enumerate(factors):
+                if factor > 0:
+                    self._members[gidx].append((len(self.names), factor))
+            self.names.append(name)
+            self.limits.append(limit)
+            self.used.append(0.)
+            self._allowance.append(
+                (share * limit * (1 - _margin)).tolist())
+        self.limited = [bool(members) for members in self._members]
+        self._weights = weights.tolist()
+
+    def available(self, gidx, hour):
+        """Return the most that a limited generator may supply in an hour."""
+        weight = self._weights[hour]
+        power = np.inf
+        for j, factor in self._members[gidx]:
+            remaining = self._allowance[j][hour] - self.used[j]
+            power = min(power, remaining / (factor * weight))
+        return max(0., power)
+
+    def use(self, gidx, hour, power):
+        """Account for the power supplied by a limited generator."""
+        weight = self._weights[hour]
+        for j, factor in self._members[gidx]:
+            self.used[j] += power * factor * weight
+
+    def within_p(self, context, date_range):
+        """Return True if the last run kept within every allowance.
+
+        If no limit would have bound in any hour, a run without the
+        limits dispatches the same as a run with them. The energy
+        used is updated from the output of each generator.
+        """
+        self.start(context, date_range)
+        gens = context.plan().generators
+        hours = len(date_range)
+        spent = np.zeros((len(self.names), hours))
+        for gen, members in zip(gens, self._members):
+            for j, factor in members:
+                spent[j] += gen.series_power[:hours] * factor
+        cumulative = np.cumsum(spent * self._weights, axis=1)
+        self.used = [float(total) for total in cumulative[:, -1]]
+        return bool((cumulative <= np.array(self._allowance)
+                     .reshape(cumulative.shape)).all())
@@ -0,0 +1,116 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Memoisation of evaluations by their effective parameters.
+
+Parameters are clamped to their bounds before they are applied (see
+SimulationPlan.set_capacities), so many distinct candidates describe
+the same fleet. Evaluations are cached by the clamped (and optionally
+quantised) parameter vector.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+def canonical(context, caps, resolution=0):
+    """Return the parameters that a list of capacities amounts to.
+
+    Parameters are clamped to their bounds and, if resolution (in
+    MW) is non-zero, rounded to a multiple of it. Parameters are
+    taken to be in GW, as they are for capacities.
+    """
+    plan = context.plan()
+    values = plan.clamp(caps)
+    if resolution:
+        step = resolution / 1000
+        values = plan.clamp(np.round(values / step) * step)
+    return values
+
+
+class MemoCache():
+    """A bounded least-recently-used cache of evaluation results."""
+
+    def __init__(self, maxsize=4096):
+        """Construct a cache holding up to maxsize results."""
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.duplicates = 0
+
+    def __len__(self):
+        """Return the number of cached results."""
+        return len(self.entries)
+
+    def __contains__(self, key):
+        """Return True if a result is cached for key."""
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """Return the result cached for key (or default)."""
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Cache a result, evicting the least recently used if full."""
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def hit_rate(self):
+        """Return the fraction of lookups that were hits."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def map(self, func, items, keys, mapper=map, keep=None):
+        """Return func applied to each item, evaluating each key once.
+
+        Cached results are reused and items with the same key are
+        evaluated only once. The evaluations are made by mapper (eg,
+        a parallel map). Results are cached unless keep(result) is
+        False.
+        """
+        results = [None] * len(items)
+        pending = OrderedDict()
+        missing = object()
+        for i, key in enumerate(keys):
+            if key in pending:
+                pending[key].append(i)
+                self.duplicates += 1
+                continue
+            value = self.get(key, missing)
+            if value is missing:
+                pending[key] = [i]
+            else:
+                results[i] = value
+        values = mapper(func, [items[indices[0]]
+                               for indices in pending.values()])
+        for (key, indices), value in zip(pending.items(), values):
+            if keep is None or keep(value):
+                self.put(key, value)
+            for i in indices:
+                results[i] = value
+        return results
+
+    def __str__(self):
+        """Return a summary of the cache statistics."""
+        return (f'{self.hits} hits ({self.hit_rate():.1%}), '
+                f'{self.misses} misses, {self.duplicates} duplicates, '
+                f'{self.evictions} evictions')
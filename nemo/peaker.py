@@ -0,0 +1,122 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Closed-form sizing of the peaking generator.
+
+The last generator in the merit order of most scenarios (eg, OCGT)
+is a stateless fuelled generator that supplies min(capacity, demand)
+of the residual demand left by the rest of the fleet. Its dispatch,
+and the unserved energy that remains, are then determined by that
+residual demand alone. Sorting the residual demand once gives the
+unserved energy, the energy supplied and the cost for any capacity
+by binary search over prefix sums, so the capacity that just meets
+the reliability standard can be chosen directly (see nemo.sim.run).
+"""
+
+import numpy as np
+
+from nemo import generators
+
+
+def candidate(context):
+    """Return the generator that can be sized in closed form (or None).
+
+    This is the last generator in the merit order if it is a
+    stateless, synchronous fuelled generator with only a capacity
+    parameter.
+    """
+    plan = context.plan()
+    if not plan.generators:
+        return None
+    gen = plan.generators[-1]
+    if isinstance(gen, generators.Fuelled) and gen.stateless_p and \
+       gen.synchronous_p and not gen.storage_p and len(gen.setters) == 1 \
+       and getattr(gen.setters[0][0], '__func__', None) is \
+       generators.Generator.set_capacity:
+        return gen
+    return None
+
+
+class Peaker():
+    """The residual demand left for the peaking generator.
+
+    Capacities and demand are in MW and energy in MWh. Costs are
+    totals over the period of the run. Hours are weighted by
+    context.weights if it is set (see nemo.periods).
+    """
+
+    def __init__(self, context, gen, residual):
+        """Construct a peaker sizing for the residual demand."""
+        self.gen = gen
+        weights = context.weights
+        if weights is None:
+            weights = np.ones(len(residual))
+        # Residual demand in descending order and the prefix sums of
+        # its energy and of the hours.
+        order = np.argsort(-residual, kind='stable')
+        self.demand = residual[order]
+        self.prefix = np.concatenate(
+            ([0], np.cumsum(self.demand * weights[order])))
+        self.hours = np.concatenate(([0], np.cumsum(weights[order])))
+        # Unserved energy with capacity equal to each residual demand.
+        self.shortfall = self.prefix[:-1] - self.hours[:-1] * self.demand
+        _, lower, upper = gen.setters[0]
+        self.lower = lower * 1000
+        self.upper = upper * 1000
+        self.maxunserved = context.total_demand() * context.relstd / 100
+
+        # Costs are linear in capacity and energy.
+        capacity = gen.capacity
+        gen.capacity = 1
+        try:
+            costs = context.costs
+            self.capcost = gen.capcost(costs) / costs.annuityf * \
+                context.years + gen.fixed_om_costs(costs)
+            self.opcost = gen.opcost_per_mwh(costs)
+        finally:
+            gen.capacity = capacity
+
+    def _above(self, capacity):
+        """Return the number of hours of residual demand over capacity."""
+        return len(self.demand) - \
+            np.searchsorted(self.demand[::-1], capacity, side='right')
+
+    def unserved(self, capacity):
+        """Return the unserved energy with a given capacity."""
+        above = self._above(capacity)
+        return max(0., self.prefix[above] - self.hours[above] * capacity)
+
+    def energy(self, capacity):
+        """Return the energy supplied with a given capacity."""
+        return self.prefix[-1] - self.unserved(capacity)
+
+    def cost(self, capacity):
+        """Return the cost of the generator with a given capacity."""
+        return self.capcost * capacity + self.opcost * self.energy(capacity)
+
+    def capacity(self, unserved=None):
+        """Return the least capacity that leaves at most unserved energy.
+
+        The unserved energy defaults to the reliability standard.
+        """
+        if unserved is None:
+            unserved = self.maxunserved
+        if unserved >= self.prefix[-1]:
+            return 0.
+        # The unserved energy falls linearly with capacity between
+        # consecutive residual demands, by one MWh per MW for each
+        # hour above the capacity.
+        above = np.searchsorted(self.shortfall, unserved, side='right')
+        return (self.prefix[above] - unserved) / self.hours[above]
+
+    def size(self):
+        """Return the cheapest capacity that meets the reliability standard.
+
+        Costs rise with capacity, so this is the least capacity that
+        meets the standard (within the bounds of the generator).
+        """
+        return min(self.upper, max(self.lower, self.capacity()))
@@ -7,10 +7,13 @@
 
 """Penalty functions for the optimisation."""
 
-from nemo import generators
+import numpy as np
+
+from nemo import accumulators, generators
 
 _reason_labels = ['unserved', 'emissions', 'fossil', 'bioenergy',
-                  'hydro', 'reserves', 'min-regional-gen']
+                  'hydro', 'reserves', 'min-regional-gen', 'aborted',
+                  'reduced']
 
 reasons = {}
 for i, label in enumerate(_reason_labels):
@@ -20,51 +23,69 @@ for i, label in enumerate(_reason_labels):
 _twh = pow(10., 6)
 
 
-def unserved(ctx, _):
-    """Penalty: unserved energy."""
+def _energy(ctx):
+    """Return the energy supplied by each generator."""
+    return ctx.generator_energy()
+
+
+def unserved_penalty(ctx, energy):
+    """Return the penalty for an amount of unserved energy (in MWh)."""
     minuse = ctx.total_demand() * (ctx.relstd / 100)
-    use = max(0, ctx.unserved_energy() - minuse)
+    use = max(0, energy - minuse)
     reason = reasons['unserved'] if use > 0 else 0
     return pow(use, 3), reason
 
 
+@accumulators.requires('unserved')
+def unserved(ctx, _):
+    """Penalty: unserved energy."""
+    return unserved_penalty(ctx, ctx.unserved_energy())
+
+
 def _calculate_reserve(gen, time):
-    """Calculate headroom for each generator.
+    """Calculate headroom for each generator at a time (or slice).
 
     Note: except pumped hydro and CST -- tricky to calculate capacity.
     """
-    if isinstance(gen, generators.Fuelled) and not \
-       isinstance(gen, generators.PumpedHydro) and not \
-       isinstance(gen, generators.CST):
+    if accumulators.reserve_p(gen):
         return gen.capacity - gen.series_power[time]
     return 0
 
 
+@accumulators.requires('reserves')
 def reserves(ctx, args):
     """Penalty: minimum reserves."""
-    pen, reas = 0, 0
-    for time in range(ctx.timesteps):
-        reserve, spilled = 0, 0
+    acc = ctx.accumulator('reserves')
+    if acc is not None:
+        # The shortfall is accumulated during the run.
+        if acc.minimum != args.reserves:
+            raise ValueError(f'reserves accumulated for {acc.minimum} MW, '
+                             f'not {args.reserves} MW')
+        pen, hours = acc.penalty, acc.hours
+    else:
+        reserve = np.zeros(ctx.timesteps)
+        spilled = np.zeros(ctx.timesteps)
         for gen in ctx.generators:
-            try:
-                spilled += gen.series_spilled[time]
-            except KeyError:
-                # non-variable generators may not have spill data
-                pass
-            reserve += _calculate_reserve(gen, time)
-
-        if reserve + spilled < args.reserves:
-            reas |= reasons['reserves']
-            pen += pow(args.reserves - reserve + spilled, 3)
+            spilled += gen.series_spilled[:ctx.timesteps]
+            reserve += _calculate_reserve(gen, slice(0, ctx.timesteps))
+        pen, hours = accumulators.reserve_shortfall(args.reserves, reserve,
+                                                    spilled)
+    reas = reasons['reserves'] if hours > 0 else 0
     return pen, reas
 
 
-def _regional_generation(region, gens):
-    """Sum generation in a given region."""
+def _regional_generation(region, gens, energy=None):
+    """Sum generation in a given region.
+
+    The energy from each generator is taken from its time series
+    unless given as a list.
+    """
+    if energy is None:
+        energy = [gen.series_power.sum() for gen in gens]
     regional_generation = 0
-    for gen in gens:
+    for gen, gen_energy in zip(gens, energy):
         if gen.region() is region:
-            regional_generation += sum(gen.series_power.values())
+            regional_generation += gen_energy
     return regional_generation
 
 
@@ -76,12 +97,15 @@ def _regional_demand(region, demand):
     return regional_demand
 
 
+@accumulators.requires('energy')
 def min_regional(ctx, _):
     """Penalty: minimum share of regional generation."""
     shortfall = 0
+    energy = _energy(ctx)
     for rgn in ctx.regions:
         regional_demand = _regional_demand(rgn, ctx.demand)
-        regional_generation = _regional_generation(rgn, ctx.generators)
+        regional_generation = _regional_generation(rgn, ctx.generators,
+                                                   energy)
         min_regional_generation = regional_demand * ctx.min_regional_generation
         shortfall += max(0, min_regional_generation - regional_generation)
 
@@ -92,12 +116,13 @@ def min_regional(ctx, _):
     return pow(shortfall, 3), reason
 
 
+@accumulators.requires('energy')
 def emissions(ctx, args):
     """Penalty: total emissions."""
     total_emissions = 0
-    for gen in ctx.generators:
+    for gen, energy in zip(ctx.generators, _energy(ctx)):
         if hasattr(gen, 'intensity'):
-            total_emissions += sum(gen.series_power.values()) * gen.intensity
+            total_emissions += energy * gen.intensity
     emissions_limit = args.emissions_limit * pow(10, 6) * ctx.years
     # exceedance in tonnes CO2-e
     emissions_exceedance = max(0, total_emissions - emissions_limit)
@@ -105,37 +130,40 @@ def emissions(ctx, args):
     return pow(emissions_exceedance, 3), reason
 
 
+@accumulators.requires('energy')
 def fossil(ctx, args):
     """Penalty: limit fossil to fraction of annual demand."""
     fossil_energy = 0
-    for gen in ctx.generators:
+    for gen, energy in zip(ctx.generators, _energy(ctx)):
         if isinstance(gen, generators.Fossil):
-            fossil_energy += sum(gen.series_power.values())
+            fossil_energy += energy
     fossil_limit = ctx.total_demand() * args.fossil_limit * ctx.years
     fossil_exceedance = max(0, fossil_energy - fossil_limit)
     reason = reasons['fossil'] if fossil_exceedance > 0 else 0
     return pow(fossil_exceedance, 3), reason
 
 
+@accumulators.requires('energy')
 def bioenergy(ctx, args):
     """Penalty: limit biofuel use."""
     biofuel_energy = 0
-    for gen in ctx.generators:
+    for gen, energy in zip(ctx.generators, _energy(ctx)):
         if isinstance(gen, generators.Biofuel):
-            biofuel_energy += sum(gen.series_power.values())
+            biofuel_energy += energy
     biofuel_limit = args.bioenergy_limit * _twh * ctx.years
     biofuel_exceedance = max(0, biofuel_energy - biofuel_limit)
     reason = reasons['bioenergy'] if biofuel_exceedance > 0 else 0
     return pow(biofuel_exceedance, 3), reason
 
 
+@accumulators.requires('energy')
 def hydro(ctx, args):
     """Penalty: limit hydro use."""
     hydro_energy = 0
-    for gen in ctx.generators:
+    for gen, energy in zip(ctx.generators, _energy(ctx)):
         if isinstance(gen, generators.Hydro) and \
            not isinstance(gen, generators.PumpedHydro):
-            hydro_energy += sum(gen.series_power.values())
+            hydro_energy += energy
     hydro_limit = args.hydro_limit * _twh * ctx.years
     hydro_exceedance = max(0, hydro_energy - hydro_limit)
     reason = reasons['hydro'] if hydro_exceedance > 0 else 0
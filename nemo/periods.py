@@ -0,0 +1,240 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Representative periods for reduced-horizon simulation.
+
+The horizon is cut into blocks of hours (eg, days or weeks) that are
+clustered by their demand and the trace data of the generators. The
+block closest to the centre of each cluster represents the cluster
+and is weighted by the number of blocks in it. The block with the
+peak demand is always kept as a period of its own.
+
+A ReducedContext simulates just the representative blocks, one after
+the other in chronological order, so that storage is dispatched
+chronologically within each block (and carries over from one block
+to the next). Its energy totals are weighted to stand for the whole
+horizon, so costs and the usual penalties can be calculated from it
+as from a full run.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from nemo.context import Context
+
+
+def _traces(context):
+    """Return the distinct trace data of the generators."""
+    timesteps = len(context.demand)
+    traces = {}
+    for gen in context.plan().generators:
+        trace = getattr(gen, 'generation', None)
+        if isinstance(trace, np.ndarray) and len(trace) >= timesteps:
+            traces[id(trace)] = trace[:timesteps]
+    return list(traces.values())
+
+
+def features(context, length):
+    """Return the feature vector of each block of length hours.
+
+    The features are the hourly demand (relative to the peak) and
+    the hourly trace data. Demand is scaled to count as much as all
+    of the traces together. Hours after the last whole block are
+    ignored.
+    """
+    demand = context.plan().total_demand
+    traces = _traces(context)
+    peak = demand.max()
+    columns = [demand / peak * np.sqrt(max(1, len(traces)))
+               if peak > 0 else demand] + traces
+    blocks = len(demand) // length
+    data = np.column_stack(columns)[:blocks * length]
+    # One row per block, hour by hour.
+    return data.reshape(blocks, length * len(columns))
+
+
+def _distances(data, centres):
+    """Return the squared distance of each row of data to each centre."""
+    dist = (data ** 2).sum(axis=1)[:, None] - 2 * data @ centres.T + \
+        (centres ** 2).sum(axis=1)[None, :]
+    return np.maximum(dist, 0)
+
+
+def kmeans(data, k, seed=0, iterations=100):
+    """Cluster the rows of data into k clusters.
+
+    Centres are seeded by k-means++. Return the cluster of each row
+    and the centres.
+    """
+    rng = np.random.default_rng(seed)
+    centres = data[[rng.integers(len(data))]]
+    while len(centres) < k:
+        nearest = _distances(data, centres).min(axis=1)
+        if nearest.sum() > 0:
+            index = rng.choice(len(data), p=nearest / nearest.sum())
+        else:
+            index = rng.integers(len(data))
+        centres = np.vstack([centres, data[index]])
+    labels = None
+    for _ in range(iterations):
+        new_labels = _distances(data, centres).argmin(axis=1)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        for i in range(k):
+            if (labels == i).any():
+                centres[i] = data[labels == i].mean(axis=0)
+    return labels, centres
+
+
+class Periods():
+    """Representative blocks of hours and their weights.
+
+    Blocks are numbered from the start of the horizon and listed in
+    chronological order. Each block stands for weight blocks of the
+    horizon; the weights sum to the length of the horizon in blocks.
+    """
+
+    def __init__(self, length, blocks, weights):
+        """Construct a set of representative periods."""
+        self.length = length
+        self.blocks = np.asarray(blocks, dtype=int)
+        self.weights = np.asarray(weights, dtype=float)
+
+    def __len__(self):
+        """Return the number of representative blocks."""
+        return len(self.blocks)
+
+    def hours(self):
+        """Return the hours of the horizon in the blocks."""
+        starts = self.blocks[:, None] * self.length
+        return (starts + np.arange(self.length)).ravel()
+
+    def hour_weights(self):
+        """Return the weight of each hour in the blocks."""
+        return np.repeat(self.weights, self.length)
+
+    def __str__(self):
+        """Return a short description of the periods."""
+        hours = len(self) * self.length
+        return f'{len(self)} periods of {self.length} h ' + \
+            f'({hours / self.weights.sum() / self.length:.1%} of the horizon)'
+
+
+def cluster(context, k, length=168, seed=0):
+    """Return k representative periods of length hours for a context."""
+    if k < 1:
+        raise ValueError(f'{k} is not a valid number of periods')
+    data = features(context, length)
+    blocks = len(data)
+    if blocks == 0:
+        raise ValueError(f'horizon is shorter than {length} h')
+    # Hours after the last whole block are spread over the weights.
+    scale = len(context.demand) / (blocks * length)
+    if k >= blocks:
+        return Periods(length, np.arange(blocks), np.full(blocks, scale))
+
+    demand = context.plan().total_demand[:blocks * length]
+    peak = demand.argmax() // length
+    rest = np.delete(np.arange(blocks), peak)
+    chosen, weights = [peak], [1]
+    if k > 1:
+        labels, centres = kmeans(data[rest], k - 1, seed)
+        for i, centre in enumerate(centres):
+            members = rest[labels == i]
+            if len(members) == 0:
+                continue
+            dist = _distances(data[members], centre[None, :])
+            chosen.append(members[dist.argmin()])
+            weights.append(len(members))
+    else:
+        weights[0] = blocks
+    order = np.argsort(chosen)
+    return Periods(length, np.array(chosen)[order],
+                   np.array(weights, dtype=float)[order] * scale)
+
+
+class ReducedContext(Context):
+    """A context that simulates only some representative periods.
+
+    The generators are copies of those of the original context with
+    their trace data cut down to the periods. Energy totals are
+    weighted by context.weights, so costs and the penalties on
+    unserved energy and annual limits are on the scale of the whole
+    horizon. Penalties that read hourly data directly (reserves and
+    minimum regional generation) see the periods unweighted. Runs
+    must keep hourly tables (not summaries).
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, context, periods):
+        """Construct a reduced copy of a context."""
+        self.__dict__.update(context.__dict__)
+        self.periods = periods
+        hours = periods.hours()
+        memo = {}
+        for gen in context.generators:
+            trace = getattr(gen, 'generation', None)
+            if isinstance(trace, np.ndarray):
+                memo[id(trace)] = np.array(trace[hours])
+        self.generators = copy.deepcopy(context.generators, memo)
+        start = context.demand.index[0]
+        self.demand = pd.DataFrame(
+            context.demand.values[hours], columns=context.demand.columns,
+            index=pd.date_range(start, periods=len(hours), freq='H'))
+        self.timesteps = len(self.demand)
+        self.weights = periods.hour_weights()
+        self.spill = pd.DataFrame()
+        self.generation = pd.DataFrame()
+        self.unserved = pd.DataFrame()
+        self.summary = None
+        self.trace = None
+        self.prefix_cache = None
+        self.parameter_groups = []
+        self._plan = None
+
+    def total_demand(self):
+        """Return the weighted total demand."""
+        return np.dot(self.demand.values.sum(axis=1), self.weights)
+
+    def generator_energy(self):
+        """Return the weighted energy supplied by each generator."""
+        return np.array([np.dot(gen.series_power[:self.timesteps],
+                                self.weights)
+                         for gen in self.generators])
+
+    def unserved_energy(self):
+        """Return the weighted total unserved energy."""
+        unserved = self.demand.values.sum(axis=1) - \
+            self.generation.values.sum(axis=1)
+        unserved[np.isclose(unserved, 0)] = 0
+        return np.dot(unserved, self.weights)
+
+    def surplus_energy(self):
+        """Return the weighted total surplus energy."""
+        return np.dot(self.spill.values.sum(axis=1), self.weights)
+
+
+def agreement(pairs):
+    """Return how well reduced fitness values agree with full ones.
+
+    Pairs are (reduced, full) fitness values of the same candidates.
+    Return the number of pairs, the rank correlation of the reduced
+    and full values and the mean relative error of the reduced values
+    (nan if there are too few pairs).
+    """
+    if len(pairs) == 0:
+        return 0, np.nan, np.nan
+    reduced, full = np.array(pairs, dtype=float).T
+    error = np.mean(np.abs(reduced - full) / np.abs(full))
+    if len(pairs) < 2:
+        return len(pairs), np.nan, error
+    ranks = [values.argsort(kind='stable').argsort() for values in
+             (reduced, full)]
+    return len(pairs), np.corrcoef(*ranks)[0, 1], error
@@ -0,0 +1,151 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A compiled simulation plan, cached per scenario.
+
+Everything that the simulation derives from the generator list, the
+regions of interest and the demand is computed once here and reused
+across the thousands of evaluations in an optimisation run. The plan
+is rebuilt only when one of those inputs actually changes.
+"""
+
+import numpy as np
+import pandas as pd
+
+from nemo import generators, regions
+
+parameters = ('capacity', 'maxstorage', 'solarmult', 'shours')
+"""Generator attributes that determine its dispatch."""
+
+
+def signature(gen):
+    """Return the parameters of a generator that affect dispatch.
+
+    These include the size of a hydrogen tank shared with other
+    generators (see generators.HydrogenStorage).
+    """
+    tank = getattr(gen, 'tank', None)
+    return tuple(getattr(gen, attr, None) for attr in parameters) + \
+        (getattr(tank, 'maxstorage', None),)
+
+
+def _key(context):
+    """Return the inputs that a plan is compiled from.
+
+    The demand is identified by its version (see Context.demand)
+    rather than a hash of its values, which would cost more than the
+    rest of a short run.
+    """
+    return (tuple(id(g) for g in context.generators),
+            tuple(id(r) for r in context.regions),
+            context.demand_version)
+
+
+class SimulationPlan():
+    """Derived structures for simulating one scenario.
+
+    Attributes:
+      gindex: indices into context.generators of in-region generators
+      generators: the in-region generators in merit order
+      storage: the in-region generators capable of storage
+      polygon_mask: True for each polygon in the regions of interest
+      demand: polygon demand with out-of-region polygons zeroed
+      total_demand: aggregate demand in each timestep
+      groups: masks over context.generators by class of generator
+      lower, upper: bounds on each optimisation parameter
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, context):
+        """Compile a plan for a context."""
+        gens = context.generators
+        self.gindex = np.array([i for i, g in enumerate(gens)
+                                if g.region() in context.regions],
+                               dtype=int)
+        self.generators = [gens[i] for i in self.gindex]
+        self.storage = [g for g in self.generators if g.storage_p]
+
+        # Zero out polygon demands we don't care about.
+        self.polygon_mask = np.zeros(context.demand.shape[1], dtype=bool)
+        for rgn in context.regions:
+            for poly in rgn.polygons:
+                self.polygon_mask[poly - 1] = True
+        for rgn in [r for r in regions.All if r not in context.regions]:
+            for poly in rgn.polygons:
+                context.demand[poly - 1] = 0
+        self.demand = context.demand.values
+        self.total_demand = self.demand.sum(axis=1)
+
+        hydro = self._mask(gens, lambda g: isinstance(g, generators.Hydro))
+        pumped = self._mask(gens,
+                            lambda g: isinstance(g, generators.PumpedHydro))
+        self.groups = {
+            'fossil': self._mask(
+                gens, lambda g: isinstance(g, generators.Fossil)),
+            'biofuel': self._mask(
+                gens, lambda g: isinstance(g, generators.Biofuel)),
+            'hydro': hydro & ~pumped,
+            'storage': self._mask(gens, lambda g: g.storage_p),
+            'stateless': self._mask(gens, lambda g: g.stateless_p),
+            'synchronous': self._mask(gens, lambda g: g.synchronous_p)}
+
+        self.setters = [setter for g in gens for setter, _, _ in g.setters]
+        self.lower = np.array([lo for g in gens for _, lo, _ in g.setters],
+                              dtype=float)
+        self.upper = np.array([hi for g in gens for _, _, hi in g.setters],
+                              dtype=float)
+        # Parameters set by the plain Generator.set_capacity method
+        # have no side effects and can be assigned directly.
+        self.direct = np.array([
+            getattr(setter, '__func__', None) is
+            generators.Generator.set_capacity for setter in self.setters],
+            dtype=bool)
+        self.direct_generators = [setter.__self__ for setter, direct in
+                                  zip(self.setters, self.direct) if direct]
+        self.other_setters = [setter for setter, direct in
+                              zip(self.setters, self.direct) if not direct]
+
+        self._date_ranges = {}
+        self.key = _key(context)
+
+    @staticmethod
+    def _mask(gens, predicate):
+        """Return a mask of the generators satisfying a predicate."""
+        return np.array([predicate(g) for g in gens], dtype=bool)
+
+    def stale_p(self, context):
+        """Return True if the plan no longer matches the context."""
+        return self.key != _key(context)
+
+    def date_range(self, starthour, endhour):
+        """Return the (cached) hourly date range for a run."""
+        try:
+            return self._date_ranges[(starthour, endhour)]
+        except KeyError:
+            rng = pd.date_range(starthour, endhour, freq='H')
+            self._date_ranges[(starthour, endhour)] = rng
+            return rng
+
+    def clamp(self, caps):
+        """Return a list of parameters clamped to their bounds."""
+        caps = np.asarray(caps, dtype=float)
+        # Check every parameter will be set.
+        assert len(caps) == len(self.setters), \
+            f'{len(self.setters)} != {len(caps)}'
+        # Adding zero turns -0.0 into 0.0.
+        return np.clip(caps, self.lower, self.upper) + 0.0
+
+    def set_capacities(self, caps):
+        """Set generator capacities from a list of parameters."""
+        # keep parameters within bounds
+        values = self.clamp(caps)
+        for gen, cap in zip(self.direct_generators,
+                            (values[self.direct] * 1000).tolist()):
+            gen.capacity = cap
+        for setter, value in zip(self.other_setters,
+                                 values[~self.direct].tolist()):
+            setter(value)
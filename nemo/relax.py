@@ -0,0 +1,207 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A linear programming relaxation of the capacity expansion problem.
+
+Dispatch through the merit order is replaced by the cheapest dispatch
+of a copper plate system: in each hour the generators (curtailing
+their traces if need be) meet the total demand, with non-synchronous
+generation limited to a share of demand (context.nsp_limit).
+Capacities are bounded by the parameter bounds of the generators,
+which include the build limits of each polygon. The annual energy
+limits penalised by evolve are constraints, and unserved energy
+beyond the reliability standard is priced at the value of lost load.
+Capacities and dispatch are chosen together to minimise the total
+cost using the HiGHS solver in SciPy (an optional dependency).
+
+To keep the problem small, curtailment is pooled: the energy spilled
+in each hour is drawn from the synchronous or non-synchronous trace
+generators as a whole, and the variable costs of trace generators
+are charged on all of the energy they could supply. Fuelled
+generators of the same type and costs share one dispatch. Storage is
+not dispatched: pumped hydro is held at its upper bound. Other
+storage, stateful generators (eg, CST) and generators without a
+capacity parameter are not supported. Network limits, reserves and
+minimum regional generation are ignored, so the solution is a
+starting point for the optimiser rather than a bound.
+"""
+
+import numpy as np
+
+from nemo import generators
+
+try:
+    from scipy import sparse
+    from scipy.optimize import linprog
+except ImportError:  # pragma: no cover
+    linprog = None
+
+# Conversion factor between MWh and TWh.
+_twh = pow(10., 6)
+
+
+def supported_p(gen):
+    """Return True if a generator can be sized by the relaxation."""
+    return not gen.storage_p and gen.stateless_p and \
+        len(gen.setters) == 1 and \
+        getattr(gen.setters[0][0], '__func__', None) is \
+        generators.Generator.set_capacity and \
+        isinstance(gen, (generators.TraceGenerator, generators.Fuelled))
+
+
+def _unit_costs(context, gen):
+    """Return the cost of 1 MW of capacity and of 1 MWh of a generator."""
+    capacity = gen.capacity
+    gen.capacity = 1
+    try:
+        costs = context.costs
+        fixed = gen.capcost(costs) / costs.annuityf * context.years + \
+            gen.fixed_om_costs(costs)
+        return fixed, gen.opcost_per_mwh(costs)
+    finally:
+        gen.capacity = capacity
+
+
+def _limits(context, fuelled, args):
+    """Return the annual energy limits as (factors, limit) pairs.
+
+    The factors weight the energy of each fuelled generator towards
+    the limit.
+    """
+    limits = [
+        ([isinstance(g, generators.Hydro) for g in fuelled],
+         args.hydro_limit * _twh * context.years),
+        ([isinstance(g, generators.Biofuel) for g in fuelled],
+         args.bioenergy_limit * _twh * context.years)]
+    if args.fossil_limit < 1:
+        fossil = context.total_demand() * args.fossil_limit * context.years
+        limits.append(([isinstance(g, generators.Fossil) for g in fuelled],
+                       fossil))
+    if args.emissions_limit < np.inf:
+        limits.append(([getattr(g, 'intensity', 0) for g in fuelled],
+                       args.emissions_limit * pow(10, 6) * context.years))
+    return limits
+
+
+class _Problem():
+    """The variables and costs of a relaxation.
+
+    The variables are the capacity of each unit, the hourly dispatch
+    of each group of fuelled units, the hourly synchronous and
+    non-synchronous spills and unserved energy, and the unserved
+    energy beyond the reliability standard.
+    """
+
+    def __init__(self, context, units, voll):
+        """Lay out the variables for the units of a context."""
+        self.hours = len(context.demand)
+        self.weights = context.weights
+        if self.weights is None:
+            self.weights = np.ones(self.hours)
+
+        self.groups = {}
+        self.cost = []
+        self.avail = np.zeros((self.hours, len(units)))
+        for i, gen in enumerate(units):
+            fixed, opcost = _unit_costs(context, gen)
+            if isinstance(gen, generators.TraceGenerator):
+                self.avail[:, i] = gen.generation[:self.hours]
+                fixed += opcost * np.dot(self.avail[:, i], self.weights)
+            else:
+                key = (type(gen), fixed, opcost,
+                       getattr(gen, 'intensity', None))
+                self.groups.setdefault(key, []).append(i)
+            self.cost.append(fixed)
+        self.fuelled = [units[members[0]] for members in self.groups.values()]
+        for gen in self.fuelled:
+            self.cost += list(_unit_costs(context, gen)[1] * self.weights)
+        self.cost += [0] * 3 * self.hours + [voll]
+        self.bounds = [(lower * 1000, upper * 1000)
+                       for gen in units for _, lower, upper in gen.setters]
+        self.bounds += [(0, None)] * (len(self.cost) - len(units))
+
+    def membership(self):
+        """Return the matrix of the units in each fuelled group."""
+        member = np.zeros((len(self.groups), self.avail.shape[1]))
+        for j, members in enumerate(self.groups.values()):
+            member[j, members] = 1
+        return member
+
+
+def relax(context, args, voll=15000):
+    """Solve the relaxation for the generators of a context.
+
+    The hydro, bioenergy, fossil and emissions limits are taken from
+    args (as in nemo.penalties) and unserved energy beyond the
+    reliability standard costs voll $/MWh. Hours are weighted by
+    context.weights if it is set (see nemo.periods). Return the
+    parameters (in the order of context.set_capacities) and the cost
+    in $/MWh. Raise ValueError if a generator is not supported or the
+    problem cannot be solved.
+    """
+    # pylint: disable=too-many-locals
+    if linprog is None:
+        raise ValueError('the LP relaxation requires SciPy')
+    plan = context.plan()
+    params, units = [], []
+    for gen in context.generators:
+        if gen not in plan.generators:
+            # Generators out of the regions are not simulated.
+            params += [lower for _, lower, _ in gen.setters]
+        elif isinstance(gen, generators.PumpedHydro):
+            params += [upper for _, _, upper in gen.setters]
+        elif supported_p(gen):
+            params.append(None)
+            units.append(gen)
+        else:
+            raise ValueError(f'{gen} is not supported by the LP relaxation')
+
+    problem = _Problem(context, units, voll)
+    hours, avail = problem.hours, problem.avail
+    groups = len(problem.groups)
+    demand = plan.total_demand
+    nonsync = np.array([not gen.synchronous_p for gen in units], dtype=bool)
+    eye = sparse.identity(hours)
+
+    # Each hour: supply equals demand, fuelled dispatch is at most the
+    # capacity of its group, spills are at most the traces they come
+    # from and non-synchronous supply is limited.
+    balance = sparse.hstack([avail, sparse.kron(np.ones((1, groups)), eye),
+                             -eye, -eye, eye, sparse.csr_matrix((hours, 1))])
+    hourly = sparse.bmat([
+        [-sparse.kron(problem.membership(), np.ones((hours, 1))),
+         sparse.identity(hours * groups), None, None],
+        [sparse.csr_matrix(-avail * ~nonsync), None, eye, None],
+        [sparse.csr_matrix(-avail * nonsync), None, None, eye],
+        [sparse.csr_matrix(avail * nonsync), None, None, -eye]])
+    hourly = sparse.hstack([hourly, sparse.csr_matrix((hourly.shape[0],
+                                                       hours + 1))])
+    bound = [np.zeros((groups + 2) * hours), demand * context.nsp_limit]
+
+    # Annual energy limits and unserved energy beyond the standard.
+    limits = _limits(context, problem.fuelled, args)
+    annual = np.zeros((len(limits) + 1, len(problem.cost)))
+    for j, (factors, limit) in enumerate(limits):
+        annual[j, len(units):len(units) + hours * groups] = \
+            np.kron(factors, problem.weights)
+        bound.append([limit])
+    annual[-1, -hours - 1:-1] = problem.weights
+    annual[-1, -1] = -1
+    bound.append([context.total_demand() * context.relstd / 100])
+
+    result = linprog(problem.cost,
+                     A_ub=sparse.vstack([hourly, sparse.csr_matrix(annual)]),
+                     b_ub=np.concatenate(bound), A_eq=balance, b_eq=demand,
+                     bounds=problem.bounds, method='highs')
+    if result.status != 0:
+        raise ValueError(f'LP relaxation failed: {result.message}')
+
+    lower, upper = np.array(problem.bounds[:len(units)], dtype=float).T
+    capacities = iter(np.clip(result.x[:len(units)], lower, upper) / 1000)
+    params = [next(capacities) if value is None else value
+              for value in params]
+    return params, result.fun / context.total_demand()
@@ -9,7 +9,7 @@
 
 """Supply side scenarios."""
 
-from nemo import configfile, regions
+from nemo import configfile, regions, tying
 from nemo.generators import (CCGT, CCGT_CCS, CST, OCGT, Battery, Biofuel,
                              Black_Coal, CentralReceiver, Coal_CCS,
                              DemandResponse, Hydro, PumpedHydro, PV1Axis, Wind,
@@ -126,6 +126,8 @@ def re100(context):
         else:
             raise UnreachableError('unhandled generator type')
     context.generators = result
+    context.parameter_groups = tying.regional(
+        result, [PV1Axis, Wind, WindOffshore, CentralReceiver, Biofuel])
 
 
 def re100_batteries(context):
@@ -176,6 +178,8 @@ def re100_one_region(context, region):
     newlist += [g for g in context.generators if
                 isinstance(g, Biofuel) and g.region() is region]
     context.generators = newlist
+    context.parameter_groups = tying.regional(
+        newlist, [PV1Axis, Wind, CentralReceiver, Biofuel])
 
 
 def re_plus_ccs(context):
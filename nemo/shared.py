@@ -0,0 +1,92 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Read-only arrays shared between processes.
+
+A parent process publishes large read-only arrays (eg, trace data)
+as memory-mapped files in a directory named by the NEMO_SHARED
+environment variable, which worker processes inherit. Workers map
+the files read-only, so each array is held in memory once however
+many workers there are.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+ENVIRON = 'NEMO_SHARED'
+"""Environment variable naming the directory of shared arrays."""
+
+
+def _filename(directory, key):
+    """Return the filename of the shared array for a key."""
+    return os.path.join(directory,
+                        hashlib.sha256(key.encode()).hexdigest() + '.npy')
+
+
+def lookup(key):
+    """Return a read-only view of the shared array for a key (or None)."""
+    directory = os.environ.get(ENVIRON)
+    if not directory:
+        return None
+    try:
+        return np.load(_filename(directory, key), mmap_mode='r')
+    except OSError:
+        return None
+
+
+class DataPlane():
+    """A directory of shared arrays, published by this process.
+
+    Worker processes must be started after the data plane is created
+    so that they inherit the environment variable.
+    """
+
+    def __init__(self):
+        """Construct an empty data plane."""
+        self.directory = tempfile.mkdtemp(prefix='nemo-shared-')
+        self.keys = []
+        os.environ[ENVIRON] = self.directory
+
+    def publish(self, key, array):
+        """Publish an array under a key."""
+        filename = _filename(self.directory, key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp',
+                                         delete=False) as tmpfile:
+            np.save(tmpfile, np.ascontiguousarray(array))
+        # Renaming is atomic, so readers never see a partial file.
+        os.replace(tmpfile.name, filename)
+        self.keys.append(key)
+
+    def publish_traces(self, context):
+        """Publish the trace data of the generators in a context.
+
+        Trace data is published under the trace filename (see
+        generators.CSVTraceGenerator).
+        """
+        for cls in {type(gen) for gen in context.generators}:
+            if getattr(cls, 'csvdata', None) is not None and \
+                    cls.csvfilename not in self.keys:
+                self.publish(cls.csvfilename, cls.csvdata)
+
+    def close(self):
+        """Withdraw the shared arrays."""
+        if os.environ.get(ENVIRON) == self.directory:
+            del os.environ[ENVIRON]
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.keys = []
+
+    def __enter__(self):
+        """Enter a context (returning the data plane)."""
+        return self
+
+    def __exit__(self, *exc):
+        """Withdraw the shared arrays on leaving a context."""
+        self.close()
@@ -12,62 +12,368 @@ from math import isclose
 import numpy as np
 import pandas as pd
 
-from nemo import regions
+from nemo import accumulators, fleet, generators, invariants, peaker, tracer
 
 
-def _sim(context, date_range):
+class _Tables():
+    """Record the dispatch in hour by generator tables.
+
+    Generators are numbered by their position in the merit order of
+    generators in the regions of interest.
+    """
+
+    def __init__(self, generation, spill):
+        """Construct a recorder for generation and spill arrays."""
+        self.generation = generation
+        self.spill = spill
+
+    def add(self, hours, gidx, gen, power, spilled):
+        """Record the power and spills of a generator."""
+        self.generation[hours, gidx] = power
+        self.spill[hours, gidx] = spilled
+
+    def store(self, hour, gidx, spilled, unstored):
+        """Record the spills of a generator that were not stored."""
+        self.spill[hour, gidx] = unstored
+
+    def add_unserved(self, hours, unserved):
+        """Unserved energy is calculated from the tables by run()."""
+
+    def resize(self, gidx, gen, change):
+        """Capacities are not recorded in the tables."""
+
+    def finish(self, context, date_range):
+        """Save the tables in the context."""
+        # Change the numpy arrays to dataframes for human consumption
+        context.generation = pd.DataFrame(index=date_range,
+                                          data=self.generation)
+        context.spill = pd.DataFrame(index=date_range, data=self.spill)
+        context.summary = None
+
+
+class _Summary():
+    """Feed the dispatch to online accumulators (see nemo.accumulators).
+
+    Results for single hours are buffered in a block of hours and
+    passed on to the accumulators a block at a time. If streamed is
+    True, every generator is dispatched in an hour before any later
+    hour, so the hours of each block are closed once it is passed on.
+    """
+
+    block = 168
+    """Number of hours buffered."""
+
+    def __init__(self, context, names, timesteps, streamed=False):
+        """Construct a recorder for the named accumulators."""
+        plan = context.plan()
+        self.gindex = plan.gindex
+        self.generators = plan.generators
+        self.results = accumulators.create(names)
+        self.accumulators = list(self.results.values())
+        for acc in self.accumulators:
+            acc.start(context, timesteps)
+        self.start = 0
+        self.end = min(self.block, timesteps)
+        self.timesteps = timesteps
+        self.streamed = streamed
+        shape = (self.block, len(self.generators))
+        self.power = np.zeros(shape)
+        self.spilled = np.zeros(shape)
+        self.stored = np.zeros(shape)
+        self.unserved = np.zeros(self.block)
+
+    def _locate(self, hour):
+        """Return the buffer row for an hour (flushing if necessary)."""
+        if not self.start <= hour < self.end:
+            self.flush()
+            self.start = hour - hour % self.block
+            self.end = min(self.start + self.block, self.timesteps)
+        return hour - self.start
+
+    def flush(self):
+        """Pass the buffered hours to the accumulators."""
+        hours = slice(self.start, self.end)
+        rows = self.end - self.start
+        active = self.power.any(axis=0) | self.spilled.any(axis=0)
+        for gidx in np.flatnonzero(active):
+            for acc in self.accumulators:
+                acc.add(hours, self.gindex[gidx], self.generators[gidx],
+                        self.power[:rows, gidx], self.spilled[:rows, gidx])
+        for gidx in np.flatnonzero(self.stored.any(axis=0)):
+            for acc in self.accumulators:
+                acc.store(hours, self.gindex[gidx], self.stored[:rows, gidx])
+        if self.unserved.any():
+            for acc in self.accumulators:
+                acc.add_unserved(hours, self.unserved[:rows])
+        for buf in [self.power, self.spilled, self.stored, self.unserved]:
+            buf.fill(0)
+        if self.streamed:
+            for acc in self.accumulators:
+                acc.close(self.end)
+
+    def add(self, hours, gidx, gen, power, spilled):
+        """Add the power and spills of a generator."""
+        if isinstance(gen, fleet.MergedGenerator):
+            # Members are added individually by fleet.split().
+            return
+        if isinstance(hours, slice):
+            for acc in self.accumulators:
+                acc.add(hours, self.gindex[gidx], gen, power, spilled)
+        else:
+            row = self._locate(hours)
+            self.power[row, gidx] = power
+            self.spilled[row, gidx] = spilled
+
+    def store(self, hour, gidx, spilled, unstored):
+        """Account for the spills of a generator that were stored."""
+        self.stored[self._locate(hour), gidx] += spilled - unstored
+
+    def add_unserved(self, hours, unserved):
+        """Add the unserved demand in an hour (or a slice of hours)."""
+        if isinstance(hours, slice):
+            for acc in self.accumulators:
+                acc.add_unserved(hours, unserved)
+        else:
+            self.unserved[self._locate(hours)] = unserved
+
+    def resize(self, gidx, gen, change):
+        """Account for a change in the capacity of a generator."""
+        for acc in self.accumulators:
+            acc.resize(gen, change)
+
+    def finish(self, context, _):
+        """Save the accumulators in the context."""
+        self.flush()
+        for acc in self.accumulators:
+            acc.close(self.timesteps)
+        context.generation = pd.DataFrame()
+        context.spill = pd.DataFrame()
+        context.unserved = pd.DataFrame()
+        context.summary = self.results
+
+
+def _setup(context, date_range, record=None, keep=0):
+    """Prepare for a simulation run.
+
+    The first keep generators in the merit order retain their state
+    from the previous run. Return the simulation plan and a recorder
+    for the dispatch (by default, new hour by generator tables).
+    """
+    plan = context.plan()
+    kept = {id(gen) for gen in plan.generators[:keep]}
     # reset generator internal state
     for gen in context.generators:
-        gen.reset()
+        if id(gen) not in kept:
+            gen.set_timesteps(len(date_range))
+            gen.reset()
+    context.resets += 1
+
+    if record is None:
+        shape = (len(date_range), len(context.generators))
+        record = _Tables(np.zeros(shape), np.zeros(shape))
+    return plan, record
+
+
+def _sim(context, date_range, record=None, compact=False, budget=None):
+    """Hour-major engine: step every generator in each hour in turn."""
+    plan, record = _setup(context, date_range, record)
+    residual = plan.total_demand[:len(date_range)].copy()
+    capacity = 0 if budget is None else budget.pending
+    units = list(enumerate(plan.generators))
+    if compact:
+        # Spills must reach storage one generator at a time.
+        units = fleet.compact(units, len(date_range),
+                              merge_spills=not plan.storage)
+
+    for hour in range(len(date_range)):
+        residual_hour_demand = plan.total_demand[hour]
+        residual_hour_demand, _ = \
+            _dispatch_units(context, hour, residual_hour_demand,
+                            residual_hour_demand * context.nsp_limit,
+                            plan.storage, units, record)
+        record.add_unserved(hour, residual_hour_demand)
+        residual[hour] = residual_hour_demand
+        if budget is not None and (hour + 1) % budget.block == 0:
+            budget.check_partial(residual, hour + 1, capacity)
+    fleet.split(units, record)
+    record.finish(context, date_range)
 
-    generation = np.zeros((len(date_range), len(context.generators)))
-    spill = np.zeros((len(date_range), len(context.generators)))
 
-    # Extract generators in the regions of interest.
-    gens = [g for g in context.generators if g.region() in context.regions]
+def _may_spill_p(gen):
+    """Return True if a generator can spill surplus energy."""
+    return isinstance(gen, generators.TraceGenerator) and \
+        not isinstance(gen, generators.Geothermal)
 
-    # Zero out polygon demands we don't care about.
-    for rgn in [r for r in regions.All if r not in context.regions]:
-        for poly in rgn.polygons:
-            context.demand[poly - 1] = 0
 
-    # We are free to scribble all over demand_copy. Use ndarray for speed.
-    demand_copy = context.demand.copy().values
-    residual_demand = demand_copy.sum(axis=1)
+def _partition(gens, limited=None):
+    """Partition the merit order for the generator-major engine.
 
-    for hour, date in enumerate(date_range):
-        hour_demand = demand_copy[hour]
-        residual_hour_demand = residual_demand[hour]
+    Return the indices (prefix, tail) such that gens[:prefix] and
+    gens[tail:] can be dispatched one generator at a time across the
+    whole horizon. Generators in between must be dispatched hour by
+    hour because spills into storage couple them within an hour.
+    Likewise, generators flagged in limited share a running energy
+    budget (see nemo.limits) and are dispatched hour by hour.
+    """
+    if limited is None:
+        limited = [False] * len(gens)
+    prefix = 0
+    while prefix < len(gens) and gens[prefix].stateless_p and \
+            not limited[prefix]:
+        prefix += 1
+    if not any(g.storage_p for g in gens) and not any(limited):
+        # Without storage, the only coupling between generators is
+        # the residual demand handed down the merit order.
+        return prefix, prefix
+    tail = len(gens)
+    while tail > prefix and gens[tail - 1].stateless_p and \
+            not _may_spill_p(gens[tail - 1]) and not limited[tail - 1]:
+        tail -= 1
+    return prefix, tail
 
-        if context.verbose:
-            print('STEP:', date)
-            print('DEMAND:', {a: round(b, 2) for a, b in
-                              enumerate(hour_demand)})
 
-        _dispatch(context, hour, residual_hour_demand, gens, generation, spill)
+def _dispatch_column(gen, gidx, residual, async_demand, record, trace=None):
+    """Dispatch one generator over every hour.
 
-        if context.verbose:
-            print('ENDSTEP:', date)
+    The residual and async_demand arrays are updated in place.
+    """
+    if gen.synchronous_p:
+        demand = residual
+    else:
+        demand = np.minimum(async_demand, residual)
 
-    # Change the numpy arrays to dataframes for human consumption
-    context.generation = pd.DataFrame(index=date_range, data=generation)
-    context.spill = pd.DataFrame(index=date_range, data=spill)
+    power, spl = gen.step_series(demand)
 
+    record.add(slice(0, len(power)), gidx, gen, power, spl)
+    if not gen.synchronous_p:
+        np.maximum(0, async_demand - power, out=async_demand)
+    np.maximum(0, residual - power, out=residual)
+    if trace is not None:
+        trace.dispatch_series(gidx, power, spl, residual, async_demand)
 
-def _store_spills(context, hour, gen, generators, spl):
+
+def _sim_column(context, date_range, record=None, compact=False,
+                budget=None, sized=None):
+    """Generator-major engine: dispatch each generator over all hours.
+
+    Stateless generators are dispatched as array operations across
+    the whole horizon. Where storage is present, the stretch of the
+    merit order that is coupled to it by spills is dispatched hour by
+    hour, storing the spills of the generators ahead of it first.
+    The results are identical to the hour-major engine.
+
+    If context.prefix_cache is set, the dispatch ahead of the first
+    changed generator is reused from the previous run (see
+    nemo.sweep.PrefixCache).
+
+    If sized is given (the last generator in the merit order), its
+    capacity is chosen from the residual demand left by the rest of
+    the fleet before it is dispatched (see nemo.peaker).
+    """
+    gens = context.plan().generators
+    limits = context.energy_limits
+    prefix, tail = _partition(gens, None if limits is None
+                              else limits.limited)
+    cache = context.prefix_cache
+    reused = 0 if cache is None else cache.restart(context, date_range)
+    if sized is not None:
+        # The sized generator is always dispatched afresh.
+        reused = min(reused, len(gens) - 1)
+    plan, record = _setup(context, date_range, record, reused)
+    residual = plan.total_demand[:len(date_range)].copy()
+    async_demand = residual * context.nsp_limit
+    if cache is not None:
+        record = cache.resume(context, record, reused, residual,
+                              async_demand, reused >= tail)
+    if budget is not None and reused > 0:
+        budget.dispatched(sum(gen.capacity for gen in gens[:reused]))
+        budget.check_series(residual)
+    units = list(enumerate(gens))
+    if sized is not None:
+        units.pop()
+    head, units, rest = units[reused:prefix], \
+        units[max(reused, prefix):tail], units[max(reused, tail):]
+    if compact:
+        head = fleet.compact(head, len(date_range))
+        units = fleet.compact(units, len(date_range), merge_spills=False)
+        rest = fleet.compact(rest, len(date_range))
+
+    for gidx, gen in head:
+        _dispatch_column(gen, gidx, residual, async_demand, record,
+                         context.trace)
+        if cache is not None:
+            cache.checkpoint(gidx, residual, async_demand)
+        if budget is not None:
+            budget.dispatched(gen.capacity)
+            budget.check_series(residual)
+    fleet.split(head, record)
+
+    if prefix < tail and reused < tail:
+        # Spills from the generators ahead of the hourly stretch.
+        spills = [g.series_spilled[:len(date_range)] for g in gens[:prefix]]
+        spills = np.column_stack(spills + [np.zeros(len(date_range))])
+        capacity = sum(gen.capacity for _, gen in units)
+        for hour in range(len(date_range)):
+            # Store spills from the generators ahead of the hourly
+            # stretch before any storage is dispatched in this hour.
+            for gidx in np.flatnonzero(spills[hour] > 0):
+                spl = spills[hour, gidx]
+                record.store(hour, gidx, spl,
+                             _store_spills(context, hour, gens[gidx],
+                                           plan.storage, spl))
+            residual[hour], async_demand[hour] = \
+                _dispatch_units(context, hour, residual[hour],
+                                async_demand[hour], plan.storage, units,
+                                record)
+            if budget is not None and (hour + 1) % budget.block == 0:
+                budget.check_partial(residual, hour + 1, capacity)
+        fleet.split(units, record)
+        if cache is not None:
+            cache.checkpoint(tail - 1, residual, async_demand)
+        if budget is not None:
+            budget.dispatched(capacity)
+            budget.check_series(residual)
+
+    for gidx, gen in rest:
+        _dispatch_column(gen, gidx, residual, async_demand, record,
+                         context.trace)
+        if cache is not None:
+            cache.checkpoint(gidx, residual, async_demand)
+        if budget is not None:
+            budget.dispatched(gen.capacity)
+            budget.check_series(residual)
+    fleet.split(rest, record)
+
+    if sized is not None:
+        gidx = len(gens) - 1
+        capacity = sized.capacity
+        sized.capacity = peaker.Peaker(context, sized, residual).size()
+        record.resize(gidx, sized, sized.capacity - capacity)
+        _dispatch_column(sized, gidx, residual, async_demand, record,
+                         context.trace)
+        if cache is not None:
+            cache.checkpoint(gidx, residual, async_demand)
+        if budget is not None:
+            budget.dispatched(capacity)
+            budget.check_series(residual)
+    record.add_unserved(slice(0, len(residual)), residual)
+    record.finish(context, date_range)
+
+
+def _store_spills(context, hour, gen, storage, spl):
     """Store spills from a generator into any storage."""
-    assert spl > 0, f'{spl} is <= 0'
-    for other in list(g for g in generators if g.storage_p):
+    assert not generators.inline_checks or spl > 0, f'{spl} is <= 0'
+    for other in storage:
         stored = other.store(hour, spl)
         spl -= stored
         if spl < 0 and isclose(spl, 0, abs_tol=1e-6):
             spl = 0
-        assert spl >= 0
+        assert not generators.inline_checks or spl >= 0
 
         # energy stored <= energy transferred, according to store's RTE
-        if context.verbose:
-            # show the energy transferred, not stored
-            print('STORE:', gen, '->', other, f'({stored:.1f})')
+        if context.trace is not None:
+            # record the energy transferred, not stored
+            context.trace.store(hour, gen, other, stored)
 
         if spl == 0:
             # early exit
@@ -75,59 +381,213 @@ def _store_spills(context, hour, gen, generators, spl):
     return spl
 
 
-def _dispatch(context, hour, residual_hour_demand, gens, generation, spill):
-    """Dispatch power from each generator in merit (list) order."""
+def _dispatch(context, hour, residual_hour_demand, gens, generation, spill,
+              storage=None):
+    """Dispatch power from each generator in merit (list) order.
+
+    Spills are stored in the storage-capable generators in storage
+    (by default, those in gens).
+    """
+    if storage is None:
+        storage = [g for g in gens if g.storage_p]
     # async_demand is the maximum amount of the demand in this
     # hour that can be met from non-synchronous
     # generation. Non-synchronous generation in excess of this
     # value must be spilled.
     async_demand = residual_hour_demand * context.nsp_limit
+    _dispatch_units(context, hour, residual_hour_demand, async_demand,
+                    storage, enumerate(gens), _Tables(generation, spill))
 
-    for gidx, generator in enumerate(gens):
+
+def _dispatch_units(context, hour, residual_hour_demand, async_demand,
+                    storage, units, record):
+    """Dispatch power from (index, generator) units in merit order.
+
+    Return the residual demand and async demand that remain.
+    """
+    trace = context.trace
+    limits = context.energy_limits
+    for gidx, generator in units:
         if not generator.synchronous_p and async_demand < residual_hour_demand:
-            gen, spl = generator.step(hour, async_demand)
+            demand = async_demand
+        else:
+            demand = residual_hour_demand
+        if limits is not None and limits.limited[gidx]:
+            demand = min(demand, limits.available(gidx, hour))
+            gen, spl = generator.step(hour, demand)
+            limits.use(gidx, hour, gen)
         else:
-            gen, spl = generator.step(hour, residual_hour_demand)
-        assert gen < residual_hour_demand or \
+            gen, spl = generator.step(hour, demand)
+        assert not generators.inline_checks or \
+            gen < residual_hour_demand or \
             isclose(gen, residual_hour_demand), \
             f"generation ({gen:.4f}) > demand " + \
             f"({residual_hour_demand:.4f}) for {generator}"
-        generation[hour, gidx] = gen
+        record.add(hour, gidx, generator, gen, spl)
 
         if not generator.synchronous_p:
             async_demand -= gen
-            assert async_demand > 0 or isclose(async_demand, 0, abs_tol=1e-6)
+            assert not generators.inline_checks or async_demand > 0 or \
+                isclose(async_demand, 0, abs_tol=1e-6)
             async_demand = max(0, async_demand)
 
         residual_hour_demand -= gen
-        assert residual_hour_demand > 0 or \
+        assert not generators.inline_checks or \
+            residual_hour_demand > 0 or \
             isclose(residual_hour_demand, 0, abs_tol=1e-6)
         residual_hour_demand = max(0, residual_hour_demand)
 
-        if context.verbose:
-            print(f'GENERATOR: {generator},',
-                  f'generation: {gen:.1f}',
-                  f'spill: {spl:.1f}',
-                  f'residual-demand: {residual_hour_demand:.1f}',
-                  f'async-demand: {async_demand:.1f}')
+        if trace is not None:
+            trace.dispatch(hour, gidx, gen, spl, residual_hour_demand,
+                           async_demand)
 
         if spl > 0:
-            spill[hour, gidx] = \
-                _store_spills(context, hour, generator, gens, spl)
+            record.store(hour, gidx, spl,
+                         _store_spills(context, hour, generator, storage,
+                                       spl))
+    return residual_hour_demand, async_demand
 
 
-def run(context, starthour=None, endhour=None):
-    """Run the simulation."""
+engines = {'hourly': _sim,
+           'column': _sim_column}
+"""Simulation engines, selectable by name in run()."""
+
+modes = ['inline', 'fast', 'checked']
+"""How invariants are checked: every step, never or after the run."""
+
+
+def run(context, starthour=None, endhour=None, engine='hourly',
+        compact=False, summary=None, mode='inline', budget=None,
+        size_peaker=False):
+    """Run the simulation.
+
+    The engine argument selects the hour-major ('hourly') or the
+    faster generator-major ('column') simulation engine. If compact
+    is True, interchangeable generators are dispatched together and
+    generators with no capacity are skipped (see nemo.fleet).
+
+    If summary is a list of accumulator names, no hourly tables are
+    kept. Instead, context.summary is set to a dictionary of the
+    named accumulators (see nemo.accumulators). With the 'hourly'
+    engine, no compaction and outside 'checked' mode, the run is
+    streamed: the generator time series keep only the latest hour
+    (see nemo.generators.SeriesWindow), so memory use does not grow
+    with the horizon.
+
+    If context.prefix_cache is set, the 'column' engine reuses the
+    dispatch of the previous run up to the first generator that has
+    changed (see nemo.sweep). Compaction is disabled while reusing.
+
+    If context.trace is set, the dispatch is recorded in the trace
+    (see nemo.tracer). Compaction is disabled while tracing. If
+    context.verbose is set (and there is no trace), the dispatch is
+    traced and printed after the run.
+
+    If budget is a nemo.budget.Budget, the run is abandoned with
+    nemo.types.BudgetExceeded as soon as the unserved energy puts the
+    candidate beyond the budget.
+
+    If size_peaker is True, the capacity of the last generator in the
+    merit order is set during the run to the least that meets the
+    reliability standard (context.relstd), within its bounds. This
+    requires the 'column' engine and a generator that can be sized in
+    closed form (see nemo.peaker.candidate). The generator starts the
+    run at its upper bound, so any budget is not tightened.
+
+    If context.energy_limits is set, the generators under an energy
+    or emissions limit stop dispatching when it is used up (see
+    nemo.limits). The sized generator must not be under a limit. The
+    'column' engine first dispatches without the limits and only
+    runs again, without compaction, if a limit would have bound.
+
+    In 'inline' mode (the default), invariants are asserted in every
+    step. In 'fast' mode they are not checked. In 'checked' mode they
+    are checked after the run and nemo.types.InvariantError reports
+    the first violation (see nemo.invariants).
+    """
     if not isinstance(context.regions, list):
         raise TypeError
+    try:
+        simulate = engines[engine]
+    except KeyError as exc:
+        raise ValueError(f'unknown engine: {engine}') from exc
+    if mode not in modes:
+        raise ValueError(f'unknown mode: {mode}')
+    sized = None
+    if size_peaker:
+        if engine != 'column':
+            raise ValueError('peaker sizing requires the column engine')
+        sized = peaker.candidate(context)
+        if sized is None:
+            raise ValueError('last generator in the merit order '
+                             'cannot be sized')
+        if context.energy_limits is not None and \
+                context.energy_limits.covers_p(context, sized):
+            raise ValueError('sized generator is under an energy limit')
+        sized.set_capacity(sized.setters[0][2])
 
+    plan = context.plan()
     if starthour is None:
         starthour = context.demand.index.min()
     if endhour is None:
         endhour = context.demand.index.max()
-    date_range = pd.date_range(starthour, endhour, freq='H')
+    date_range = plan.date_range(starthour, endhour)
+
+    limits = context.energy_limits
+    if limits is not None and engine == 'column' and \
+            context.trace is None and not context.verbose:
+        # Dispatch without the limits first. If none of them would
+        # have bound in any hour, the dispatch is the same with them.
+        context.energy_limits = None
+        try:
+            run(context, starthour, endhour, engine, compact, summary,
+                mode, budget, size_peaker)
+        finally:
+            context.energy_limits = limits
+        if limits.within_p(context, date_range):
+            return
 
-    _sim(context, date_range)
+    verbose_trace = context.verbose and context.trace is None
+    if verbose_trace:
+        context.trace = tracer.DispatchTrace()
+    if context.prefix_cache is not None or \
+            context.energy_limits is not None:
+        compact = False
+    if context.trace is not None:
+        context.trace.start(context, date_range)
+        compact = False
+        if context.prefix_cache is not None:
+            # Trace every generator.
+            context.prefix_cache.clear()
+    record = None
+    # In a streamed run, the series keep only the latest hour.
+    streamed = summary is not None and engine == 'hourly' and \
+        not compact and mode != 'checked'
+    if summary is not None:
+        record = _Summary(context, summary, len(date_range), streamed)
+    inline_checks = generators.inline_checks
+    windowed_series = generators.windowed_series
+    generators.inline_checks = mode == 'inline'
+    generators.windowed_series = streamed
+    try:
+        if budget is not None:
+            budget.start(context, date_range)
+        if context.energy_limits is not None:
+            context.energy_limits.start(context, date_range)
+        if sized is not None:
+            simulate(context, date_range, record, compact, budget, sized)
+        else:
+            simulate(context, date_range, record, compact, budget)
+    finally:
+        generators.inline_checks = inline_checks
+        generators.windowed_series = windowed_series
+        if verbose_trace:
+            print(context.trace.render())
+            context.trace = None
+    if mode == 'checked':
+        invariants.check(context, date_range)
+    if summary is not None:
+        return
 
     # Calculate unserved energy.
     agg_demand = context.demand.sum(axis=1)
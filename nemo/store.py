@@ -0,0 +1,282 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A persistent store of simulation results.
+
+Results are kept on disk in a directory, one compressed .npz file per
+run, named by a hash of everything that determines the dispatch: the
+demand and trace data, the regions, the generators and their
+parameters and the non-synchronous penetration limit. Costs do not
+affect the dispatch and are recalculated from the stored energy, so
+results can be shared between cost scenarios.
+
+Files are written under a temporary name and renamed into place, so
+parallel workers can share a store safely. The store is kept below a
+size limit by removing the least recently used results.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from nemo import accumulators, generators
+from nemo.plan import signature
+
+# Fingerprints of the simulation data, by plan key.
+_fingerprints = {}
+
+
+def fingerprint(context):
+    """Return a hash of the demand, trace data and generators."""
+    plan = context.plan()
+    try:
+        return _fingerprints[plan.key]
+    except KeyError:
+        pass
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(context.demand.values).tobytes())
+    digest.update(','.join(rgn.id for rgn in context.regions).encode())
+    for gen in context.generators:
+        digest.update(f'{type(gen).__name__}:{gen.polygon}:{gen.label}'
+                      .encode())
+        trace = getattr(gen, 'generation', None)
+        if isinstance(trace, np.ndarray):
+            digest.update(np.ascontiguousarray(trace).tobytes())
+    _fingerprints[plan.key] = digest.hexdigest()
+    return _fingerprints[plan.key]
+
+
+def key(context, scope=None):
+    """Return the store key for a run of a context.
+
+    The scope (eg, the scenario name and demand modifiers) must be
+    serialisable as JSON.
+    """
+    digest = hashlib.sha256(fingerprint(context).encode())
+    digest.update(json.dumps(scope, sort_keys=True).encode())
+    params = [[np.nan if value is None else value
+               for value in signature(gen)] for gen in context.generators]
+    digest.update(np.array(params, dtype=float).tobytes())
+    digest.update(np.array([context.nsp_limit, len(context.demand)],
+                           dtype=float).tobytes())
+    # Energy limits enforced in dispatch change the results.
+    limits = context.energy_limits
+    settings = None if limits is None else list(limits.settings)
+    digest.update(json.dumps(settings).encode())
+    return digest.hexdigest()
+
+
+def _series(gens, attr, timesteps):
+    """Return a time series of each generator as a column of an array."""
+    columns = [getattr(gen, attr)[:timesteps] for gen in gens]
+    # The extra column allows for an empty list of generators.
+    return np.column_stack(columns + [np.zeros(timesteps)])[:, :-1]
+
+
+def snapshot(context, tables=False):
+    """Return the results of a run as a dictionary of arrays.
+
+    The results are the energy supplied and spilled by each
+    generator, the hourly unserved demand, the hourly headroom of the
+    reserve generators and spills, and the generator capacities
+    (which a run may set, see nemo.peaker).
+    If tables is True, the hourly generation and spills of a full
+    (not summary) run are included.
+    """
+    if tables and context.spill.empty:
+        raise ValueError('hourly tables require a full run')
+    if any(isinstance(gen.series_power, generators.SeriesWindow)
+           for gen in context.generators):
+        raise ValueError('a streamed run keeps no time series')
+    plan = context.plan()
+    timesteps = len(plan.total_demand)
+    power = _series(plan.generators, 'series_power', timesteps)
+    if context.accumulator('energy') is not None:
+        spilled = context.accumulator('energy').spilled.copy()
+    elif not context.spill.empty:
+        spilled = np.zeros(len(context.generators))
+        spilled[plan.gindex] = context.spill.values.sum(axis=0)
+    else:
+        # Without storage accounting, take the spills as generated.
+        spilled = np.array([gen.series_spilled[:timesteps].sum()
+                            for gen in context.generators])
+    reserve = np.zeros(timesteps)
+    reserve_spilled = np.zeros(timesteps)
+    for gen in context.generators:
+        if accumulators.reserve_p(gen):
+            reserve += gen.capacity - gen.series_power[:timesteps]
+        reserve_spilled += gen.series_spilled[:timesteps]
+    results = {'energy': np.array([gen.series_power[:timesteps].sum()
+                                   for gen in context.generators]),
+               'spilled': spilled,
+               'unserved': plan.total_demand - power.sum(axis=1),
+               'reserve': reserve,
+               'reserve_spilled': reserve_spilled,
+               'capacity': np.array([gen.capacity
+                                     for gen in context.generators],
+                                    dtype=float)}
+    if tables:
+        results['generation'] = power
+        results['series_spilled'] = _series(plan.generators,
+                                            'series_spilled', timesteps)
+        results['spill'] = context.spill.values
+        results['runhours'] = np.array([getattr(gen, 'runhours', np.nan)
+                                        for gen in plan.generators],
+                                       dtype=float)
+    return results
+
+
+def restore(context, results):
+    """Restore the results of a run into a context.
+
+    Without hourly tables, the results are restored as the summary
+    of a run (see nemo.accumulators). With tables, the context and
+    the generator time series are restored as after a full run.
+    """
+    plan = context.plan()
+    if 'capacity' in results:
+        for gen, capacity in zip(context.generators, results['capacity']):
+            gen.capacity = float(capacity)
+    timesteps = len(results['unserved'])
+    date_range = plan.date_range(context.demand.index.min(),
+                                 context.demand.index.max())
+    unserved = pd.Series(results['unserved'], index=date_range)
+    # Ignore unserved events very close to 0 (rounding errors)
+    context.unserved = unserved[~np.isclose(unserved, 0)]
+    if 'generation' not in results:
+        summary = accumulators.create(['energy', 'unserved', 'reserves'])
+        for acc in summary.values():
+            acc.start(context, timesteps)
+        summary['energy'].energy = results['energy']
+        summary['energy'].spilled = results['spilled']
+        summary['unserved'].add_unserved(slice(0, timesteps),
+                                         results['unserved'])
+        summary['reserves'].penalty, summary['reserves'].hours = \
+            accumulators.reserve_shortfall(context.min_reserves,
+                                           results['reserve'],
+                                           results['reserve_spilled'])
+        context.generation = pd.DataFrame()
+        context.spill = pd.DataFrame()
+        context.summary = summary
+        return
+
+    for gidx, gen in enumerate(plan.generators):
+        gen.set_timesteps(timesteps)
+        gen.series_power[:] = results['generation'][:, gidx]
+        gen.series_spilled[:] = results['series_spilled'][:, gidx]
+        if np.isfinite(results['runhours'][gidx]):
+            gen.runhours = int(results['runhours'][gidx])
+    # The generators no longer hold the state of the last run.
+    context.resets += 1
+    # Tables are indexed by merit order, as in sim._Tables.
+    generation = np.zeros((timesteps, len(context.generators)))
+    generation[:, :len(plan.generators)] = results['generation']
+    context.generation = pd.DataFrame(index=date_range, data=generation)
+    context.spill = pd.DataFrame(index=date_range, data=results['spill'])
+    context.summary = None
+
+
+class ResultStore():
+    """A directory of simulation results, limited in size.
+
+    Results are dictionaries of arrays (see snapshot()).
+    """
+
+    prune_interval = 32
+    """Number of results saved between checks of the store size."""
+
+    stale_tmp = 3600
+    """Age (in seconds) of abandoned temporary files to remove."""
+
+    def __init__(self, directory, maxbytes=1 << 30):
+        """Construct a store in a directory (created if necessary)."""
+        self.directory = directory
+        self.maxbytes = maxbytes
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved = 0
+
+    def _path(self, digest):
+        """Return the filename of the results for a key."""
+        return os.path.join(self.directory, digest[:2], digest + '.npz')
+
+    def get(self, digest):
+        """Return the results for a key (or None)."""
+        path = self._path(digest)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                results = {name: npz[name] for name in npz.files}
+            # Mark the results as recently used.
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing (or evicted while being read).
+            self.misses += 1
+            return None
+        self.hits += 1
+        return results
+
+    def put(self, digest, results):
+        """Save the results for a key."""
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp',
+                                         delete=False) as tmpfile:
+            np.savez_compressed(tmpfile, **results)
+        # Renaming is atomic, so readers never see a partial file.
+        os.replace(tmpfile.name, path)
+        self.saved += 1
+        if self.saved % self.prune_interval == 0:
+            self.prune()
+
+    def size(self):
+        """Return the total size of the stored results (in bytes)."""
+        return sum(os.path.getsize(path) for path in self._files())
+
+    def _files(self):
+        """Return the filenames of the stored results."""
+        return glob.glob(os.path.join(self.directory, '??', '*.npz'))
+
+    def prune(self):
+        """Remove the least recently used results beyond the size limit."""
+        now = time.time()
+        for path in glob.glob(os.path.join(self.directory, '*.tmp')):
+            try:
+                if now - os.path.getmtime(path) > self.stale_tmp:
+                    os.remove(path)
+            except OSError:
+                pass
+        entries = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.maxbytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                # Removed by another process.
+                pass
+            total -= size
+
+    def __str__(self):
+        """Return a summary of the store statistics."""
+        return (f'{self.hits} hits, {self.misses} misses, '
+                f'{self.saved} saved, {self.evictions} evictions')
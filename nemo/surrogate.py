@@ -0,0 +1,108 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A surrogate model of the fitness landscape.
+
+The surrogate is fitted to the evaluations made so far and predicts
+the fitness of new candidates, so that an optimiser can spend
+simulations on the candidates that look promising (see the --screen
+option of evolve). It is a Gaussian radial basis function model (the
+mean of a Gaussian process) over standardised parameter vectors,
+fitted to a logarithm of the fitness as penalties make the fitness
+span many orders of magnitude.
+"""
+
+import numpy as np
+
+
+def _transform(values):
+    """Return the values on a (signed) logarithmic scale."""
+    values = np.asarray(values, dtype=float)
+    return np.sign(values) * np.log1p(np.abs(values))
+
+
+def _untransform(values):
+    """Return the inverse of _transform()."""
+    return np.sign(values) * np.expm1(np.abs(values))
+
+
+def _distances(first, second):
+    """Return the squared distances between the rows of two arrays."""
+    dist = (first ** 2).sum(axis=1)[:, None] - 2 * first @ second.T + \
+        (second ** 2).sum(axis=1)[None, :]
+    return np.maximum(dist, 0)
+
+
+class Surrogate():
+    """A radial basis function model of the most recent evaluations.
+
+    The model is refitted on the last window evaluations by fit()
+    and makes predictions once it has at least minimum evaluations.
+    The length scale is the median distance between the points.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, window=500, minimum=20, ridge=1e-6):
+        """Construct an empty surrogate."""
+        self.window = window
+        self.minimum = minimum
+        self.ridge = ridge
+        self.points = []
+        self.values = []
+        # Predicted and actual fitness of candidates later evaluated.
+        self.errors = []
+        # Number of candidates not simulated.
+        self.skipped = 0
+        self.fits = 0
+        self._model = None
+
+    def __len__(self):
+        """Return the number of evaluations."""
+        return len(self.points)
+
+    def add(self, params, fitness):
+        """Add the fitness of a parameter vector."""
+        if np.isfinite(fitness):
+            self.points.append(np.asarray(params, dtype=float))
+            self.values.append(float(fitness))
+
+    def ready_p(self):
+        """Return True if there are enough evaluations to predict."""
+        return len(self.points) >= max(1, self.minimum)
+
+    def fit(self):
+        """Fit the model to the most recent evaluations."""
+        points = np.array(self.points[-self.window:])
+        values = _transform(self.values[-self.window:])
+        centre = points.mean(axis=0)
+        scale = points.std(axis=0)
+        scale[scale == 0] = 1
+        points = (points - centre) / scale
+        dist = _distances(points, points)
+        length = np.median(dist[dist > 0]) if (dist > 0).any() else 1
+        kernel = np.exp(-dist / length) + self.ridge * np.identity(len(dist))
+        mean = values.mean()
+        try:
+            weights = np.linalg.solve(kernel, values - mean)
+        except np.linalg.LinAlgError:
+            weights = np.linalg.lstsq(kernel, values - mean, rcond=None)[0]
+        self._model = (centre, scale, points, length, mean, weights)
+        self.fits += 1
+
+    def predict(self, params):
+        """Return the predicted fitness of each parameter vector."""
+        if self._model is None:
+            self.fit()
+        centre, scale, points, length, mean, weights = self._model
+        params = np.atleast_2d(np.asarray(params, dtype=float))
+        params = (params - centre) / scale
+        kernel = np.exp(-_distances(params, points) / length)
+        return _untransform(mean + kernel @ weights)
+
+    def record(self, predicted, actual):
+        """Record the prediction for a candidate that was evaluated."""
+        self.errors.append((predicted, actual))
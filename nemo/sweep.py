@@ -0,0 +1,186 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Merit-order prefix reuse and parametric capacity sweeps.
+
+When only generators late in the merit order change between runs,
+everything ahead of them dispatches identically. Set
+context.prefix_cache to a PrefixCache and the generator-major engine
+saves the residual demand after each merit position, so that the
+next run restarts dispatch at the first generator that changed.
+run_sweep() uses this to run a grid of capacities cheaply.
+"""
+
+import numpy as np
+
+from nemo import sim
+from nemo.plan import signature
+
+
+class _Capture():
+    """A recorder that saves the dispatch in a PrefixCache.
+
+    The dispatch is passed on to another recorder.
+    """
+
+    def __init__(self, record, cache):
+        """Construct a capturing recorder."""
+        self.record = record
+        self.cache = cache
+
+    def add(self, hours, gidx, gen, power, spilled):
+        """Save and record the power and spills of a generator."""
+        self.cache.power[hours, gidx] = power
+        self.cache.spilled[hours, gidx] = spilled
+        self.record.add(hours, gidx, gen, power, spilled)
+
+    def store(self, hour, gidx, spilled, unstored):
+        """Save and record the spills of a generator that were stored."""
+        self.cache.stores.append((hour, gidx, spilled, unstored))
+        self.record.store(hour, gidx, spilled, unstored)
+
+    def add_unserved(self, hours, unserved):
+        """Record the unserved demand."""
+        self.record.add_unserved(hours, unserved)
+
+    def resize(self, gidx, gen, change):
+        """Record a change in the capacity of a generator."""
+        self.record.resize(gidx, gen, change)
+
+    def finish(self, context, date_range):
+        """Finish the run."""
+        self.record.finish(context, date_range)
+
+
+class PrefixCache():
+    """Dispatch state after each merit position of the last run.
+
+    Merit positions are numbered as in the simulation plan. The
+    generators ahead of the restart position keep their state from
+    the previous run, so the cache is valid only while the generators
+    are reset by runs that use it (see sim._setup).
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self):
+        """Construct an empty cache."""
+        self.key = None
+        self.resets = None
+        self.signatures = []
+        self.checkpoints = {}
+        self.power = None
+        self.spilled = None
+        self.stores = []
+        self.runs = 0
+        self.reused = 0
+
+    def clear(self):
+        """Discard the cached state."""
+        self.key = None
+        self.signatures = []
+        self.checkpoints = {}
+        self.stores = []
+
+    def restart(self, context, date_range):
+        """Return the number of generators whose dispatch can be reused.
+
+        Checkpoints at or beyond the restart position are discarded.
+        """
+        plan = context.plan()
+        limits = context.energy_limits
+        key = (plan.key, date_range[0], len(date_range), context.nsp_limit,
+               None if limits is None else limits.settings)
+        signatures = [signature(g) for g in plan.generators]
+        if key != self.key or context.resets != self.resets:
+            self.clear()
+            self.key = key
+            shape = (len(date_range), len(plan.generators))
+            self.power = np.zeros(shape)
+            self.spilled = np.zeros(shape)
+        changed = 0
+        while changed < min(len(signatures), len(self.signatures)) and \
+                signatures[changed] == self.signatures[changed]:
+            changed += 1
+        self.checkpoints = {pos: state for pos, state
+                            in self.checkpoints.items() if pos < changed}
+        self.signatures = signatures
+        self.runs += 1
+        reused = max(self.checkpoints, default=-1) + 1
+        self.reused += reused
+        return reused
+
+    def resume(self, context, record, reused, residual, async_demand,
+               stores_p):
+        """Restore the dispatch of the first reused generators.
+
+        The residual and async_demand arrays are updated in place and
+        the saved dispatch is passed to record. Spills stored by the
+        reused generators are passed on only if stores_p is True.
+        Return a recorder that saves the rest of the run.
+        """
+        self.resets = context.resets
+        if not stores_p:
+            self.stores = []
+        if reused == 0:
+            return _Capture(record, self)
+        residual[:], async_demand[:] = self.checkpoints[reused - 1]
+        gens = context.plan().generators
+        hours = slice(0, len(residual))
+        for gidx in range(reused):
+            record.add(hours, gidx, gens[gidx], self.power[:, gidx],
+                       self.spilled[:, gidx])
+        for hour, gidx, spilled, unstored in self.stores:
+            record.store(hour, gidx, spilled, unstored)
+        return _Capture(record, self)
+
+    def checkpoint(self, gidx, residual, async_demand):
+        """Save the residual demand after a merit position."""
+        self.checkpoints[gidx] = (residual.copy(), async_demand.copy())
+
+
+def run_sweep(context, params, func=None, **kwargs):
+    """Run the simulation over a grid of generator capacities.
+
+    params is a list of (generator, capacities) pairs (usually one or
+    two), with capacities in GW as for set_capacity(). After each run,
+    func(context) is evaluated (by default, the unserved energy).
+    Other keyword arguments are passed to nemo.run(). The grid is
+    visited so that the generator latest in the merit order changes
+    most often, reusing the dispatch ahead of it (see PrefixCache).
+
+    Return an array of results with one axis for each generator. The
+    generator capacities are restored afterwards.
+    """
+    if func is None:
+        def func(ctx):
+            return ctx.unserved_energy()
+    gens = [gen for gen, _ in params]
+    grids = [np.asarray(values) for _, values in params]
+    merit = {id(g): pos for pos, g in enumerate(context.plan().generators)}
+    for gen in gens:
+        if id(gen) not in merit:
+            raise ValueError(f'{gen} is not in the regions of interest')
+    order = sorted(range(len(params)), key=lambda i: merit[id(gens[i])])
+
+    results = np.empty([len(grid) for grid in grids])
+    capacities = [gen.capacity for gen in gens]
+    saved_cache = context.prefix_cache
+    if saved_cache is None:
+        context.prefix_cache = PrefixCache()
+    try:
+        for point in np.ndindex(*[len(grids[i]) for i in order]):
+            index = [0] * len(params)
+            for axis, i in zip(point, order):
+                index[i] = axis
+                gens[i].set_capacity(grids[i][axis])
+            sim.run(context, engine='column', **kwargs)
+            results[tuple(index)] = func(context)
+    finally:
+        for gen, capacity in zip(gens, capacities):
+            gen.set_capacity(capacity / 1000)
+        context.prefix_cache = saved_cache
+    return results
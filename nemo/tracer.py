@@ -0,0 +1,199 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A structured trace of the dispatch in a simulation run.
+
+Set context.trace to a DispatchTrace to record the dispatch of each
+generator (and each transfer of spilled energy into storage) as
+compact typed records. A trace can be limited to a range of hours
+and to some regions, so that a short stretch of a long run can be
+traced cheaply. The records can be queried with records() and
+rendered as text with render().
+"""
+
+import numpy as np
+
+DISPATCH = 0
+"""Record kind: the dispatch of a generator in an hour."""
+
+STORE = 1
+"""Record kind: spilled energy transferred into storage."""
+
+record_dtype = np.dtype([('hour', np.int32),
+                         ('kind', np.int8),
+                         ('generator', np.int16),
+                         ('target', np.int16),
+                         ('power', np.float64),
+                         ('spilled', np.float64),
+                         ('residual', np.float64),
+                         ('async_residual', np.float64)])
+"""Type of each trace record.
+
+Generators are numbered by their position in the merit order of
+generators in the regions of interest. For STORE records, generator
+is the source of the spilled energy, target is the storage and
+power is the energy transferred.
+"""
+
+
+class DispatchTrace():
+    """A recorder of dispatch records.
+
+    Records are kept in memory (the array grows as needed) or, if a
+    filename is given, in a memory-mapped .npy file of fixed capacity.
+    Records that do not fit in a file are dropped and counted.
+    """
+
+    def __init__(self, hours=None, regions=None, capacity=65536,
+                 filename=None):
+        """Construct a dispatch trace.
+
+        Arguments: range of hours to trace (default all), list of
+        regions to trace (default all), initial (or file) capacity in
+        records, filename for a memory-mapped trace.
+        """
+        self.hours = hours
+        self.regions = regions
+        self.filename = filename
+        if filename is not None:
+            self.buffer = np.lib.format.open_memmap(
+                filename, mode='w+', dtype=record_dtype, shape=(capacity,))
+        else:
+            self.buffer = np.zeros(capacity, dtype=record_dtype)
+        self.count = 0
+        self.dropped = 0
+        self.generators = []
+        self.gindex = {}
+        self.traced = np.zeros(0, dtype=bool)
+        self.date_range = None
+        self.demand = np.zeros(0)
+
+    def start(self, context, date_range):
+        """Prepare to trace a new run (discarding any records)."""
+        plan = context.plan()
+        self.generators = plan.generators
+        self.gindex = {id(g): gidx for gidx, g in enumerate(self.generators)}
+        if self.regions is None:
+            self.traced = np.ones(len(self.generators), dtype=bool)
+        else:
+            self.traced = np.array([g.region() in self.regions
+                                    for g in self.generators], dtype=bool)
+        self.date_range = date_range
+        self.demand = plan.total_demand
+        self.count = 0
+        self.dropped = 0
+
+    def traced_p(self, hour):
+        """Return True if an hour is traced."""
+        return self.hours is None or hour in self.hours
+
+    def _window(self, timesteps):
+        """Return the traced hours in a run of timesteps hours."""
+        if self.hours is None:
+            return np.arange(timesteps)
+        hours = self.hours
+        return np.arange(timesteps)[hours.start:hours.stop:hours.step]
+
+    def _append(self, records):
+        """Append an array of records."""
+        needed = self.count + len(records)
+        if needed > len(self.buffer):
+            if self.filename is not None:
+                room = len(self.buffer) - self.count
+                self.dropped += len(records) - room
+                records = records[:room]
+                needed = len(self.buffer)
+            else:
+                buffer = np.zeros(max(needed, 2 * len(self.buffer)),
+                                  dtype=record_dtype)
+                buffer[:self.count] = self.buffer[:self.count]
+                self.buffer = buffer
+        self.buffer[self.count:needed] = records
+        self.count = needed
+
+    def dispatch(self, hour, gidx, power, spilled, residual, async_residual):
+        """Record the dispatch of a generator in an hour."""
+        if self.traced[gidx] and self.traced_p(hour):
+            self._append(np.array([(hour, DISPATCH, gidx, -1, power,
+                                    spilled, residual, async_residual)],
+                                  dtype=record_dtype))
+
+    def dispatch_series(self, gidx, power, spilled, residual,
+                        async_residual):
+        """Record the dispatch of a generator over every hour."""
+        if not self.traced[gidx]:
+            return
+        hours = self._window(len(power))
+        records = np.zeros(len(hours), dtype=record_dtype)
+        records['hour'] = hours
+        records['kind'] = DISPATCH
+        records['generator'] = gidx
+        records['target'] = -1
+        records['power'] = power[hours]
+        records['spilled'] = spilled[hours]
+        records['residual'] = residual[hours]
+        records['async_residual'] = async_residual[hours]
+        self._append(records)
+
+    def store(self, hour, gen, other, energy):
+        """Record spilled energy from gen transferred to storage other."""
+        source = self.gindex[id(gen)]
+        target = self.gindex[id(other)]
+        if (self.traced[source] or self.traced[target]) and \
+           self.traced_p(hour):
+            self._append(np.array([(hour, STORE, source, target, energy,
+                                    0, 0, 0)], dtype=record_dtype))
+
+    def records(self, first=None, last=None, generator=None, kind=None):
+        """Return the records in merit order within each hour.
+
+        The records can be limited to hours first to last (inclusive),
+        to one generator (by index or object, as source or target) and
+        to one kind of record.
+        """
+        recs = self.buffer[:self.count]
+        mask = np.ones(len(recs), dtype=bool)
+        if first is not None:
+            mask &= recs['hour'] >= first
+        if last is not None:
+            mask &= recs['hour'] <= last
+        if generator is not None:
+            if not isinstance(generator, (int, np.integer)):
+                generator = self.gindex[id(generator)]
+            mask &= (recs['generator'] == generator) | \
+                (recs['target'] == generator)
+        if kind is not None:
+            mask &= recs['kind'] == kind
+        recs = recs[mask]
+        order = np.lexsort((recs['kind'], recs['generator'], recs['hour']))
+        return recs[order]
+
+    def render(self, first=None, last=None):
+        """Return a text rendering of the records for some hours."""
+        lines = []
+        hour = None
+        for rec in self.records(first, last):
+            if rec['hour'] != hour:
+                if hour is not None:
+                    lines.append(f'ENDSTEP: {self.date_range[hour]}')
+                hour = rec['hour']
+                lines.append(f'STEP: {self.date_range[hour]}')
+                lines.append(f'DEMAND: {self.demand[hour]:.1f}')
+            gen = self.generators[rec['generator']]
+            if rec['kind'] == DISPATCH:
+                lines.append(f'GENERATOR: {gen}, '
+                             f'generation: {rec["power"]:.1f} '
+                             f'spill: {rec["spilled"]:.1f} '
+                             f'residual-demand: {rec["residual"]:.1f} '
+                             f'async-demand: {rec["async_residual"]:.1f}')
+            else:
+                other = self.generators[rec['target']]
+                lines.append(f'STORE: {gen} -> {other} '
+                             f'({rec["power"]:.1f})')
+        if hour is not None:
+            lines.append(f'ENDSTEP: {self.date_range[hour]}')
+        return '\n'.join(lines)
@@ -0,0 +1,187 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""Tied optimisation parameters.
+
+Large scenarios have a capacity parameter for each technology in
+each polygon. A scenario may declare groups of parameters (in
+context.parameter_groups) that are set together from one value: for
+example, a regional total spread across polygons in proportion to
+their build limits. A ParameterMap translates between the reduced
+vector (one value per group, plus the untied parameters) and the
+full parameter vector of the context.
+"""
+
+import numpy as np
+
+from nemo import regions
+
+
+class Group():
+    """Parameters set from one value, each scaled by a weight.
+
+    Members are (generator, setter index, weight) triples.
+    """
+
+    def __init__(self, members, label=None):
+        """Construct a group of parameters."""
+        self.members = list(members)
+        self.label = label
+
+    def __repr__(self):
+        """Return a representation of the group."""
+        return f'Group({self.label!r}, {len(self.members)} members)'
+
+
+def shares(gens, label=None, setter=0):
+    """Return a group that spreads a total across generators.
+
+    Each parameter is the group value times the generator's share of
+    the total upper bound (or an equal share if any bound is
+    infinite), so the group value is the total (eg, capacity).
+    """
+    limits = np.array([gen.setters[setter][2] for gen in gens], dtype=float)
+    if not np.isfinite(limits).all() or limits.sum() <= 0:
+        limits = np.ones(len(gens))
+    weights = limits / limits.sum()
+    return Group([(gen, setter, weight) for gen, weight
+                  in zip(gens, weights)], label)
+
+
+def equal(gens, label=None, setter=0):
+    """Return a group that sets a parameter of each generator alike.
+
+    For example, the solar multiple of every CST plant.
+    """
+    return Group([(gen, setter, 1.0) for gen in gens], label)
+
+
+def _exact_p(gen, cls):
+    """Return True if a generator is of a class (not a subclass)."""
+    return isinstance(gen, cls) and \
+        not isinstance(gen, tuple(cls.__subclasses__()))
+
+
+def regional(gens, classes):
+    """Return a group for each class of generator in each region.
+
+    Capacities are spread across polygons by build limit share (see
+    shares()). Generators must be of the exact class (not a subclass).
+    """
+    groups = []
+    for cls in classes:
+        for rgn in regions.All:
+            members = [gen for gen in gens
+                       if _exact_p(gen, cls) and gen.region() is rgn]
+            if len(members) > 1:
+                groups.append(shares(members, f'{rgn.id} {cls.__name__}'))
+    return groups
+
+
+class ParameterMap():
+    """A map between a reduced parameter vector and a context's.
+
+    Each full parameter is a reduced parameter times a weight. Groups
+    with fewer than two of the context's parameters (and parameters
+    already in an earlier group) are ignored. Each group takes the
+    place of its first member in the reduced vector.
+
+    Fixed parameters, given as (generator, setter index, value)
+    triples, are held at their value and are not in the reduced
+    vector (eg, a generator sized during the run, see nemo.peaker).
+    """
+
+    def __init__(self, context, groups=(), fixed=()):
+        """Construct a map for the parameters of a context."""
+        plan = context.plan()
+        # Index of the first parameter of each generator.
+        offsets = {}
+        numparams = 0
+        for gen in context.generators:
+            offsets[id(gen)] = numparams
+            numparams += len(gen.setters)
+        group_of = np.full(numparams, -1)
+        self.weight = np.ones(numparams)
+        self.offset = np.zeros(numparams)
+        held = np.zeros(numparams, dtype=bool)
+        for gen, setter, value in fixed:
+            if id(gen) in offsets:
+                j = offsets[id(gen)] + setter
+                held[j] = True
+                self.weight[j] = 0
+                self.offset[j] = value
+        self.groups = []
+        for group in groups:
+            members = [(offsets[id(gen)] + setter, weight)
+                       for gen, setter, weight in group.members
+                       if id(gen) in offsets]
+            members = [(j, weight) for j, weight in members
+                       if group_of[j] < 0 and not held[j]]
+            if len(members) < 2:
+                continue
+            for j, weight in members:
+                group_of[j] = len(self.groups)
+                self.weight[j] = weight
+            self.groups.append(group)
+
+        # Number the reduced parameters.
+        self.source = np.zeros(numparams, dtype=int)
+        first = {}
+        dim = 0
+        for j in range(numparams):
+            if held[j]:
+                continue
+            if group_of[j] >= 0 and group_of[j] in first:
+                self.source[j] = first[group_of[j]]
+                continue
+            if group_of[j] >= 0:
+                first[group_of[j]] = dim
+            self.source[j] = dim
+            dim += 1
+
+        # Bounds of the reduced parameters.
+        self.lower = np.full(dim, -np.inf)
+        self.upper = np.full(dim, np.inf)
+        for j in range(numparams):
+            weight = self.weight[j]
+            if weight > 0:
+                self.lower[self.source[j]] = max(self.lower[self.source[j]],
+                                                 plan.lower[j] / weight)
+                self.upper[self.source[j]] = min(self.upper[self.source[j]],
+                                                 plan.upper[j] / weight)
+        self.lower[np.isinf(self.lower)] = 0
+
+    def __len__(self):
+        """Return the number of reduced parameters."""
+        return len(self.lower)
+
+    def tied_p(self):
+        """Return True if any parameters are tied."""
+        return bool(self.groups)
+
+    def expand(self, values):
+        """Return the full parameter vector for a reduced vector."""
+        values = np.asarray(values, dtype=float)
+        assert len(values) == len(self), f'{len(self)} != {len(values)}'
+        return values[self.source] * self.weight + self.offset
+
+    def reduce(self, params):
+        """Return the reduced vector closest to a full parameter vector.
+
+        Group values are fitted by least squares.
+        """
+        params = np.asarray(params, dtype=float)
+        num = np.bincount(self.source, weights=self.weight * params,
+                          minlength=len(self))
+        den = np.bincount(self.source, weights=self.weight ** 2,
+                          minlength=len(self))
+        return np.divide(num, den, out=np.zeros(len(self)), where=den > 0)
+
+    def clamp(self, values):
+        """Return a reduced vector clamped to its bounds."""
+        return np.clip(np.asarray(values, dtype=float),
+                       self.lower, self.upper) + 0.0
@@ -10,3 +10,31 @@
 
 class UnreachableError(AssertionError):
     """For marking unreachable code."""
+
+
+class InvariantError(AssertionError):
+    """A simulation invariant does not hold.
+
+    The hour and generator of the first violation are given by the
+    hour and generator attributes (generator is None for invariants
+    over all generators).
+    """
+
+    def __init__(self, message, hour, generator=None):
+        """Construct an invariant error."""
+        AssertionError.__init__(self, message)
+        self.hour = hour
+        self.generator = generator
+
+
+class BudgetExceeded(Exception):
+    """A candidate cannot do better than its evaluation budget.
+
+    The bound attribute is a lower bound on the fitness of the
+    candidate (see nemo.budget).
+    """
+
+    def __init__(self, message, bound):
+        """Construct a budget exception."""
+        Exception.__init__(self, message)
+        self.bound = bound
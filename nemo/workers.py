@@ -0,0 +1,84 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A pool of worker processes for evaluating populations.
+
+Workers are forked from a server process (the 'forkserver' start
+method of multiprocessing) that has already imported NEMO and loaded
+the demand data, so they start warm. Items are sent to the workers
+in chunks to amortise the cost of communication, and only the
+results are sent back.
+
+Functions passed to map() must be picklable: module-level functions
+(including those of the main script, which each worker runs once
+with the same command line when it starts) will do.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+preload = ['nemo']
+"""Modules that the server imports before forking workers."""
+
+
+def start_method():
+    """Return the multiprocessing start method for worker processes."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return 'forkserver'
+    return 'spawn'
+
+
+class WorkerPool():
+    """A pool of worker processes with a chunking map()."""
+
+    chunks_per_worker = 4
+    """Number of chunks each worker receives from a map (on average)."""
+
+    def __init__(self, workers, chunksize=None, modules=None):
+        """Construct a pool of workers.
+
+        The chunk size is chosen for each map unless given. Modules
+        are preloaded by the server in addition to nemo.
+        """
+        if workers < 1:
+            raise ValueError(f'{workers} is not a valid number of workers')
+        self.workers = workers
+        self.chunksize = chunksize
+        mpctx = multiprocessing.get_context(start_method())
+        if mpctx.get_start_method() == 'forkserver':
+            mpctx.set_forkserver_preload(preload + list(modules or []))
+        self.executor = ProcessPoolExecutor(workers, mp_context=mpctx)
+
+    def chunks(self, length):
+        """Return the chunk size for a map over length items."""
+        if self.chunksize is not None:
+            return self.chunksize
+        chunksize, extra = divmod(length,
+                                  self.workers * self.chunks_per_worker)
+        return max(1, chunksize + bool(extra))
+
+    def map(self, func, items):
+        """Return a list of func applied to each item (in order)."""
+        items = list(items)
+        return list(self.executor.map(func, items,
+                                      chunksize=self.chunks(len(items))))
+
+    def submit(self, func, item):
+        """Schedule func(item) and return a future for the result."""
+        return self.executor.submit(func, item)
+
+    def close(self):
+        """Shut down the workers."""
+        self.executor.shutdown()
+
+    def __enter__(self):
+        """Enter a context (returning the pool)."""
+        return self
+
+    def __exit__(self, *exc):
+        """Shut down the workers on leaving a context."""
+        self.close()
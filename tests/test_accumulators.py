@@ -0,0 +1,127 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the accumulators module."""
+
+import argparse
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import accumulators, configfile, generators, penalties
+
+
+class TestAccumulators(unittest.TestCase):
+    """Test accumulators.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.context.generators = [
+            generators.PV1Axis(31, 8000, pv_cfg, 30),
+            generators.PumpedHydro(36, 1740, 15000),
+            generators.Hydro(36, 2000),
+            generators.Biofuel(31, 1000),
+            generators.OCGT(31, 5000)]
+        self.context.min_reserves = 3000
+        self.args = argparse.Namespace(reserves=3000, bioenergy_limit=0,
+                                       hydro_limit=0, fossil_limit=0,
+                                       emissions_limit=0)
+
+    def test_requires(self):
+        """Test requires() and required() functions."""
+        @accumulators.requires('energy', 'unserved')
+        def penalty(ctx, args):
+            return 0, 0
+        self.assertEqual(penalty.accumulators, ('energy', 'unserved'))
+        self.assertEqual(accumulators.required([penalties.unserved,
+                                                penalty, max]),
+                         ['unserved', 'energy'])
+
+    def test_register(self):
+        """Test register() function."""
+        class Count(accumulators.Accumulator):
+            """Count the number of generator dispatches."""
+
+            count = 0
+
+            def add(self, hours, gidx, gen, power, spilled):
+                self.count += 1
+
+        accumulators.register('count', Count)
+        try:
+            nemo.run(self.context, engine='column', summary=['count'])
+            self.assertTrue(self.context.accumulator('count').count > 0)
+        finally:
+            del accumulators.registry['count']
+
+    def test_unserved(self):
+        """Test the unserved energy accumulator."""
+        acc = accumulators.Unserved()
+        acc.start(self.context, 3)
+        acc.add_unserved(slice(0, 3), np.array([1e-10, 2, 3]))
+        acc.add_unserved(0, 4)
+        self.assertEqual((acc.total, acc.hours, acc.peak), (9, 3, 4))
+
+    def test_reserves_spills(self):
+        """Test that summary and full reserve penalties agree with spills."""
+        self.context.generators[0].set_capacity(30)
+        self.context.min_reserves = self.args.reserves = 8000
+        scores = []
+        for summary in [None, ['reserves']]:
+            nemo.run(self.context, summary=summary)
+            scores.append(penalties.reserves(self.context, self.args))
+            if summary is None:
+                self.assertGreater(self.context.surplus_energy(), 0)
+        self.assertGreater(scores[0][0], 0)
+        self.assertTrue(np.isclose(scores[1][0], scores[0][0]))
+        self.assertEqual(scores[1][1], scores[0][1])
+
+    def test_reserves_close(self):
+        """Test that closed hours are added to the reserves penalty."""
+        acc = accumulators.Reserves()
+        self.context.min_reserves = 10
+        acc.start(self.context, 4)
+        gen = self.context.generators[-1]
+        acc.resize(gen, 5 - acc.capacity)
+        acc.add(slice(0, 2), 4, gen, np.array([1, 2]), np.array([0, 3]))
+        acc.close(3)
+        # Hour 2 has no dispatch: the headroom is the whole capacity.
+        self.assertEqual((acc.penalty, acc.hours),
+                         (pow(6, 3) + pow(10, 3) + pow(5, 3), 3))
+        self.assertRaises(ValueError, acc.add, 2, 4, gen, 1, 0)
+        acc.close(4)
+        self.assertEqual(acc.hours, 4)
+        self.assertEqual(len(acc.power), 0)
+
+    def test_streamed_run(self):
+        """Test that a summary run with the hourly engine is streamed."""
+        nemo.run(self.context, summary=['unserved'])
+        for gen in self.context.generators:
+            self.assertIsInstance(gen.series_power, generators.SeriesWindow)
+        self.assertFalse(generators.windowed_series)
+        nemo.run(self.context, summary=['unserved'], engine='column')
+        for gen in self.context.generators:
+            self.assertIsInstance(gen.series_power, np.ndarray)
+
+    def test_summary_run(self):
+        """Test that a summary run matches a full run."""
+        fns = [penalties.unserved, penalties.reserves, penalties.hydro,
+               penalties.bioenergy, penalties.fossil]
+        for engine in ['hourly', 'column']:
+            results = []
+            for summary in [None, accumulators.required(fns)]:
+                nemo.run(self.context, engine=engine, summary=summary)
+                scores = [fn(self.context, self.args)[0] for fn in fns]
+                results.append(scores + [self.context.unserved_energy(),
+                                         self.context.surplus_energy()])
+            self.assertTrue(np.allclose(results[0], results[1]))
+            self.assertTrue(self.context.generation.empty)
+        nemo.run(self.context)
+        self.assertIsNone(self.context.summary)
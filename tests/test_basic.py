@@ -71,7 +71,7 @@ class TestSequenceFunctions(unittest.TestCase):
         ccgt = generators.CCGT(polygons.WILDCARD, 100)
         self.context.generators = [ccgt]
         nemo.run(self.context)
-        total_generation = sum(ccgt.series_power.values())
+        total_generation = ccgt.series_power.sum()
         expected_generation = self.context.timesteps * 100
         self.assertEqual(total_generation, expected_generation)
 
@@ -0,0 +1,69 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+# pylint: disable=protected-access
+
+"""A testsuite for the batch module."""
+
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import batch, configfile, generators
+from nemo.polygons import WILDCARD
+
+
+class TestBatch(unittest.TestCase):
+    """Test batch.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        cst_cfg = configfile.get('generation', 'cst-trace')
+        self.context.generators = [
+            generators.PV1Axis(31, 0, pv_cfg, 30),
+            generators.PumpedHydro(36, 1740, 15000),
+            generators.Hydro(36, 2000),
+            generators.CentralReceiver(31, 0, 2.0, 6, cst_cfg, 30),
+            generators.OCGT(WILDCARD, 0)]
+        self.population = np.array([[10, 1.7, 2, 1, 5],
+                                    [5, 1, 1, 3, 10],
+                                    [0, 0, 0, 0, 30]])
+
+    def _check(self, results):
+        """Compare batch results against one run per candidate."""
+        self.assertEqual(len(results), len(self.population))
+        for cand, caps in enumerate(self.population):
+            self.context.set_capacities(caps)
+            nemo.run(self.context)
+            self.assertAlmostEqual(results.unserved[cand],
+                                   self.context.unserved_energy(), places=2)
+            self.assertAlmostEqual(results.spilled[cand],
+                                   self.context.surplus_energy(), places=2)
+            energy = self.context.generation.values.sum(axis=0)
+            self.assertTrue(np.allclose(results.energy[cand], energy))
+
+    def test_run_batch(self):
+        """Test run_batch() against individual runs."""
+        self._check(batch.run_batch(self.context, self.population))
+
+    def test_run_batch_serial(self):
+        """Test run_batch() with a generator that has no batched model."""
+        battery = generators.Battery(WILDCARD, 0, 2)
+        self.context.generators.append(battery)
+        self.population = np.hstack((self.population,
+                                     np.ones((len(self.population), 1))))
+        self.assertIsNone(batch._unit_class(battery))
+        self._check(batch.run_batch(self.context, self.population))
+
+    def test_run_batch_regions(self):
+        """Test run_batch() with regions not a list."""
+        self.context.regions = None
+        with self.assertRaises(TypeError):
+            batch.run_batch(self.context, self.population)
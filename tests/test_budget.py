@@ -0,0 +1,113 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the budget module."""
+
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import configfile, generators, regions, sweep
+from nemo.budget import Budget, SupplyBound
+from nemo.types import BudgetExceeded
+
+
+class TestBudget(unittest.TestCase):
+    """Test budget.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.context.generators = [
+            generators.PV1Axis(31, 10000, pv_cfg, 30),
+            generators.PumpedHydro(36, 1740, 15000),
+            generators.Hydro(36, 1000),
+            generators.OCGT(31, 2000)]
+
+    def test_unlimited(self):
+        """Test that a budget does not change the results."""
+        for engine in ['hourly', 'column']:
+            nemo.run(self.context, engine=engine)
+            generation = self.context.generation.values.copy()
+            budget = Budget(np.inf, 10, lambda energy: energy)
+            nemo.run(self.context, engine=engine, budget=budget)
+            self.assertTrue(np.array_equal(generation,
+                                           self.context.generation.values))
+            self.assertLessEqual(budget.bound,
+                                 10 + self.context.unserved_energy() + 1e-6)
+
+    def test_fixed(self):
+        """Test a fixed cost beyond the budget."""
+        with self.assertRaises(BudgetExceeded) as cm:
+            nemo.run(self.context, budget=Budget(5, 10))
+        self.assertEqual(cm.exception.bound, 10)
+
+    def test_bound(self):
+        """Test that the bound never exceeds the true fitness."""
+        for engine in ['hourly', 'column']:
+            nemo.run(self.context, engine=engine)
+            unserved = self.context.unserved_energy()
+            self.assertTrue(unserved > 0)
+            for limit in [0, unserved / 2, unserved * 0.99]:
+                with self.assertRaises(BudgetExceeded) as cm:
+                    nemo.run(self.context, engine=engine,
+                             budget=Budget(limit, 0, lambda energy: energy))
+                self.assertTrue(limit < cm.exception.bound <= unserved)
+            nemo.run(self.context, engine=engine,
+                     budget=Budget(unserved, 0, lambda energy: energy))
+
+    def test_prefix_cache(self):
+        """Test a budget with reuse of the dispatch."""
+        self.context.prefix_cache = sweep.PrefixCache()
+        nemo.run(self.context, engine='column')
+        unserved = self.context.unserved_energy()
+        budget = Budget(unserved, 0, lambda energy: energy)
+        nemo.run(self.context, engine='column', budget=budget)
+        self.assertEqual(self.context.prefix_cache.reused, 4)
+        self.assertAlmostEqual(budget.bound, unserved)
+
+    def test_supply_bound(self):
+        """Test that the supply bound never exceeds the unserved energy."""
+        bound = SupplyBound(self.context)
+        for scale in [0, 0.5, 1, 2, 5]:
+            for gen, capacity in zip(self.context.generators,
+                                     [10000, 1740, 1000, 2000]):
+                gen.capacity = capacity * scale
+            nemo.run(self.context, engine='column')
+            unserved = self.context.unserved_energy()
+            self.assertLessEqual(bound.unserved(), unserved + 1e-6)
+        # Without trace generators, the bound is the shortfall of the
+        # firm capacity at the peak or over the run.
+        self.context.generators[0].capacity = 0
+        self.context.generators[3].capacity = 0
+        demand = self.context.plan().total_demand
+        firm = (1740 + 1000) * 5
+        self.assertAlmostEqual(SupplyBound(self.context, 1).unserved(),
+                               max(demand.max() - firm,
+                                   demand.sum() - firm * len(demand)))
+
+    def test_supply_bound_nsp(self):
+        """Test that non-synchronous supply is limited by the NSP limit."""
+        for gen in self.context.generators[1:]:
+            gen.capacity = 0
+        self.context.generators[0].capacity = 10 ** 9
+        demand = self.context.plan().total_demand
+        self.context.nsp_limit = 0.5
+        bound = SupplyBound(self.context, 1).unserved()
+        self.assertGreaterEqual(bound, demand.sum() * 0.5 - 1e-3)
+        nemo.run(self.context, engine='column')
+        self.assertLessEqual(bound, self.context.unserved_energy() + 1e-6)
+
+    def test_supply_bound_regions(self):
+        """Test the bound for a subset of the regions."""
+        self.context.regions = [regions.sa]
+        bound = SupplyBound(self.context).unserved()
+        nemo.run(self.context, engine='column')
+        self.assertGreater(bound, 0)
+        self.assertLessEqual(bound, self.context.unserved_energy() + 1e-6)
@@ -0,0 +1,91 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+# pylint: disable=protected-access
+
+"""A testsuite for the fleet module."""
+
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import configfile, fleet, generators, sim
+
+
+class TestFleet(unittest.TestCase):
+    """Test fleet.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.pv1 = generators.PV1Axis(31, 4000, pv_cfg, 30)
+        self.pv2 = generators.PV1Axis(31, 0, pv_cfg, 30)
+        self.pv3 = generators.PV1Axis(31, 6000, pv_cfg, 30)
+        self.psh = generators.PumpedHydro(36, 1740, 15000)
+        self.bio1 = generators.Biofuel(31, 1000)
+        self.bio2 = generators.Biofuel(31, 2000)
+        self.ocgt = generators.OCGT(31, 5000)
+        self.context = nemo.Context()
+
+    def test_merge_key(self):
+        """Test merge_key() function."""
+        self.assertEqual(fleet.merge_key(self.pv1), fleet.merge_key(self.pv3))
+        self.assertEqual(fleet.merge_key(self.bio1),
+                         fleet.merge_key(self.ocgt))
+        self.assertNotEqual(fleet.merge_key(self.pv1),
+                            fleet.merge_key(self.bio1))
+        self.assertIsNone(fleet.merge_key(self.psh))
+
+    def test_compact(self):
+        """Test compact() function."""
+        gens = [self.pv1, self.pv2, self.pv3, self.psh, self.bio1,
+                self.bio2]
+        units = fleet.compact(list(enumerate(gens)), 10)
+        self.assertEqual(len(units), 3)
+        self.assertEqual(units[0][0], 0)
+        self.assertEqual(units[0][1].members,
+                         [(0, self.pv1), (2, self.pv3)])
+        self.assertEqual(units[1], (3, self.psh))
+        self.assertEqual(units[2][0], 4)
+        self.assertEqual(len(units[2][1].members), 2)
+
+    def test_compact_no_spills(self):
+        """Test compact() when spilling generators can not be merged."""
+        gens = [self.pv1, self.pv3, self.bio1, self.bio2]
+        units = fleet.compact(list(enumerate(gens)), 10, merge_spills=False)
+        self.assertEqual(units[:2], [(0, self.pv1), (1, self.pv3)])
+        self.assertEqual(len(units), 3)
+
+    def test_split(self):
+        """Test that members share the output in merit order."""
+        merged = fleet.MergedGenerator([(0, self.bio1), (1, self.bio2)],
+                                       fleet.merge_key(self.bio1), 3)
+        power, spilled = merged.step_series(np.array([500., 2000., 5000.]))
+        self.assertEqual(power.tolist(), [500, 2000, 3000])
+        self.assertEqual(spilled.tolist(), [0, 0, 0])
+        generation = np.zeros((3, 2))
+        spill = np.zeros((3, 2))
+        merged.split(sim._Tables(generation, spill))
+        self.assertEqual(generation.tolist(),
+                         [[500, 0], [1000, 1000], [1000, 2000]])
+        self.assertEqual(self.bio1.runhours, 3)
+        self.assertEqual(self.bio2.runhours, 2)
+
+    def test_run(self):
+        """Test that a compacted run matches an uncompacted run."""
+        gens = [self.pv1, self.pv2, self.pv3, self.psh, self.bio1,
+                self.bio2, self.ocgt]
+        self.context.generators = gens
+        for engine in ['hourly', 'column']:
+            results = []
+            for compact in [False, True]:
+                nemo.run(self.context, engine=engine, compact=compact)
+                results.append((self.context.generation.values.copy(),
+                                self.context.spill.values.copy()))
+            self.assertTrue(np.allclose(results[0][0], results[1][0]))
+            self.assertTrue(np.allclose(results[0][1], results[1][1]))
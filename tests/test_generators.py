@@ -10,6 +10,7 @@
 import inspect
 import os
 import unittest
+from copy import deepcopy
 
 import numpy as np
 import pandas as pd
@@ -87,7 +88,7 @@ class TestGenerators(unittest.TestCase):
             # Skip abstract classes
             if cls in ['Generator', 'TraceGenerator',
                        'CSVTraceGenerator', 'Storage',
-                       'HydrogenStorage']:
+                       'HydrogenStorage', 'SeriesWindow']:
                 continue
 
             # check that every class in generators.py is in classlist
@@ -109,13 +110,37 @@ class TestGenerators(unittest.TestCase):
         """Test series() method."""
         gen = generators.Generator(1, 0, 'label')
         # fake up these attributes
-        gen.series_power = {1: 100}
-        gen.series_spilled = {1: 200}
+        gen.series_power = np.array([0, 100.])
+        gen.series_spilled = np.array([0, 200.])
         # .. and then call gen.series()
-        series1 = pd.Series(gen.series_power, dtype=float)
+        series1 = pd.Series(gen.series_power)
         self.assertTrue(gen.series()['power'].equals(other=series1))
-        series2 = pd.Series(gen.series_spilled, dtype=float)
+        series2 = pd.Series(gen.series_spilled)
         self.assertTrue(gen.series()['spilled'].equals(other=series2))
+        # the series share memory with the generator
+        gen.series_power[1] = 150
+        self.assertEqual(gen.series()['power'][1], 150)
+
+    def test_set_timesteps(self):
+        """Test set_timesteps() method."""
+        for gen in self.generators:
+            gen.set_timesteps(24)
+            for series in gen.series().values():
+                self.assertEqual(len(series), 24)
+
+    def test_series_window(self):
+        """Test the SeriesWindow class."""
+        window = generators.SeriesWindow(24)
+        self.assertEqual(len(window), 24)
+        window[3] += 2
+        window[3] += 1
+        self.assertEqual(window[3], 3)
+        self.assertEqual(window[4], 0)
+        self.assertRaises(IndexError, window.__getitem__, 3)
+        self.assertRaises(IndexError, window.__setitem__, 24, 1)
+        self.assertRaises(TypeError, window.__getitem__, slice(0, 4))
+        window.fill(0)
+        self.assertEqual(window[0], 0)
 
     def test_step_abstract(self):
         """Test step() method in the abstract Generator class."""
@@ -123,6 +148,29 @@ class TestGenerators(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             gen.step(0, 100)
 
+    def test_step_series_abstract(self):
+        """Test step_series() method in the abstract Generator class."""
+        gen = generators.Generator(1, 0, 'label')
+        with self.assertRaises(NotImplementedError):
+            gen.step_series(np.zeros(10))
+
+    def test_step_series(self):
+        """Test step_series() agrees with step() for every generator."""
+        demand = np.linspace(0, 200, 100)
+        for gen in self.generators:
+            gen.reset()
+            # Step a copy as reset() leaves a hydrogen tank as it is.
+            twin = deepcopy(gen)
+            stepped = [twin.step(hour, dmd)
+                       for hour, dmd in enumerate(demand)]
+            runhours = getattr(twin, 'runhours', None)
+            power, spilled = gen.step_series(demand)
+            self.assertEqual(power.tolist(), [p for p, _ in stepped])
+            self.assertEqual(spilled.tolist(), [s for _, s in stepped])
+            self.assertEqual(getattr(gen, 'runhours', None), runhours)
+            self.assertEqual(gen.series_power[:len(demand)].tolist(),
+                             power.tolist())
+
     def test_step(self):
         """Test step() method."""
         for gen in self.generators:
@@ -150,26 +198,26 @@ class TestGenerators(unittest.TestCase):
         """Test capfactor() method."""
         for gen in self.generators:
             # 10 MW for 10 hours = 100 MWh
-            gen.series_power = {n: 10 for n in range(10)}
+            gen.series_power = np.full(10, 10.)
             self.assertEqual(gen.capfactor(), 10)
 
     def test_lcoe(self):
         """Test lcoe() method."""
         for gen in self.generators:
             # 10 MWh for 10 hours = 100 MWh
-            gen.series_power = {n: 10 for n in range(10)}
+            gen.series_power = np.full(10, 10.)
             gen.lcoe(self.costs, self.years)
 
     def test_reset(self):
         """Test reset() method."""
         for gen in self.generators:
-            gen.series_power = {n: 10 for n in range(10)}
-            gen.series_spilled = {n: 10 for n in range(10)}
+            gen.series_power = np.full(10, 10.)
+            gen.series_spilled = np.full(10, 10.)
         for gen in self.generators:
             gen.reset()
         for gen in self.generators:
-            self.assertEqual(len(gen.series_power), 0)
-            self.assertEqual(len(gen.series_spilled), 0)
+            self.assertFalse(gen.series_power.any())
+            self.assertFalse(gen.series_spilled.any())
 
     def test_summary(self):
         """Test summary() method."""
@@ -181,8 +229,8 @@ class TestGenerators(unittest.TestCase):
 
         context = MyContext()
         for gen in self.generators:
-            gen.series_power = {n: 10 for n in range(10)}  # 10 MW * 10 h
-            gen.series_spilled = {n: 1 for n in range(10)}  # 1 MW * 10 h
+            gen.series_power = np.full(10, 10.)  # 10 MW * 10 h
+            gen.series_spilled = np.full(10, 1.)  # 1 MW * 10 h
             # fake up a capcost() method for testing summary()
             gen.capcost = lambda costs: 100
             output = gen.summary(context)
@@ -0,0 +1,76 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the invariants module."""
+
+import unittest
+
+import nemo
+from nemo import configfile, generators, invariants
+from nemo.types import InvariantError
+
+
+class Greedy(generators.OCGT):
+    """An OCGT that generates more than the demand in hour 5."""
+
+    stateless_p = False
+
+    def step(self, hour, demand):
+        """Step the generator."""
+        power = min(self.capacity, demand) + (100 if hour == 5 else 0)
+        self.series_power[hour] = power
+        return power, 0
+
+
+class TestInvariants(unittest.TestCase):
+    """Test invariants.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.context.generators = [
+            generators.PV1Axis(31, 20000, pv_cfg, 30),
+            generators.PumpedHydro(36, 1740, 15000),
+            generators.Battery(31, 1000, 2),
+            generators.Hydro(36, 2000),
+            generators.OCGT(31, 5000)]
+
+    def test_checked(self):
+        """Test a run in checked mode."""
+        for engine in ['hourly', 'column']:
+            nemo.run(self.context, engine=engine, mode='checked')
+            self.assertEqual(
+                invariants.violations(self.context, self.context.timesteps),
+                [])
+
+    def test_unknown_mode(self):
+        """Test run() with an unknown mode."""
+        with self.assertRaises(ValueError):
+            nemo.run(self.context, mode='nosuchmode')
+
+    def test_violation(self):
+        """Test that the first violation is reported."""
+        greedy = Greedy(31, 100000)
+        self.context.generators = [greedy]
+        with self.assertRaises(AssertionError):
+            nemo.run(self.context)
+        nemo.run(self.context, mode='fast')
+        with self.assertRaises(InvariantError) as cm:
+            nemo.run(self.context, mode='checked')
+        self.assertEqual(cm.exception.hour, 5)
+        self.assertIs(cm.exception.generator, greedy)
+        self.assertIn('generation exceeds demand in hour 5',
+                      str(cm.exception))
+
+    def test_storage_bounds(self):
+        """Test the storage bounds check."""
+        nemo.run(self.context, engine='column')
+        battery = self.context.generators[2]
+        battery.series_power[3] = 1e6
+        found = invariants.violations(self.context, self.context.timesteps)
+        self.assertIn((3, battery, 'storage out of bounds'), found)
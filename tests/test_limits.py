@@ -0,0 +1,179 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the limits module."""
+
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import configfile, generators, penalties, periods, sim
+from nemo.limits import EnergyLimits, pacings
+from nemo.polygons import WILDCARD
+
+
+class Args:
+    """Faked up command line options."""
+
+    emissions_limit = 5
+    fossil_limit = 0.3
+    bioenergy_limit = 2
+    hydro_limit = 5
+
+
+class TestLimits(unittest.TestCase):
+    """Test limits.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.hydro = generators.Hydro(36, 3000)
+        self.context.generators = [
+            generators.PV1Axis(31, 10000, pv_cfg, 30),
+            generators.PumpedHydro(36, 1740, 15000),
+            self.hydro,
+            generators.Biofuel(31, 2000),
+            generators.Hydro(24, 2000),
+            generators.OCGT(WILDCARD, 20000)]
+        self.args = Args()
+
+    def limits(self, pacing='greedy'):
+        """Return limits taken from the faked up options."""
+        args = self.args
+        return EnergyLimits(args.hydro_limit, args.bioenergy_limit,
+                            args.fossil_limit, args.emissions_limit,
+                            pacing)
+
+    def penalties(self):
+        """Return the penalties for each limit after a run."""
+        return [fn(self.context, self.args)[0] for fn in
+                [penalties.hydro, penalties.bioenergy, penalties.fossil,
+                 penalties.emissions]]
+
+    def test_pacing(self):
+        """Test an unknown pacing rule."""
+        self.assertRaises(ValueError, EnergyLimits, pacing='foo')
+
+    def test_unlimited(self):
+        """Test that limits that do not bind do not change the results."""
+        for engine in ['hourly', 'column']:
+            nemo.run(self.context, engine=engine)
+            generation = self.context.generation.values.copy()
+            self.context.energy_limits = EnergyLimits()
+            nemo.run(self.context, engine=engine)
+            self.assertTrue(np.array_equal(generation,
+                                           self.context.generation.values))
+            self.context.energy_limits = None
+
+    def test_not_binding(self):
+        """Test limits that would not have bound in any hour."""
+        nemo.run(self.context, engine='column')
+        generation = self.context.generation.values.copy()
+        self.args.hydro_limit = 100
+        self.args.bioenergy_limit = 100
+        self.args.fossil_limit = 1
+        self.args.emissions_limit = 1000
+        self.context.energy_limits = self.limits('demand')
+        resets = self.context.resets
+        nemo.run(self.context, engine='column')
+        # The dispatch without the limits is kept.
+        self.assertEqual(self.context.resets, resets + 1)
+        self.assertTrue(np.array_equal(generation,
+                                       self.context.generation.values))
+        nemo.run(self.context, engine='hourly')
+        self.assertTrue(np.array_equal(generation,
+                                       self.context.generation.values))
+
+    def test_penalties(self):
+        """Test that enforced limits are not penalised after the run."""
+        nemo.run(self.context)
+        self.assertTrue(all(pen > 0 for pen in self.penalties()))
+        unserved = self.context.unserved_energy()
+        self.context.energy_limits = self.limits()
+        nemo.run(self.context)
+        self.assertEqual(self.penalties(), [0, 0, 0, 0])
+        self.assertGreater(self.context.unserved_energy(), unserved)
+        limits = self.context.energy_limits
+        self.assertEqual(limits.names,
+                         ['hydro', 'bioenergy', 'fossil', 'emissions'])
+        for used, limit in zip(limits.used, limits.limits):
+            self.assertLessEqual(used, limit)
+
+    def test_engines(self):
+        """Test that both engines give the same results."""
+        for pacing in pacings:
+            self.context.energy_limits = self.limits(pacing)
+            nemo.run(self.context, engine='hourly')
+            generation = self.context.generation.values.copy()
+            nemo.run(self.context, engine='column')
+            self.assertTrue(np.array_equal(generation,
+                                           self.context.generation.values))
+
+    def test_greedy(self):
+        """Test that generators stop once a limit is used up."""
+        self.args.bioenergy_limit = np.inf
+        self.args.fossil_limit = 1
+        self.args.emissions_limit = np.inf
+        self.context.energy_limits = self.limits()
+        nemo.run(self.context, engine='column')
+        limit = self.args.hydro_limit * pow(10, 6) * self.context.years
+        power = self.hydro.series_power + \
+            self.context.generators[4].series_power
+        energy = np.cumsum(power)
+        self.assertAlmostEqual(energy[-1], limit, places=0)
+        exhausted = np.argmax(energy > limit * 0.999999)
+        self.assertTrue((power[exhausted + 1:] == 0).all())
+        self.assertTrue(power[:exhausted].all())
+
+    def test_paced(self):
+        """Test that paced limits follow their allowance."""
+        self.args.bioenergy_limit = np.inf
+        self.args.fossil_limit = 1
+        self.args.emissions_limit = np.inf
+        limit = self.args.hydro_limit * pow(10, 6) * self.context.years
+        demand = self.context.demand.values.sum(axis=1)
+        even = np.arange(1, len(demand) + 1) / len(demand)
+        for pacing, share in [('even', even),
+                              ('demand', np.cumsum(demand) / demand.sum())]:
+            self.context.energy_limits = self.limits(pacing)
+            nemo.run(self.context)
+            power = self.hydro.series_power + \
+                self.context.generators[4].series_power
+            energy = np.cumsum(power)
+            self.assertTrue((energy <= share * limit + 1e-3).all())
+            # The allowance is spent as it accrues.
+            self.assertGreater(energy[len(energy) // 2], limit * 0.4)
+
+    def test_weights(self):
+        """Test limits over representative periods."""
+        reduced = periods.ReducedContext(
+            self.context, periods.cluster(self.context, 4, 168))
+        reduced.energy_limits = self.limits('even')
+        nemo.run(reduced, engine='column')
+        self.context = reduced
+        self.assertEqual(self.penalties(), [0, 0, 0, 0])
+        limits = reduced.energy_limits
+        self.assertAlmostEqual(limits.used[0],
+                               reduced.generator_energy()[[2, 4]].sum())
+
+    def test_partition(self):
+        """Test that limited generators are dispatched hour by hour."""
+        gens = self.context.generators
+        self.assertEqual(sim._partition(gens[2:]), (4, 4))
+        self.assertEqual(
+            sim._partition(gens[2:], [False, True, False, False]), (1, 2))
+        self.assertEqual(
+            sim._partition(gens, [False, False, True, True, False, False]),
+            (1, 4))
+
+    def test_size_peaker(self):
+        """Test that a sized generator cannot be under a limit."""
+        self.context.energy_limits = self.limits()
+        with self.assertRaises(ValueError):
+            nemo.run(self.context, engine='column', size_peaker=True)
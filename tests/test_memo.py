@@ -0,0 +1,73 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the memo module."""
+
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import memo
+
+
+class TestMemo(unittest.TestCase):
+    """Test memo.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+
+    def test_canonical(self):
+        """Test canonical() function."""
+        upper = self.context.plan().upper
+        values = memo.canonical(self.context, [-1, upper[1] + 1])
+        self.assertEqual(values.tolist(), [0, upper[1]])
+        self.assertEqual(values.tobytes(),
+                         memo.canonical(self.context, [-0.0, 50]).tobytes())
+        values = memo.canonical(self.context, [1.234, 5.678], resolution=100)
+        self.assertTrue(np.allclose(values, [1.2, 5.7]))
+
+    def test_lru(self):
+        """Test eviction of the least recently used result."""
+        cache = memo.MemoCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions),
+                         (1, 1, 1))
+        self.assertEqual(cache.hit_rate(), 0.5)
+
+    def test_map(self):
+        """Test the map() method."""
+        cache = memo.MemoCache()
+        calls = []
+
+        def func(item):
+            calls.append(item)
+            return -item
+
+        self.assertEqual(cache.map(func, [1, 2, 1], [1, 2, 1]), [-1, -2, -1])
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(cache.duplicates, 1)
+        self.assertEqual(cache.map(func, [2, 3], [2, 3],
+                                   keep=lambda value: value != -3),
+                         [-2, -3])
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertNotIn(3, cache)
+        self.assertIn('1 duplicates', str(cache))
+
+    def test_disabled(self):
+        """Test a cache of size zero."""
+        cache = memo.MemoCache(0)
+        self.assertEqual(cache.map(abs, [-1, -1], ['x', 'x']), [1, 1])
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.duplicates, 1)
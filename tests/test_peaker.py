@@ -0,0 +1,130 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the peaker module."""
+
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import configfile, costs, generators, peaker, sweep
+
+
+class TestPeaker(unittest.TestCase):
+    """Test peaker.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        self.context.costs = costs.AETA2013_2030Mid(0.05, 1.86, 11, 27)
+        self.context.costs.carbon = 25
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.ocgt = generators.OCGT(31, 5000)
+        self.context.generators = [
+            generators.PV1Axis(31, 30000, pv_cfg, 30),
+            generators.PumpedHydro(36, 1740, 15000),
+            generators.Hydro(36, 2000),
+            generators.CCGT(31, 10000),
+            self.ocgt]
+
+    def test_candidate(self):
+        """Test the choice of generator to size."""
+        self.assertIs(peaker.candidate(self.context), self.ocgt)
+        self.context.generators.append(generators.PumpedHydro(40, 100, 1000))
+        self.assertIsNone(peaker.candidate(self.context))
+        self.context.generators = []
+        self.assertIsNone(peaker.candidate(self.context))
+
+    def test_profile(self):
+        """Test the closed forms against the dispatch they summarise."""
+        residual = np.array([0, 5, 3, 10, 3, 0, 7], dtype=float)
+        sizing = peaker.Peaker(self.context, self.ocgt, residual)
+        for capacity in [0, 1, 3, 4.5, 7, 9.9, 10, 20]:
+            unserved = np.maximum(0, residual - capacity).sum()
+            self.assertAlmostEqual(sizing.unserved(capacity), unserved)
+            self.assertAlmostEqual(sizing.energy(capacity),
+                                   residual.sum() - unserved)
+            self.assertAlmostEqual(sizing.capacity(unserved), capacity
+                                   if capacity < 10 else 10)
+        self.assertEqual(sizing.capacity(residual.sum()), 0)
+        self.assertAlmostEqual(sizing.capacity(0.5), 9.5)
+        self.assertAlmostEqual(sizing.capacity(5), 6)
+
+    def test_weights(self):
+        """Test that weighted hours count as repeated hours."""
+        residual = np.array([5, 3, 10], dtype=float)
+        self.context.weights = np.array([2, 1, 3], dtype=float)
+        weighted = peaker.Peaker(self.context, self.ocgt, residual)
+        self.context.weights = None
+        repeated = peaker.Peaker(self.context, self.ocgt,
+                                 np.repeat(residual, [2, 1, 3]))
+        for capacity in [0, 4, 6, 11]:
+            self.assertAlmostEqual(weighted.unserved(capacity),
+                                   repeated.unserved(capacity))
+            self.assertAlmostEqual(weighted.energy(capacity),
+                                   repeated.energy(capacity))
+        for unserved in [0, 1, 7, 30]:
+            self.assertAlmostEqual(weighted.capacity(unserved),
+                                   repeated.capacity(unserved))
+
+    def test_cost(self):
+        """Test the cost of the generator for a capacity."""
+        residual = np.array([100, 200, 300], dtype=float)
+        sizing = peaker.Peaker(self.context, self.ocgt, residual)
+        ctx = self.context
+        self.ocgt.capacity = 150
+        expected = self.ocgt.capcost(ctx.costs) / ctx.costs.annuityf * \
+            ctx.years + self.ocgt.opcost(ctx.costs, 400)
+        self.assertAlmostEqual(sizing.cost(150), expected)
+        self.assertEqual(self.ocgt.capacity, 150)
+
+    def test_run(self):
+        """Test that a sized run meets the reliability standard."""
+        nemo.run(self.context, engine='column', size_peaker=True)
+        capacity = self.ocgt.capacity
+        limit = self.context.total_demand() * self.context.relstd / 100
+        self.assertLessEqual(self.context.unserved_energy(), limit * 1.000001)
+        # A smaller peaker does not meet the standard.
+        self.ocgt.capacity = capacity - 1
+        nemo.run(self.context, engine='column')
+        self.assertGreater(self.context.unserved_energy(), limit)
+
+    def test_summary(self):
+        """Test that a sized summary run agrees with a full run."""
+        names = ['energy', 'unserved', 'reserves']
+        self.context.min_reserves = 5000
+        nemo.run(self.context, engine='column', size_peaker=True,
+                 summary=names)
+        reserves = self.context.accumulator('reserves')
+        shortfall = reserves.penalty, reserves.hours
+        unserved = self.context.unserved_energy()
+        nemo.run(self.context, engine='column', summary=names)
+        reserves = self.context.accumulator('reserves')
+        self.assertTrue(np.allclose((reserves.penalty, reserves.hours),
+                                    shortfall))
+        self.assertAlmostEqual(self.context.unserved_energy(), unserved)
+
+    def test_prefix_cache(self):
+        """Test that the sized generator is not reused from a cache."""
+        self.context.prefix_cache = sweep.PrefixCache()
+        nemo.run(self.context, engine='column', size_peaker=True)
+        capacity = self.ocgt.capacity
+        self.context.generators[3].set_capacity(5)
+        nemo.run(self.context, engine='column', size_peaker=True)
+        self.assertGreater(self.ocgt.capacity, capacity)
+        self.context.generators[3].set_capacity(10)
+        nemo.run(self.context, engine='column', size_peaker=True)
+        self.assertAlmostEqual(self.ocgt.capacity, capacity)
+
+    def test_invalid(self):
+        """Test runs that cannot size the peaker."""
+        self.assertRaises(ValueError, nemo.run, self.context,
+                          engine='hourly', size_peaker=True)
+        self.context.generators.append(generators.PumpedHydro(40, 100, 1000))
+        self.assertRaises(ValueError, nemo.run, self.context,
+                          engine='column', size_peaker=True)
@@ -0,0 +1,97 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the periods module."""
+
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import configfile, generators, periods
+
+
+class TestPeriods(unittest.TestCase):
+    """Test periods.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.context.generators = [
+            generators.PV1Axis(31, 3000, pv_cfg, 30),
+            generators.PumpedHydro(36, 1740, 15000),
+            generators.Hydro(36, 2000),
+            generators.OCGT(31, 20000)]
+
+    def test_kmeans(self):
+        """Test clustering of well separated rows."""
+        data = np.array([[0, 0], [0, 1], [10, 10], [10, 11], [0, 0.5]],
+                        dtype=float)
+        labels, centres = periods.kmeans(data, 2)
+        self.assertEqual(len(set(labels[[0, 1, 4]])), 1)
+        self.assertEqual(labels[2], labels[3])
+        self.assertNotEqual(labels[0], labels[2])
+        self.assertTrue(np.allclose(centres[labels[2]], [10, 10.5]))
+
+    def test_cluster(self):
+        """Test the choice of representative periods."""
+        reps = periods.cluster(self.context, 6, 168)
+        self.assertEqual(len(reps), 6)
+        self.assertTrue((np.diff(reps.blocks) > 0).all())
+        self.assertAlmostEqual(reps.hour_weights().sum(),
+                               len(self.context.demand))
+        # The week with the peak demand is a period of its own.
+        peak = self.context.plan().total_demand.argmax()
+        self.assertIn(peak, reps.hours())
+        self.assertEqual(len(reps.hours()), 6 * 168)
+        self.assertRaises(ValueError, periods.cluster, self.context, 0)
+
+    def test_whole_horizon(self):
+        """Test that periods covering every hour reproduce a full run."""
+        reps = periods.cluster(self.context, 365, 24)
+        self.assertEqual(len(reps), len(self.context.demand) // 24)
+        reduced = periods.ReducedContext(self.context, reps)
+        nemo.run(self.context, engine='column')
+        nemo.run(reduced, engine='column')
+        # Totals are in MWh, so compare them relative to the demand.
+        total = self.context.total_demand()
+        self.assertAlmostEqual(reduced.total_demand(), total,
+                               delta=1e-9 * total)
+        self.assertTrue(np.allclose(reduced.generator_energy(),
+                                    self.context.generator_energy()))
+        self.assertAlmostEqual(reduced.unserved_energy(),
+                               self.context.unserved_energy(),
+                               delta=1e-9 * total)
+
+    def test_reduced(self):
+        """Test a run over representative periods."""
+        reps = periods.cluster(self.context, 4, 168)
+        reduced = periods.ReducedContext(self.context, reps)
+        self.assertEqual(reduced.timesteps, 4 * 168)
+        self.assertIsNot(reduced.generators[0], self.context.generators[0])
+        self.assertTrue(np.array_equal(
+            reduced.generators[0].generation,
+            self.context.generators[0].generation[reps.hours()]))
+        # Capacities are set independently of the original context.
+        reduced.set_capacities([1, 1.74, 2, 10])
+        self.assertEqual(self.context.generators[0].capacity, 3000)
+        nemo.run(reduced, engine='column')
+        nemo.run(self.context, engine='column')
+        ratio = reduced.total_demand() / self.context.total_demand()
+        self.assertAlmostEqual(ratio, 1, places=1)
+
+    def test_agreement(self):
+        """Test the agreement of reduced and full fitness values."""
+        self.assertEqual(periods.agreement([])[0], 0)
+        pairs, rank, error = periods.agreement([(1, 1), (2, 4), (3, 3)])
+        self.assertEqual(pairs, 3)
+        self.assertAlmostEqual(rank, 0.5)
+        self.assertAlmostEqual(error, 0.5 / 3)
+        _, rank, error = periods.agreement([(1.1, 1)])
+        self.assertTrue(np.isnan(rank))
+        self.assertAlmostEqual(error, 0.1)
@@ -0,0 +1,90 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the plan module."""
+
+import unittest
+
+import nemo
+from nemo import demand, generators, polygons, regions
+
+
+class TestPlan(unittest.TestCase):
+    """Tests for the SimulationPlan class."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+
+    def test_cached(self):
+        """Test that the plan is reused while the inputs are unchanged."""
+        plan = self.context.plan()
+        self.context.set_capacities([0.1, 0.2])
+        nemo.run(self.context)
+        self.assertIs(self.context.plan(), plan)
+
+    def test_stale_generators(self):
+        """Test that changing the generator list invalidates the plan."""
+        plan = self.context.plan()
+        self.context.generators = self.context.generators[:1]
+        self.assertIsNot(self.context.plan(), plan)
+        self.assertEqual(len(self.context.plan().generators), 1)
+
+    def test_stale_regions(self):
+        """Test that changing the regions invalidates the plan."""
+        plan = self.context.plan()
+        self.context.regions = [regions.sa]
+        self.assertIsNot(self.context.plan(), plan)
+        self.assertEqual(self.context.plan().generators, [])
+
+    def test_stale_demand(self):
+        """Test that modifying the demand in place invalidates the plan."""
+        plan = self.context.plan()
+        self.context.demand *= 1.1
+        self.assertIsNot(self.context.plan(), plan)
+
+    def test_stale_demand_modifier(self):
+        """Test that modifying demand in place with a modifier is noticed."""
+        plan = self.context.plan()
+        demand.switch('scalex:0:6:10')(self.context)
+        self.assertIsNot(self.context.plan(), plan)
+
+    def test_demand(self):
+        """Test that out-of-region demand is zeroed."""
+        self.context.regions = [regions.sa]
+        plan = self.context.plan()
+        for poly in range(1, polygons.NUMPOLYGONS + 1):
+            if poly not in regions.sa.polygons:
+                self.assertEqual(plan.demand[:, poly - 1].sum(), 0)
+        self.assertEqual(plan.total_demand.sum(),
+                         self.context.demand.values.sum())
+        self.assertEqual(plan.polygon_mask.sum(), len(regions.sa.polygons))
+
+    def test_groups(self):
+        """Test the generator group masks."""
+        self.context.generators = \
+            [generators.CCGT(polygons.WILDCARD, 100),
+             generators.PumpedHydro(polygons.WILDCARD, 100, 1000),
+             generators.Hydro(polygons.WILDCARD, 100)]
+        groups = self.context.plan().groups
+        self.assertEqual(groups['fossil'].tolist(), [True, False, False])
+        self.assertEqual(groups['hydro'].tolist(), [False, False, True])
+        self.assertEqual(groups['storage'].tolist(), [False, True, False])
+
+    def test_set_capacities_bounds(self):
+        """Test that parameters are kept within bounds."""
+        gen = self.context.generators[0]
+        gen.setters = [(gen.set_capacity, 0.5, 1.0)]
+        self.context.set_capacities([2, 0.2])
+        self.assertEqual(gen.capacity, 1000)
+        self.context.set_capacities([0, 0.2])
+        self.assertEqual(gen.capacity, 500)
+
+    def test_set_capacities_length(self):
+        """Test that every parameter must be set."""
+        with self.assertRaises(AssertionError):
+            self.context.set_capacities([0.1])
@@ -0,0 +1,103 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the relax module."""
+
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import configfile, costs, generators, periods, relax
+from nemo.polygons import WILDCARD
+
+
+class Args:
+    """Faked up command line options."""
+
+    emissions_limit = np.inf
+    fossil_limit = 1.0
+    bioenergy_limit = 20
+    hydro_limit = 12
+
+
+@unittest.skipIf(relax.linprog is None, 'SciPy is not installed')
+class TestRelax(unittest.TestCase):
+    """Test relax.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        context = nemo.Context()
+        context.costs = costs.AETA2013_2030Mid(0.05, 1.86, 11, 27)
+        context.costs.carbon = 25
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.pv = generators.PV1Axis(31, 0, pv_cfg, 30)
+        self.ccgt = generators.CCGT(WILDCARD, 0)
+        self.ocgt = generators.OCGT(WILDCARD, 0)
+        context.generators = [self.pv, generators.PumpedHydro(36, 1740, 15000),
+                              self.ccgt, self.ocgt]
+        self.context = context
+        self.args = Args()
+
+    def reduced(self):
+        """Return a context of four representative weeks."""
+        return periods.ReducedContext(self.context,
+                                      periods.cluster(self.context, 4, 168))
+
+    def test_supported(self):
+        """Test the generators that can be sized."""
+        self.assertTrue(relax.supported_p(self.pv))
+        self.assertTrue(relax.supported_p(self.ocgt))
+        cst_cfg = configfile.get('generation', 'cst-trace')
+        cst = generators.CentralReceiver(31, 0, 2, 6, cst_cfg, 30)
+        self.assertFalse(relax.supported_p(cst))
+        self.assertFalse(relax.supported_p(
+            generators.Battery(WILDCARD, 0, 4)))
+        self.context.generators.append(cst)
+        self.assertRaises(ValueError, relax.relax, self.context, self.args)
+
+    def test_fleet(self):
+        """Test that the capacities meet demand at least cost."""
+        ctx = self.reduced()
+        params, cost = relax.relax(ctx, self.args)
+        self.assertEqual(len(params), 4)
+        # Pumped hydro is held at its upper bound.
+        self.assertAlmostEqual(params[1], 1.74)
+        ctx.set_capacities(params)
+        nemo.run(ctx, engine='column')
+        self.assertLess(ctx.unserved_percent(), 1)
+        # The simulated cost is close to the relaxed cost.
+        total = 0
+        for gen, energy in zip(ctx.generators, ctx.generator_energy()):
+            total += gen.capcost(ctx.costs) / ctx.costs.annuityf * ctx.years
+            total += gen.opcost(ctx.costs, energy)
+        self.assertLess(total / ctx.total_demand(), cost * 1.5)
+
+    def test_nsp_limit(self):
+        """Test that non-synchronous supply is limited."""
+        ctx = self.reduced()
+        ctx.nsp_limit = 0
+        params, _ = relax.relax(ctx, self.args)
+        self.assertEqual(params[0], 0)
+
+    def test_fossil_limit(self):
+        """Test that fossil energy is limited."""
+        ctx = self.reduced()
+        self.args.fossil_limit = 0
+        params, cost = relax.relax(ctx, self.args)
+        # Demand is mostly unserved at the value of lost load.
+        self.assertGreater(cost, 1000)
+        self.assertGreater(params[0], 0)
+
+    def test_weights(self):
+        """Test that periods covering every hour match the full horizon."""
+        reps = periods.cluster(self.context, 365, 24)
+        reduced = periods.ReducedContext(self.context, reps)
+        params, cost = relax.relax(reduced, self.args)
+        full_params, full_cost = relax.relax(self.context, self.args)
+        self.assertAlmostEqual(cost, full_cost, places=4)
+        self.assertTrue(np.allclose(params, full_params, atol=1e-4))
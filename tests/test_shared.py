@@ -0,0 +1,53 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the shared module."""
+
+import os
+import unittest
+
+import numpy as np
+
+from nemo import configfile, generators, shared
+
+
+class TestShared(unittest.TestCase):
+    """Test shared.py."""
+
+    def test_lookup(self):
+        """Test publishing and looking up an array."""
+        array = np.arange(12.).reshape(3, 4)
+        self.assertIsNone(shared.lookup('test'))
+        with shared.DataPlane() as plane:
+            plane.publish('test', array)
+            view = shared.lookup('test')
+            self.assertTrue(np.array_equal(view, array))
+            self.assertFalse(view.flags.writeable)
+            self.assertIsNone(shared.lookup('missing'))
+            directory = plane.directory
+        self.assertFalse(os.path.exists(directory))
+        self.assertNotIn(shared.ENVIRON, os.environ)
+        self.assertIsNone(shared.lookup('test'))
+
+    def test_traces(self):
+        """Test that trace generators use shared trace data."""
+        class PV(generators.PV1Axis):
+            """A PV class with its own trace cache."""
+
+            csvfilename = None
+            csvdata = None
+
+        filename = configfile.get('generation', 'pv1axis-trace')
+        data = np.random.rand(8760, 3)
+        with shared.DataPlane() as plane:
+            plane.publish(filename, data)
+            gen = PV(1, 100, filename, 2)
+            self.assertTrue(np.array_equal(gen.generation, data[:, 2]))
+            # Trace data that is already shared is not published again.
+            context = type('Context', (), {'generators': [gen]})
+            plane.publish_traces(context)
+            self.assertEqual(plane.keys, [filename])
@@ -58,7 +58,7 @@ class TestSim(unittest.TestCase):
 
     def test_store_spills(self):
         """Test _store_spills()."""
-        self.context = type('context', (), {'verbose': 0})
+        self.context = type('context', (), {'verbose': 0, 'trace': None})
         self.context.verbose = True
         hydro = generators.Hydro(1, 100)
         h2store = generators.HydrogenStorage(400)
@@ -98,3 +98,51 @@ class TestSim(unittest.TestCase):
     def test_run_2(self):
         """Test run() normally."""
         sim.run(self.context)
+
+    def test_run_unknown_engine(self):
+        """Test run() with an unknown engine."""
+        with self.assertRaises(ValueError):
+            sim.run(self.context, engine='nosuchengine')
+
+    def test_partition(self):
+        """Test _partition() function."""
+        cfg = configfile.get('generation', 'pv1axis-trace')
+        pv = generators.PV1Axis(31, 10, cfg, 30)
+        psh = generators.PumpedHydro(1, 250, 1000)
+        hydro = generators.Hydro(1, 100)
+        ocgt = generators.OCGT(1, 100)
+        self.assertEqual(sim._partition([pv, hydro, ocgt]), (3, 3))
+        self.assertEqual(sim._partition([pv, psh, hydro, ocgt]), (1, 2))
+        self.assertEqual(sim._partition([psh, pv, ocgt]), (0, 2))
+
+    def _compare_engines(self, gens):
+        """Check that both engines produce identical results."""
+        results = []
+        for engine in ['hourly', 'column']:
+            self.context.generators = gens
+            sim.run(self.context, engine=engine)
+            results.append((self.context.generation.values.copy(),
+                            self.context.spill.values.copy(),
+                            [g.series_power.sum() for g in gens]))
+        hourly, column = results
+        self.assertTrue(np.array_equal(hourly[0], column[0]))
+        self.assertTrue(np.array_equal(hourly[1], column[1]))
+        self.assertEqual(hourly[2], column[2])
+
+    def test_column_engine(self):
+        """Test the column engine against the hourly engine."""
+        cfg = configfile.get('generation', 'pv1axis-trace')
+        pv = generators.PV1Axis(31, 8000, cfg, 30)
+        psh = generators.PumpedHydro(36, 1740, 15000)
+        hydro = generators.Hydro(36, 2000)
+        ocgt = generators.OCGT(31, 5000)
+        self._compare_engines([pv, psh, hydro, ocgt])
+
+    def test_column_engine_no_storage(self):
+        """Test the column engine with a stateful generator."""
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        cst_cfg = configfile.get('generation', 'cst-trace')
+        pv = generators.PV1Axis(31, 8000, pv_cfg, 30)
+        cst = generators.CentralReceiver(31, 2000, 2.0, 6, cst_cfg, 30)
+        dr = generators.DemandResponse(31, 1000, 300)
+        self._compare_engines([pv, cst, dr])
@@ -9,6 +9,7 @@
 
 import unittest
 
+import numpy as np
 import pandas as pd
 
 from nemo import configfile, generators
@@ -21,14 +22,14 @@ class TestStorage(unittest.TestCase):
     def test_initialisation(self):
         """Test constructor."""
         storage = generators.Storage()
-        self.assertEqual(storage.series_charge, {})
+        self.assertFalse(storage.series_charge.any())
 
     def test_reset(self):
         """Test reset() method."""
         storage = generators.Storage()
-        storage.series_charge = {0: 150}
+        storage.series_charge = np.array([150.])
         storage.reset()
-        self.assertEqual(storage.series_charge, {})
+        self.assertEqual(storage.series_charge.tolist(), [0])
 
     def test_record(self):
         """Test record() method."""
@@ -36,14 +37,14 @@ class TestStorage(unittest.TestCase):
         storage.record(0, 100)
         storage.record(0, 50)
         storage.record(1, 75)
-        self.assertEqual(storage.series_charge, {0: 150, 1: 75})
+        self.assertEqual(storage.series_charge[:3].tolist(), [150, 75, 0])
 
     def test_series(self):
         """Test series() method."""
         storage = generators.Storage()
-        value = {0: 150}
+        value = np.array([150.])
         storage.series_charge = value
-        series = pd.Series(value, dtype=float)
+        series = pd.Series(value)
         self.assertTrue(storage.series()['charge'].equals(series))
 
     def test_store(self):
@@ -179,7 +180,7 @@ class TestBattery(unittest.TestCase):
         self.assertEqual(batt.rte, 1)
         self.assertEqual(batt.stored, 0)
         self.assertEqual(batt.runhours, 0)
-        self.assertEqual(len(batt.series_charge), 0)
+        self.assertFalse(batt.series_charge.any())
 
     def test_series(self):
         """Test series() method."""
@@ -228,7 +229,7 @@ class TestBattery(unittest.TestCase):
             self.assertEqual(result, 0 if hour in hrs else 50)
         nhours = 24 - len(hrs)
         self.assertEqual(batt.stored, 50 * nhours)
-        self.assertEqual(sum(batt.series_charge.values()), 50 * nhours)
+        self.assertEqual(batt.series_charge.sum(), 50 * nhours)
 
     def test_charge_multiple(self):
         """Test multiple calls to store()."""
@@ -257,7 +258,7 @@ class TestBattery(unittest.TestCase):
         self.assertEqual(result, 0)
         result = batt.step(hour=0, demand=400)
         self.assertEqual(result, (0, 0))
-        self.assertEqual(len(batt.series_charge), 0)
+        self.assertFalse(batt.series_charge.any())
         self.assertEqual(batt.runhours, 0)
 
     def test_round_trip_efficiency(self):
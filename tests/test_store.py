@@ -0,0 +1,147 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the store module."""
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+import nemo
+from nemo import configfile, generators, penalties, store
+from nemo.limits import EnergyLimits
+
+
+class TestStore(unittest.TestCase):
+    """Test store.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.context.generators = [
+            generators.PV1Axis(31, 30000, pv_cfg, 30),
+            generators.PumpedHydro(36, 1740, 15000),
+            generators.Hydro(36, 2000),
+            generators.Biofuel(31, 1000),
+            generators.OCGT(31, 2000)]
+        self.context.min_reserves = 1000
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Test harness teardown."""
+        self.tmpdir.cleanup()
+
+    def _measures(self):
+        """Return the measures that fitness is computed from."""
+        ctx = self.context
+        args = SimpleNamespace(reserves=1000, bioenergy_limit=0.1,
+                               hydro_limit=0.1)
+        values = [ctx.unserved_energy(), ctx.surplus_energy()]
+        values += list(ctx.generator_energy())
+        for penalty in (penalties.unserved, penalties.reserves,
+                        penalties.bioenergy, penalties.hydro):
+            values += penalty(ctx, args)
+        return np.array(values)
+
+    def _assert_close(self, first, second):
+        """Assert that two sets of measures match (up to rounding)."""
+        self.assertTrue(np.allclose(first, second, rtol=1e-12, atol=0))
+
+    def test_key(self):
+        """Test that keys depend on the parameters."""
+        digest = store.key(self.context, {'scenario': 'test'})
+        self.assertEqual(digest, store.key(self.context, {'scenario': 'test'}))
+        self.assertNotEqual(digest, store.key(self.context))
+        self.context.generators[-1].set_capacity(3)
+        self.assertNotEqual(digest, store.key(self.context,
+                                              {'scenario': 'test'}))
+        self.context.generators[-1].set_capacity(2)
+        self.assertEqual(digest, store.key(self.context, {'scenario': 'test'}))
+        self.context.nsp_limit = 0.5
+        self.assertNotEqual(digest, store.key(self.context,
+                                              {'scenario': 'test'}))
+
+    def test_key_tank(self):
+        """Test that keys depend on the size of a hydrogen tank."""
+        tank = generators.HydrogenStorage(1000)
+        self.context.generators += [
+            generators.Electrolyser(tank, 31, 100),
+            generators.HydrogenGT(tank, 31, 100)]
+        digest = store.key(self.context)
+        tank.set_storage(2000)
+        self.assertNotEqual(digest, store.key(self.context))
+        tank.set_storage(1000)
+        self.assertEqual(digest, store.key(self.context))
+
+    def test_key_energy_limits(self):
+        """Test that keys depend on the energy limits in dispatch."""
+        digest = store.key(self.context)
+        self.context.energy_limits = EnergyLimits(hydro=12)
+        limited = store.key(self.context)
+        self.assertNotEqual(digest, limited)
+        self.context.energy_limits = EnergyLimits(hydro=12, pacing='even')
+        self.assertNotEqual(limited, store.key(self.context))
+        self.context.energy_limits = None
+        self.assertEqual(digest, store.key(self.context))
+
+    def test_summary(self):
+        """Test restoring the results of a summary run."""
+        names = ['energy', 'unserved', 'reserves']
+        nemo.run(self.context, summary=names)
+        # A streamed run keeps no time series.
+        self.assertRaises(ValueError, store.snapshot, self.context)
+        nemo.run(self.context, engine='column', summary=names)
+        expected = self._measures()
+        results = store.snapshot(self.context)
+        self.assertRaises(ValueError, store.snapshot, self.context, True)
+        nemo.run(self.context)
+        store.restore(self.context, results)
+        self._assert_close(self._measures(), expected)
+
+    def test_tables(self):
+        """Test restoring the results of a full run."""
+        nemo.run(self.context)
+        expected = self._measures()
+        generation = self.context.generation.values.copy()
+        results = store.snapshot(self.context, tables=True)
+        self.context.generators[-1].set_capacity(0)
+        nemo.run(self.context)
+        self.context.generators[-1].set_capacity(2)
+        store.restore(self.context, results)
+        self._assert_close(self._measures(), expected)
+        self.assertTrue(np.array_equal(self.context.generation.values,
+                                       generation))
+
+    def test_put_get(self):
+        """Test saving and loading results."""
+        results = store.ResultStore(self.tmpdir.name)
+        self.assertIsNone(results.get('ab' * 32))
+        results.put('ab' * 32, {'energy': np.arange(3.)})
+        self.assertTrue(np.array_equal(results.get('ab' * 32)['energy'],
+                                       np.arange(3.)))
+        self.assertEqual((results.hits, results.misses, results.saved),
+                         (1, 1, 1))
+        # No temporary files are left behind.
+        self.assertEqual([name for name in os.listdir(self.tmpdir.name)
+                          if name.endswith('.tmp')], [])
+
+    def test_prune(self):
+        """Test removal of the least recently used results."""
+        results = store.ResultStore(self.tmpdir.name)
+        for i, digest in enumerate(['aa' * 32, 'bb' * 32, 'cc' * 32]):
+            results.put(digest, {'energy': np.random.rand(1000)})
+            path = results._path(digest)  # pylint: disable=protected-access
+            os.utime(path, (i, i))
+        results.maxbytes = results.size() - 1
+        results.prune()
+        self.assertEqual(results.evictions, 1)
+        self.assertIsNone(results.get('aa' * 32))
+        self.assertIsNotNone(results.get('cc' * 32))
@@ -0,0 +1,90 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the surrogate module."""
+
+import pickle
+import unittest
+
+import numpy as np
+
+from nemo import surrogate
+
+
+def sphere(params):
+    """Return a smooth test function with its minimum at 1."""
+    return 10 + ((np.asarray(params) - 1) ** 2).sum()
+
+
+class TestSurrogate(unittest.TestCase):
+    """Test surrogate.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.rng = np.random.default_rng(0)
+        self.model = surrogate.Surrogate(window=200, minimum=10)
+
+    def fill(self, count):
+        """Add count random evaluations of the test function."""
+        for params in self.rng.uniform(-2, 4, (count, 3)):
+            self.model.add(params, sphere(params))
+
+    def test_add(self):
+        """Test that only finite fitness values are added."""
+        self.model.add([1, 2, 3], np.inf)
+        self.model.add([1, 2, 3], np.nan)
+        self.assertEqual(len(self.model), 0)
+        self.fill(9)
+        self.assertFalse(self.model.ready_p())
+        self.fill(1)
+        self.assertTrue(self.model.ready_p())
+
+    def test_interpolate(self):
+        """Test that the model reproduces the points it is fitted to."""
+        self.fill(50)
+        self.model.fit()
+        points = np.array(self.model.points)
+        self.assertTrue(np.allclose(self.model.predict(points),
+                                    self.model.values, rtol=1e-3))
+
+    def test_rank(self):
+        """Test that predictions rank new points."""
+        self.fill(150)
+        self.model.fit()
+        params = self.rng.uniform(-2, 4, (50, 3))
+        predicted = self.model.predict(params)
+        actual = [sphere(p) for p in params]
+        ranks = [np.argsort(np.argsort(v)) for v in (predicted, actual)]
+        self.assertGreater(np.corrcoef(*ranks)[0, 1], 0.9)
+        self.assertLess(self.model.predict([1, 1, 1])[0], 11)
+
+    def test_window(self):
+        """Test that the model is fitted to the most recent points."""
+        model = surrogate.Surrogate(window=5, minimum=1)
+        for i in range(20):
+            model.add([i], 100 if i < 15 else 1)
+        model.fit()
+        self.assertAlmostEqual(model.predict([17])[0], 1, places=3)
+
+    def test_degenerate(self):
+        """Test fitting repeated and constant points."""
+        for _ in range(5):
+            self.model.add([1, 2], 50)
+        self.model.add([1, 3], -5)
+        prediction = self.model.predict([[1, 2], [1, 3]])
+        self.assertTrue(np.isfinite(prediction).all())
+        self.assertAlmostEqual(prediction[0], 50, places=1)
+
+    def test_pickle(self):
+        """Test that a fitted model survives a checkpoint."""
+        self.fill(20)
+        self.model.fit()
+        self.model.record(12, 10)
+        copy = pickle.loads(pickle.dumps(self.model))
+        self.assertEqual(copy.errors, [(12, 10)])
+        self.assertTrue(np.allclose(copy.predict([0, 0, 0]),
+                                    self.model.predict([0, 0, 0])))
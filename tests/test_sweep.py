@@ -0,0 +1,114 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the sweep module."""
+
+import unittest
+
+import numpy as np
+
+import nemo
+from nemo import configfile, generators, regions, sweep
+
+
+class TestSweep(unittest.TestCase):
+    """Test sweep.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.ocgt = generators.OCGT(31, 5000)
+        self.context.generators = [
+            generators.PV1Axis(31, 30000, pv_cfg, 30),
+            generators.PumpedHydro(36, 1740, 15000),
+            generators.Hydro(36, 2000),
+            generators.Biofuel(31, 1000),
+            self.ocgt]
+
+    def _results(self):
+        """Return the results of the last run."""
+        return (self.context.generation.values.copy(),
+                self.context.spill.values.copy(),
+                [g.series_power.copy() for g in self.context.generators])
+
+    def _assert_equal(self, first, second):
+        """Assert that the results of two runs are identical."""
+        for arr1, arr2 in zip(first[:2], second[:2]):
+            self.assertTrue(np.array_equal(arr1, arr2))
+        for arr1, arr2 in zip(first[2], second[2]):
+            self.assertTrue(np.array_equal(arr1, arr2))
+
+    def test_reuse(self):
+        """Test that a cached run matches an uncached run."""
+        cache = sweep.PrefixCache()
+        self.context.prefix_cache = cache
+        nemo.run(self.context, engine='column')
+        self.assertEqual(cache.reused, 0)
+        for gen, cap in [(self.ocgt, 2), (self.context.generators[2], 1),
+                         (self.context.generators[0], 20)]:
+            gen.set_capacity(cap)
+            self.context.prefix_cache = cache
+            nemo.run(self.context, engine='column')
+            cached = self._results()
+            self.context.prefix_cache = None
+            nemo.run(self.context, engine='column')
+            self._assert_equal(cached, self._results())
+        # Only the first change reuses anything because each uncached
+        # run invalidates the cache.
+        self.assertEqual(cache.reused, 4)
+
+    def test_restart(self):
+        """Test the restart position."""
+        cache = sweep.PrefixCache()
+        self.context.prefix_cache = cache
+        nemo.run(self.context, engine='column')
+        self.ocgt.set_capacity(3)
+        nemo.run(self.context, engine='column')
+        self.assertEqual(cache.reused, 4)
+        nemo.run(self.context, engine='column')
+        self.assertEqual(cache.reused, 9)
+        self.context.generators[0].set_capacity(10)
+        nemo.run(self.context, engine='column')
+        self.assertEqual(cache.reused, 9)
+        nemo.run(self.context, engine='hourly')
+        nemo.run(self.context, engine='column')
+        self.assertEqual(cache.reused, 9)
+
+    def test_summary(self):
+        """Test reuse in a summary run."""
+        self.context.prefix_cache = sweep.PrefixCache()
+        nemo.run(self.context, engine='column')
+        self.ocgt.set_capacity(1)
+        nemo.run(self.context, engine='column', summary=['unserved'])
+        unserved = self.context.unserved_energy()
+        self.context.prefix_cache = None
+        nemo.run(self.context, engine='column')
+        self.assertAlmostEqual(unserved, self.context.unserved_energy())
+
+    def test_run_sweep(self):
+        """Test run_sweep() function."""
+        biofuel = self.context.generators[3]
+        caps = [0, 1, 2]
+        results = nemo.run_sweep(self.context,
+                                 [(self.ocgt, caps), (biofuel, [0, 0.5])])
+        self.assertEqual(results.shape, (3, 2))
+        self.assertEqual(self.ocgt.capacity, 5000)
+        self.assertEqual(biofuel.capacity, 1000)
+        self.assertIsNone(self.context.prefix_cache)
+        for i, cap in enumerate(caps):
+            self.ocgt.set_capacity(cap)
+            biofuel.set_capacity(0.5)
+            nemo.run(self.context)
+            self.assertAlmostEqual(results[i, 1],
+                                   self.context.unserved_energy())
+
+    def test_out_of_region(self):
+        """Test run_sweep() with a generator outside the regions."""
+        self.context.regions = [regions.qld]
+        with self.assertRaises(ValueError):
+            nemo.run_sweep(self.context, [(self.ocgt, [1, 2])])
@@ -0,0 +1,97 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the tracer module."""
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+
+import nemo
+from nemo import configfile, generators, regions, tracer
+
+
+class TestTracer(unittest.TestCase):
+    """Test tracer.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = nemo.Context()
+        pv_cfg = configfile.get('generation', 'pv1axis-trace')
+        self.pv = generators.PV1Axis(31, 60000, pv_cfg, 30)
+        self.psh = generators.PumpedHydro(36, 1740, 15000)
+        self.ocgt = generators.OCGT(6, 5000)
+        self.context.generators = [self.pv, self.psh, self.ocgt]
+
+    def test_engines(self):
+        """Test that both engines produce the same trace."""
+        traces = []
+        for engine in ['hourly', 'column']:
+            self.context.trace = tracer.DispatchTrace(hours=range(0, 48))
+            nemo.run(self.context, engine=engine)
+            traces.append(self.context.trace.records())
+        self.assertEqual(traces[0].tobytes(), traces[1].tobytes())
+        self.assertEqual(set(traces[0]['hour']), set(range(48)))
+
+    def test_step(self):
+        """Test that both engines trace a range of hours with a step."""
+        for engine in ['hourly', 'column']:
+            self.context.trace = tracer.DispatchTrace(hours=range(1, 48, 6))
+            nemo.run(self.context, engine=engine)
+            hours = self.context.trace.records()['hour']
+            self.assertEqual(set(hours), set(range(1, 48, 6)))
+
+    def test_query(self):
+        """Test the records() method."""
+        trace = tracer.DispatchTrace(hours=range(10, 34))
+        self.context.trace = trace
+        nemo.run(self.context, engine='column')
+        recs = trace.records(first=12, last=12)
+        self.assertEqual(recs['generator'].tolist()[:1], [0])
+        self.assertTrue(np.all(recs['hour'] == 12))
+        stores = trace.records(generator=self.psh, kind=tracer.STORE)
+        self.assertTrue(len(stores) > 0)
+        self.assertTrue(np.all(stores['target'] == 1))
+        self.assertEqual(len(trace.records(generator=2)), 24)
+
+    def test_regions(self):
+        """Test a trace limited to one region."""
+        self.context.trace = tracer.DispatchTrace(regions=[regions.qld])
+        nemo.run(self.context, engine='column')
+        recs = self.context.trace.records(kind=tracer.DISPATCH)
+        self.assertEqual(set(recs['generator']), {2})
+
+    def test_file(self):
+        """Test a memory-mapped trace file."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'trace.npy')
+            trace = tracer.DispatchTrace(capacity=100, filename=filename)
+            self.context.trace = trace
+            nemo.run(self.context)
+            self.assertEqual(trace.count, 100)
+            self.assertTrue(trace.dropped > 0)
+            trace.buffer.flush()
+            saved = np.load(filename)
+            self.assertEqual(saved.dtype, tracer.record_dtype)
+            self.assertEqual(saved.tobytes(), trace.buffer.tobytes())
+            del trace, saved
+            self.context.trace = None
+
+    def test_verbose(self):
+        """Test that a verbose run prints the trace."""
+        self.context.verbose = True
+        output = io.StringIO()
+        with redirect_stdout(output):
+            nemo.run(self.context)
+        self.assertIn('STEP: ', output.getvalue())
+        self.assertIn('GENERATOR: ', output.getvalue())
+        self.assertIn('STORE: ', output.getvalue())
+        self.assertIsNone(self.context.trace)
@@ -0,0 +1,99 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the tying module."""
+
+import unittest
+
+import numpy as np
+
+from nemo import context, generators, polygons, scenarios, tying
+
+
+class TestTying(unittest.TestCase):
+    """Test tying.py."""
+
+    def setUp(self):
+        """Test harness setup."""
+        self.context = context.Context()
+        self.context.generators = [
+            generators.Hydro(polygons.WILDCARD, 100, label='hydro'),
+            generators.Biofuel(1, 200, label='bio1'),
+            generators.Biofuel(2, 300, label='bio2'),
+            generators.Biofuel(3, 500, label='bio3')]
+        for gen, limit in zip(self.context.generators[1:], [10, 30, 60]):
+            gen.setters[0] = gen.setters[0][:2] + (limit,)
+
+    def test_untied(self):
+        """Test a map without groups."""
+        pmap = tying.ParameterMap(self.context)
+        self.assertFalse(pmap.tied_p())
+        self.assertEqual(len(pmap), 4)
+        params = np.array([0.1, 2, 3, 4])
+        self.assertTrue(np.array_equal(pmap.expand(params), params))
+        self.assertTrue(np.array_equal(pmap.reduce(params), params))
+
+    def test_shares(self):
+        """Test a group spread by build limit share."""
+        group = tying.shares(self.context.generators[1:], 'bio')
+        pmap = tying.ParameterMap(self.context, [group])
+        self.assertTrue(pmap.tied_p())
+        self.assertEqual(len(pmap), 2)
+        self.assertTrue(np.allclose(pmap.expand([0.1, 10]),
+                                    [0.1, 1, 3, 6]))
+        self.assertTrue(np.allclose(pmap.reduce([0.1, 1, 3, 6]), [0.1, 10]))
+        # The group cannot exceed the smallest share of a limit.
+        self.assertEqual(pmap.upper[1], 100)
+        self.assertTrue(np.array_equal(pmap.clamp([-1, 200]), [0, 100]))
+
+    def test_equal(self):
+        """Test a group of equal parameters."""
+        group = tying.equal(self.context.generators[1:])
+        pmap = tying.ParameterMap(self.context, [group])
+        self.assertTrue(np.array_equal(pmap.expand([0, 2]), [0, 2, 2, 2]))
+        self.assertTrue(np.allclose(pmap.reduce([0, 1, 2, 3]), [0, 2]))
+
+    def test_infinite_limits(self):
+        """Test that infinite limits give equal shares."""
+        gens = [generators.Biofuel(1, 0), generators.Biofuel(2, 0)]
+        gens[1].setters[0] = gens[1].setters[0][:2] + (np.inf,)
+        group = tying.shares(gens)
+        self.assertEqual([weight for _, _, weight in group.members],
+                         [0.5, 0.5])
+
+    def test_missing(self):
+        """Test that members outside the context are ignored."""
+        other = generators.Biofuel(4, 0, label='bio4')
+        groups = [tying.equal([self.context.generators[1], other]),
+                  tying.equal(self.context.generators[2:])]
+        pmap = tying.ParameterMap(self.context, groups)
+        self.assertEqual(len(pmap.groups), 1)
+        self.assertEqual(len(pmap), 3)
+
+    def test_fixed(self):
+        """Test parameters held at a value."""
+        group = tying.equal(self.context.generators[1:3])
+        fixed = [(self.context.generators[3], 0, 0.5)]
+        pmap = tying.ParameterMap(self.context, [group], fixed)
+        self.assertEqual(len(pmap), 2)
+        self.assertTrue(np.array_equal(pmap.expand([0.1, 2]),
+                                       [0.1, 2, 2, 0.5]))
+        self.assertTrue(np.allclose(pmap.reduce([0.1, 1, 3, 7]), [0.1, 2]))
+
+    def test_regional(self):
+        """Test the regional groups of a scenario."""
+        ctx = context.Context()
+        scenarios.supply_scenarios['re100'](ctx)
+        pmap = tying.ParameterMap(ctx, ctx.parameter_groups)
+        numparams = sum(len(g.setters) for g in ctx.generators)
+        self.assertLess(len(pmap), numparams / 2)
+        values = pmap.clamp(np.random.rand(len(pmap)) * 1000)
+        self.assertTrue(np.allclose(pmap.reduce(pmap.expand(values)),
+                                    values))
+        plan = ctx.plan()
+        self.assertTrue(np.allclose(plan.clamp(pmap.expand(values)),
+                                    pmap.expand(values)))
@@ -0,0 +1,40 @@
+# Copyright (C) 2022 Ben Elliston
+#
+# This file is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+
+"""A testsuite for the workers module."""
+
+import operator
+import unittest
+
+from nemo import workers
+
+
+class TestWorkers(unittest.TestCase):
+    """Test workers.py."""
+
+    def test_map(self):
+        """Test map() returns results in order."""
+        with workers.WorkerPool(2) as pool:
+            self.assertEqual(pool.map(operator.neg, range(10)),
+                             [-i for i in range(10)])
+            self.assertEqual(pool.map(operator.neg, []), [])
+            self.assertEqual(pool.submit(operator.neg, 3).result(), -3)
+
+    def test_chunks(self):
+        """Test the choice of chunk size."""
+        pool = workers.WorkerPool(2)
+        self.assertEqual(pool.chunks(0), 1)
+        self.assertEqual(pool.chunks(8), 1)
+        self.assertEqual(pool.chunks(9), 2)
+        self.assertEqual(pool.chunks(100), 13)
+        pool.chunksize = 5
+        self.assertEqual(pool.chunks(100), 5)
+        pool.close()
+
+    def test_invalid(self):
+        """Test an invalid number of workers."""
+        self.assertRaises(ValueError, workers.WorkerPool, 0)